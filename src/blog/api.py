@@ -3,17 +3,19 @@ from rest_framework.response import Response
 
 from blog.models import Blog, BlogImage
 from blog.serializers import BlogSerializer, BlogImageSerializer
+from products.caching import CachedResponseMixin
 from products.permissions import RoleIsAdmin, RoleIsManager, RoleIsUser
 
 
 
 
-class BlogViewSet(viewsets.ModelViewSet):
+class BlogViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     """
     A ViewSet for viewing and editing blog posts.
     """
     queryset = Blog.objects.all()
     serializer_class = BlogSerializer
+    cache_group = "blog"
     permission_classes = [RoleIsAdmin | RoleIsManager | RoleIsUser]
 
 class BlogImageViewSet(viewsets.ModelViewSet):
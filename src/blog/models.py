@@ -1,13 +1,16 @@
-import cloudinary.uploader
 from django.db import models
 from django.dispatch import receiver
 from cloudinary.models import CloudinaryField
-from django.db.models.signals import post_delete
+from django.db.models.signals import post_delete, post_save
+
+from products.assets import enqueue_asset_deletion
+from products.caching import bump_cache_version_on_commit
 
 
 class Blog(models.Model):
     content = models.TextField(verbose_name="Content")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Created at")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Updated at")
 
     class Meta:
         db_table = "blog"
@@ -23,5 +26,10 @@ class BlogImage(models.Model):
 
 @receiver(post_delete, sender=BlogImage)
 def delete_cloudinary_image_blog(sender, instance, **kwargs):
-    if instance.image:
-        cloudinary.uploader.destroy(instance.image.public_id)
+    enqueue_asset_deletion(instance.image)
+
+
+@receiver(post_save, sender=Blog)
+@receiver(post_delete, sender=Blog)
+def blog_changed(sender, **kwargs):
+    bump_cache_version_on_commit("blog")
@@ -1,16 +1,18 @@
-from django.conf import settings
 from rest_framework import serializers
 from django.utils.translation import gettext_lazy as _
-import cloudinary.uploader
 
 from blog.models import Blog, BlogImage
+from products.assets import (create_with_uploads, enqueue_asset_deletion,
+                             write_with_uploads)
+from products.image_urls import get_image_variants
 from products.serializers import ImageValidator
 
 
 class BlogImageSerializer(serializers.ModelSerializer):
     image = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
     upload_image = serializers.ListField(
-        child=serializers.ImageField(),
+        child=serializers.FileField(),
         write_only=True,
         required=False,
         label="Upload Image",
@@ -21,20 +23,13 @@ class BlogImageSerializer(serializers.ModelSerializer):
         fields = [
             "id",
             "image",
+            "image_srcset",
             "upload_image"
         ]
     
-    def validate_upload_images(self, images):
+    def validate_upload_image(self, images):
         validator = ImageValidator()
-        errors = []
-        for image in images:
-            try:
-                validator(image)
-            except serializers.ValidationError as e:
-                errors.append([image.name, str(e)])
-        if errors:
-            raise serializers.ValidationError(errors)
-        return images
+        return validator.prepare(images)
     
     def create(self, validated_data):
         self.cloudinary_responses = [] 
@@ -50,8 +45,17 @@ class BlogImageSerializer(serializers.ModelSerializer):
                 }
             )
         if images_data:
-            for image_data in images_data:
-                obj = BlogImage.objects.create(image=image_data)
+            try:
+                objs = create_with_uploads(
+                    BlogImage,
+                    images_data,
+                    lambda resource, position: BlogImage(image=resource),
+                )
+            except Exception as e:
+                raise serializers.ValidationError(
+                    {"upload_image": _(f"Image upload failed: {e}")}
+                )
+            for obj in objs:
                 url = obj.image.build_url() if hasattr(obj.image, "build_url") else None
                 if url:
                     self.cloudinary_responses.append({
@@ -60,7 +64,7 @@ class BlogImageSerializer(serializers.ModelSerializer):
                     })
         else:
             raise serializers.ValidationError({"upload_image": _("Please upload an image.")})        
-        return obj
+        return objs[-1]
 
     def update(self, instance, validated_data):
         new_images = validated_data.pop("upload_image", [])
@@ -68,19 +72,21 @@ class BlogImageSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError({"upload_image": _("Please upload a new image.")})
         elif len(new_images) > 1:
             raise serializers.ValidationError({"upload_image": _("You can only upload one image at a time.")})
-        if instance.image and hasattr(instance.image, 'public_id'):
-            try:
-                cloudinary.uploader.destroy(instance.image.public_id)
-            except Exception as e:
-                print(f"Cloudinary delete error: {e}")
 
-        instance.image = new_images[0]
-        instance.save()
+        def write(resources):
+            old_image = instance.image
+            instance.image = resources[0]
+            instance.save()
+            enqueue_asset_deletion(old_image)
+            return instance
 
-        return instance
+        return write_with_uploads(new_images[:1], write)
 
     def get_image(self, obj):
-        return f"https://res.cloudinary.com/{settings.CLOUDINARY_CLOUD_NAME}/image/upload/{obj.image}"
+        return get_image_variants(obj.image, "gallery")["src"]
+
+    def get_image_srcset(self, obj):
+        return get_image_variants(obj.image, "gallery")["srcset"]
 
 
 class BlogSerializer(serializers.ModelSerializer):
@@ -228,6 +228,48 @@ cloudinary.config(
 
 DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
 
+CLOUDINARY_ASSETS = {
+    "CLIENT": "products.assets.CloudinaryAssetClient",
+    # Cloudinary accepts up to 100 public ids per delete_resources call.
+    "DELETE_BATCH_SIZE": 100,
+    "MAX_ATTEMPTS": 5,
+    # Seconds before the first retry, doubled on every further attempt.
+    "RETRY_DELAY": 60,
+    # Seconds to collect deletions before the background drain runs.
+    "DRAIN_DELAY": 5,
+    # Concurrent uploads per request when a gallery is saved.
+    "UPLOAD_WORKERS": 5,
+    # Seconds a signed browser upload can still be confirmed.
+    "DIRECT_UPLOAD_TTL": 600,
+    # Orphaned assets younger than this (seconds) are left alone by the GC.
+    "ORPHAN_GRACE_PERIOD": 60 * 60 * 24,
+    # Only assets under this folder are collected; empty means the whole account.
+    "ORPHAN_PREFIX": "",
+}
+
+IMAGE_UPLOADS = {
+    # Rejected from the header, before any pixel data is decoded.
+    "MAX_PIXELS": 40_000_000,
+    # "off" rejects images over the limits, "oversized" downscales and
+    # re-encodes them, "all" re-encodes every upload.
+    "TRANSCODE": os.getenv("IMAGE_TRANSCODE", "oversized"),
+    "FORMAT": "WEBP",
+    "QUALITY": 80,
+    "WORKERS": 4,
+    # Also reuse assets whose perceptual hash matches, e.g. a resized copy.
+    "PERCEPTUAL_DEDUP": False,
+}
+
+# Responsive variants served for each image field. Width presets become a
+# w-descriptor srcset, fixed-size ones with "dprs" an x-descriptor srcset;
+# "width" is the plain src.
+IMAGE_PRESETS = {
+    "thumbnail": {"width": 160, "height": 160, "crop": "fill", "dprs": [1, 2, 3]},
+    "card": {"widths": [240, 360, 480, 720], "width": 480},
+    "gallery": {"widths": [480, 768, 1080, 1440, 1920], "width": 1080},
+    "banner": {"widths": [640, 960, 1280, 1920], "width": 1280},
+}
+
 CACHES = {
     "default": {
         "BACKEND": "django_redis.cache.RedisCache",
@@ -246,5 +288,54 @@ MONOBANK = {
     "TIMEOUT": 15,
 }
 
+PAYMENT_WEBHOOKS = {
+    # Seconds to collect webhooks before the background run handles them.
+    "PROCESS_DELAY": 1,
+    "BATCH_SIZE": 50,
+    "MAX_ATTEMPTS": 8,
+    # Seconds before the first retry, doubled on every further attempt.
+    "RETRY_DELAY": 30,
+}
+
+PAYMENT_PRICING = {
+    # Seconds a cached product price lives; catalog changes retire it earlier.
+    "SNAPSHOT_TTL": 60,
+}
+
+ORDER_REFERENCES = {
+    # Characters after the month letter; 3 gives 46,656 references a month.
+    "LENGTH": int(os.getenv("ORDER_REFERENCE_LENGTH", 3)),
+    # Days a reference stays reserved after it is handed out.
+    "HOLD_DAYS": 30,
+}
+
+RESPONSE_CACHE = {
+    # Entries are keyed by a version counter, so the timeout only bounds memory.
+    "TIMEOUT": 60 * 60,
+}
+
+PRODUCT_SEARCH = {
+    # "auto" uses SQLite FTS5 when available and the in-process index otherwise.
+    "BACKEND": os.getenv("PRODUCT_SEARCH_BACKEND", "auto"),
+    "LIMIT": 200,
+    "MIN_SIMILARITY": 0.4,
+}
+
+SITEMAP = {
+    # Storefront path prefix of each language, used for hreflang alternates.
+    "LANGUAGE_PREFIXES": {"uk": "", "en": "/en"},
+    "MAX_URLS": 50000,
+}
+
+SITEMAP_PING = {
+    # Seconds to collect catalog changes before one background ping.
+    "DELAY": int(os.getenv("SITEMAP_PING_DELAY", 60)),
+}
+
+PRODUCT_FACETS = {
+    # Upper bounds of the price buckets in UAH; the last bucket is open-ended.
+    "PRICE_BUCKETS": (500, 1000, 2000),
+}
+
 
 SITE_ID = 2
@@ -2,15 +2,13 @@ from django.contrib import admin
 from django.urls import include, path
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 from rest_framework.permissions import AllowAny
-from django.contrib.sitemaps.views import sitemap
 
 from django.conf import settings
 from django.conf.urls.static import static
-from products.sitemaps import ProductSitemap
+from products.sitemaps import sitemap_view
 
 
 ROOT_API = "api/v1"
-sitemaps_dict = {"products": ProductSitemap}
 
 urlpatterns = [
     path("admin/", admin.site.urls),
@@ -56,7 +54,8 @@ urlpatterns = [
         f"{ROOT_API}/telegram-bot/",
         include(("telegram_bot.urls", "telegram_bot"), namespace="telegram_bot"),
     ),
-    path("sitemap.xml", sitemap, {"sitemaps": sitemaps_dict}, name="sitemap"),
+    path("sitemap.xml", sitemap_view, name="sitemap"),
+    path("sitemap-<int:section>.xml", sitemap_view, name="sitemap-section"),
 
 
 ]  + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
@@ -3,10 +3,12 @@ from rest_framework import viewsets
 from contacts.models import Contact
 from contacts.serializers import ContactSerializer 
 from contacts.permissions import ContactPermission
+from products.caching import CachedResponseMixin
 
 
 
-class ContactViewSet(viewsets.ModelViewSet):
+class ContactViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     queryset = Contact.objects.all()
     serializer_class = ContactSerializer
+    cache_group = "contacts"
     permission_classes = [ContactPermission]
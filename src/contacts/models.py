@@ -1,6 +1,10 @@
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.core.exceptions import ValidationError
 
+from products.caching import bump_cache_version_on_commit
+
 
 class Contact(models.Model):
 
@@ -46,6 +50,7 @@ class Contact(models.Model):
         max_length=255,
         verbose_name="Payment and delivery information URL",
     )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Updated at")
     
     def clean(self):
         if Contact.objects.exists() and not self.pk:
@@ -62,3 +67,8 @@ class Contact(models.Model):
     def __str__(self):
         return f"Contact {self.id} - {self.telegram or self.email or self.main_phone_number}"
 
+
+@receiver(post_save, sender=Contact)
+@receiver(post_delete, sender=Contact)
+def contact_changed(sender, **kwargs):
+    bump_cache_version_on_commit("contacts")
@@ -1,12 +1,14 @@
 from rest_framework import viewsets
 
+from products.caching import CachedResponseMixin
 from products.permissions import RoleIsAdmin, RoleIsManager, RoleIsUser
 from partners.models import PartnerLocation
 from partners.serializers import PartnerLocationSerializer
 
 
-class PartnerLocationViewSet(viewsets.ModelViewSet):
+class PartnerLocationViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     queryset = PartnerLocation.objects.all()
     serializer_class = PartnerLocationSerializer
+    cache_group = "partners"
     permission_classes = [RoleIsAdmin | RoleIsManager | RoleIsUser]
     filterset_fields = ["id"]
\ No newline at end of file
@@ -1,4 +1,8 @@
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from products.caching import bump_cache_version_on_commit
 
 
 class PartnerLocation(models.Model):
@@ -11,10 +15,16 @@ class PartnerLocation(models.Model):
     google_maps_link = models.URLField(max_length=500, verbose_name='Google Maps link')
     longitude = models.DecimalField(max_digits=4, decimal_places=2, verbose_name='Longitude (x)')
     latitude = models.DecimalField(max_digits=4, decimal_places=2, verbose_name='Latitude (y)')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Updated at')
 
     class Meta:
         db_table = 'partner_location'
 
     def __str__(self):
         return self.name_en
-       
\ No newline at end of file
+
+
+@receiver(post_save, sender=PartnerLocation)
+@receiver(post_delete, sender=PartnerLocation)
+def partner_location_changed(sender, **kwargs):
+    bump_cache_version_on_commit("partners")
@@ -1,3 +1,35 @@
 from django.contrib import admin
 
-# Register your models here.
+from payments.models import Order, OrderItem, WebhookEvent
+
+
+class OrderItemInline(admin.TabularInline):
+    model = OrderItem
+    extra = 0
+    readonly_fields = ["name", "article", "number_of_items", "price_with_discount"]
+
+
+@admin.register(Order)
+class OrderAdmin(admin.ModelAdmin):
+    inlines = [OrderItemInline]
+    date_hierarchy = "created_at"
+    list_display = [
+        "reference",
+        "invoice_id",
+        "status",
+        "name",
+        "last_name",
+        "phone",
+        "amount",
+        "created_at",
+    ]
+    list_filter = ["status", "delivery_method", "payment_option", "created_at"]
+    search_fields = ["reference", "invoice_id", "phone", "last_name"]
+    readonly_fields = ["invoice_id", "reference", "paid_at", "created_at", "updated_at"]
+
+
+@admin.register(WebhookEvent)
+class WebhookEventAdmin(admin.ModelAdmin):
+    list_display = ["invoice_id", "status", "state", "attempts", "created_at"]
+    list_filter = ["state", "status"]
+    search_fields = ["invoice_id"]
@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from payments.models import WebhookEvent
+from payments.webhooks import process_webhook_events
+
+
+class Command(BaseCommand):
+    help = "Process stored Monobank webhooks; list or requeue dead ones."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--list-dead", action="store_true", help="Show events that gave up retrying."
+        )
+        parser.add_argument(
+            "--requeue-dead", action="store_true", help="Retry dead events from scratch."
+        )
+        parser.add_argument(
+            "--every", type=float, metavar="SECONDS",
+            help="Keep running and process due events every SECONDS.",
+        )
+
+    def handle(self, *args, **options):
+        dead = WebhookEvent.objects.filter(state=WebhookEvent.STATE_DEAD)
+        if options["list_dead"]:
+            for event in dead.order_by("id"):
+                self.stdout.write(
+                    f"{event.invoice_id} {event.status} attempts={event.attempts} "
+                    f"error={event.last_error}"
+                )
+            return
+        if options["requeue_dead"]:
+            requeued = dead.update(
+                state=WebhookEvent.STATE_PENDING,
+                attempts=0,
+                next_attempt_at=timezone.now(),
+            )
+            self.stdout.write(f"Requeued {requeued} dead events.")
+
+        while True:
+            report = process_webhook_events()
+            if not options["every"] or any(report.values()):
+                self.stdout.write(self.style.SUCCESS(
+                    f"Processed {report['done']}, retrying {report['retried']}, "
+                    f"dead {report['dead']}."
+                ))
+            if not options["every"]:
+                return
+            close_old_connections()
+            time.sleep(options["every"])
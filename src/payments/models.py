@@ -1,3 +1,150 @@
 from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
 
-# Create your models here.
+
+class Order(models.Model):
+    """
+    An order as submitted to ``CreateInvoiceView``, written once the
+    Monobank invoice exists. Webhooks only update ``status`` by
+    ``invoice_id``.
+    """
+
+    STATUS_PENDING = "pending"
+    STATUS_PAID = "paid"
+    STATUS_FAILED = "failed"
+    STATUS_REFUNDED = "refunded"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, _("Pending")),
+        (STATUS_PAID, _("Paid")),
+        (STATUS_FAILED, _("Failed")),
+        (STATUS_REFUNDED, _("Refunded")),
+    ]
+
+    invoice_id = models.CharField(max_length=100, unique=True, verbose_name=_("Invoice ID"))
+    reference = models.CharField(max_length=10, db_index=True, verbose_name=_("Reference"))
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING, verbose_name=_("Status")
+    )
+    name = models.CharField(max_length=128, verbose_name=_("Name"))
+    last_name = models.CharField(max_length=128, verbose_name=_("Last name"))
+    phone = models.CharField(max_length=20, verbose_name=_("Phone"))
+    telegram_name = models.CharField(max_length=64, blank=True, default="", verbose_name=_("Telegram"))
+    delivery_method = models.CharField(max_length=20, default="pickup", verbose_name=_("Delivery method"))
+    settlement = models.CharField(max_length=128, blank=True, default="", verbose_name=_("Settlement"))
+    warehouse = models.CharField(max_length=64, blank=True, default="", verbose_name=_("Warehouse"))
+    comment = models.TextField(blank=True, default="", verbose_name=_("Comment"))
+    amount = models.PositiveIntegerField(verbose_name=_("Amount to pay, kopecks"))
+    full_amount = models.PositiveIntegerField(verbose_name=_("Full amount, kopecks"))
+    ccy = models.PositiveSmallIntegerField(default=980, verbose_name=_("Currency"))
+    payment_option = models.CharField(max_length=10, default="full", verbose_name=_("Payment option"))
+    promocode = models.CharField(max_length=64, blank=True, default="", verbose_name=_("Promo code"))
+    paid_at = models.DateTimeField(null=True, blank=True, verbose_name=_("Paid at"))
+    # Monobank's modifiedDate of the status applied last; older webhooks are ignored.
+    status_modified_at = models.DateTimeField(
+        null=True, blank=True, verbose_name=_("Status modified at")
+    )
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name=_("Created at"))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_("Updated at"))
+
+    class Meta:
+        db_table = "order"
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["status", "-created_at"], name="order_status_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.reference} ({self.status})"
+
+    def as_invoice_data(self, items=None) -> dict:
+        """The dict ``format_order_message`` and the invoice cache work with."""
+        if items is None:
+            items = self.items.all()
+        return {
+            "name": self.name,
+            "last_name": self.last_name,
+            "phone": self.phone,
+            "telegram_name": self.telegram_name,
+            "delivery_method": self.delivery_method,
+            "settlement": self.settlement,
+            "warehouse": self.warehouse,
+            "comment": self.comment,
+            "amount": self.amount,
+            "full_amount": self.full_amount,
+            "reference": self.reference,
+            "ccy": self.ccy,
+            "payment_option": self.payment_option,
+            "products": [
+                {
+                    "name": item.name,
+                    "article": item.article,
+                    "number_of_items": item.number_of_items,
+                    "price_with_discount": item.price_with_discount,
+                }
+                for item in items
+            ],
+            "promocode": self.promocode,
+        }
+
+
+class OrderItem(models.Model):
+    order = models.ForeignKey(
+        Order, on_delete=models.CASCADE, related_name="items", verbose_name=_("Order")
+    )
+    name = models.CharField(max_length=255, verbose_name=_("Product name"))
+    article = models.CharField(max_length=100, db_index=True, verbose_name=_("Article"))
+    number_of_items = models.PositiveIntegerField(verbose_name=_("Quantity"))
+    price_with_discount = models.PositiveIntegerField(verbose_name=_("Unit price, kopecks"))
+
+    class Meta:
+        db_table = "order_item"
+
+    def __str__(self):
+        return f"{self.article} x {self.number_of_items}"
+
+
+class WebhookEvent(models.Model):
+    """
+    A verified Monobank webhook, stored before it is acknowledged and
+    processed in the background by ``payments.webhooks``.
+    """
+
+    STATE_PENDING = "pending"
+    STATE_CLAIMED = "claimed"
+    STATE_DONE = "done"
+    STATE_DEAD = "dead"
+    STATE_CHOICES = [
+        (STATE_PENDING, _("Pending")),
+        (STATE_CLAIMED, _("Claimed")),
+        (STATE_DONE, _("Done")),
+        (STATE_DEAD, _("Dead")),
+    ]
+
+    invoice_id = models.CharField(max_length=100, db_index=True, verbose_name=_("Invoice ID"))
+    status = models.CharField(max_length=20, verbose_name=_("Monobank status"))
+    modified_date = models.DateTimeField(null=True, blank=True, verbose_name=_("Modified date"))
+    # SHA-256 of (invoice_id, status, modified_date), or of the whole payload
+    # when Monobank sent no usable modifiedDate; redeliveries collide on it.
+    dedup_key = models.CharField(max_length=64, unique=True)
+    payload = models.JSONField(default=dict)
+    state = models.CharField(max_length=10, choices=STATE_CHOICES, default=STATE_PENDING)
+    # Set by the run that claimed the event; the claim lapses at next_attempt_at.
+    claim = models.CharField(max_length=32, blank=True, default="")
+    # Admin chat ids already notified, so retries do not message them twice.
+    notified = models.JSONField(default=list, blank=True)
+    # Whether the order status transition of this event has been applied.
+    applied = models.BooleanField(default=False)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "webhook_event"
+        indexes = [
+            models.Index(fields=["state", "next_attempt_at"], name="webhook_event_due_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.invoice_id} {self.status} ({self.state})"
@@ -0,0 +1,109 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from products.models import Product, PromoCode
+from products.services import get_catalog_version
+
+
+class PricingError(ValueError):
+    pass
+
+
+def get_pricing_settings() -> dict:
+    conf = getattr(settings, "PAYMENT_PRICING", {})
+    return {
+        "SNAPSHOT_TTL": conf.get("SNAPSHOT_TTL", 60),
+    }
+
+
+def get_price_snapshot(articles) -> dict:
+    """
+    ``{article: {"name", "price", "available"}}`` with prices in kopecks.
+    Entries are cached per catalog version, so any product change retires
+    them; misses are loaded with one ``IN`` query.
+    """
+    articles = set(articles)
+    version = get_catalog_version()
+    keys = {f"pricing:v{version}:{article}": article for article in articles}
+    cached = cache.get_many(keys)
+    snapshot = {keys[key]: entry for key, entry in cached.items()}
+
+    missing = articles - snapshot.keys()
+    if missing:
+        loaded = {
+            article: {"name": name, "price": price * 100, "available": available}
+            for article, name, price, available in Product.objects.filter(
+                article__in=missing
+            ).values_list("article", "product_name_uk", "price_with_discount", "available")
+        }
+        cache.set_many(
+            {f"pricing:v{version}:{article}": entry for article, entry in loaded.items()},
+            get_pricing_settings()["SNAPSHOT_TTL"],
+        )
+        snapshot.update(loaded)
+    return snapshot
+
+
+def _get_promo(code):
+    if not code:
+        return None
+    try:
+        promo = PromoCode.objects.get(code__iexact=code)
+    except PromoCode.DoesNotExist:
+        raise PricingError("Promo code not found.")
+    if not promo.is_active:
+        raise PricingError("Sorry, the promo code is not active.")
+    return promo
+
+
+def price_cart(products, promocode=None, payment_option="full", amount=None) -> dict:
+    """
+    Price a cart from the catalog: ``products`` are ``{"article",
+    "number_of_items"}`` lines. Raises ``PricingError`` for unknown or
+    unavailable products and invalid promo codes. ``amount`` is what is
+    charged now: everything, or for a partial payment the client's
+    ``amount``, which must lie in ``(0, full_amount]``.
+    """
+    snapshot = get_price_snapshot(line["article"] for line in products)
+    unknown = [line["article"] for line in products if line["article"] not in snapshot]
+    if unknown:
+        raise PricingError(f"Unknown products: {', '.join(unknown)}.")
+    unavailable = [
+        line["article"] for line in products if not snapshot[line["article"]]["available"]
+    ]
+    if unavailable:
+        raise PricingError(f"Products not available: {', '.join(unavailable)}.")
+
+    lines = []
+    for line in products:
+        entry = snapshot[line["article"]]
+        lines.append({
+            "name": entry["name"],
+            "article": line["article"],
+            "number_of_items": line["number_of_items"],
+            "price_with_discount": entry["price"],
+        })
+    subtotal = sum(line["price_with_discount"] * line["number_of_items"] for line in lines)
+
+    promo = _get_promo(promocode)
+    discount_percent = promo.discount_percent if promo else 0
+    # Rounded up like Product.price_with_discount.
+    full_amount = (subtotal * (100 - discount_percent) + 99) // 100
+    if payment_option != "partial":
+        amount = full_amount
+    elif amount is None:
+        raise PricingError("amount is required for a partial payment.")
+    elif not 0 < amount <= full_amount:
+        raise PricingError(
+            f"Partial amount must be between 1 and {full_amount} kopecks."
+        )
+
+    return {
+        "products": lines,
+        "subtotal": subtotal,
+        "promocode": promo.code if promo else "",
+        "discount_percent": discount_percent,
+        "full_amount": full_amount,
+        "amount": amount,
+        "payment_option": payment_option,
+    }
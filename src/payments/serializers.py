@@ -2,17 +2,45 @@ from rest_framework import serializers
 
 
 class ProductItemSerializer(serializers.Serializer):
-    name = serializers.CharField(max_length=255)
     article = serializers.CharField(max_length=100)
     number_of_items = serializers.IntegerField(min_value=1)
-    price_with_discount = serializers.IntegerField(min_value=1)
+    # Accepted for older clients; names and prices come from the catalog.
+    name = serializers.CharField(max_length=255, required=False)
+    price_with_discount = serializers.IntegerField(min_value=1, required=False)
+
+
+class QuoteInSerializer(serializers.Serializer):
+    products = ProductItemSerializer(many=True, allow_empty=False)
+    promocode = serializers.CharField(max_length=64, required=False, allow_blank=True)
+    payment_option = serializers.ChoiceField(choices=["full", "partial"], default="full")
+    # What to charge now for a partial payment, in kopecks.
+    amount = serializers.IntegerField(min_value=1, required=False)
+
+
+class QuoteItemSerializer(serializers.Serializer):
+    name = serializers.CharField()
+    article = serializers.CharField()
+    number_of_items = serializers.IntegerField()
+    price_with_discount = serializers.IntegerField()
+
+
+class QuoteOutSerializer(serializers.Serializer):
+    products = QuoteItemSerializer(many=True)
+    subtotal = serializers.IntegerField()
+    promocode = serializers.CharField()
+    discount_percent = serializers.IntegerField()
+    full_amount = serializers.IntegerField()
+    amount = serializers.IntegerField()
+    payment_option = serializers.CharField()
 
 
 class CreateInvoiceInSerializer(serializers.Serializer):
     name = serializers.CharField(max_length=128)
     last_name = serializers.CharField(max_length=128)
-    amount = serializers.IntegerField(min_value=1)
-    full_amount = serializers.IntegerField(min_value=1)
+    # Only used for partial payments, checked against the computed total.
+    amount = serializers.IntegerField(min_value=1, required=False)
+    # Recomputed by payments.pricing; accepted for older clients.
+    full_amount = serializers.IntegerField(min_value=1, required=False)
     ccy = serializers.IntegerField(required=False, default=980)  # 980 = UAH
     phone = serializers.CharField(min_length=10, max_length=20)
     telegram_name = serializers.CharField(max_length=64, required=False, allow_blank=True)
@@ -21,7 +49,7 @@ class CreateInvoiceInSerializer(serializers.Serializer):
     warehouse = serializers.CharField(max_length=64, required=False, allow_blank=True)
     comment = serializers.CharField(max_length=512, required=False, allow_blank=True)
     payment_option = serializers.ChoiceField(choices=["full", "partial"], default="full")
-    products = ProductItemSerializer(many=True, required=True)
+    products = ProductItemSerializer(many=True, required=True, allow_empty=False)
     promocode = serializers.CharField(max_length=64, required=False, allow_blank=True)
 
     def validate(self, attrs):
@@ -5,9 +5,15 @@ import requests
 
 BOT_TOKEN = os.getenv("TELEGRAM_SHOP_BOT_TOKEN")
 
+def get_shop_admin_ids() -> list[int]:
+    admin_ids = os.getenv("SHOP_ADMIN_ID", "")
+    if not admin_ids:
+        return []
+    return [int(admin_id.strip()) for admin_id in admin_ids.split(",") if admin_id.strip()]
+
 def send_order_to_admin(chat_id: int, message: str, 
                         customer_first_name: str, customer_last_name: str,
-                        reference: str) -> None:
+                        reference: str) -> bool:
     
     keyboard = [[
         {
@@ -31,4 +37,5 @@ def send_order_to_admin(chat_id: int, message: str,
     respesonse = requests.post(url, json=payload, timeout=10)
 
     if not respesonse.ok:
-        print("Telegram API error:", respesonse.status_code, respesonse.text)
\ No newline at end of file
+        print("Telegram API error:", respesonse.status_code, respesonse.text)
+    return respesonse.ok
\ No newline at end of file
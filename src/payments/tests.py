@@ -1,3 +1,361 @@
-from django.test import TestCase
+import io
+from datetime import datetime, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from payments.models import Order, WebhookEvent
+from payments.pricing import get_price_snapshot
+from payments.utils import (ReferenceCodesExhausted, _permute,
+                            _reference_period, generate_reference_code,
+                            get_invoice_data, release_reference_code)
+from payments.webhooks import (SCHEDULED_KEY, _claim_batch,
+                               process_webhook_events,
+                               request_webhook_processing)
+from products.models import Product, ProductTypeCategory, PromoCode
+from products.search import reset_search_backend
+from products.services import bump_catalog_version
+
+
+LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+}
+
+INVOICE_REQUEST = {
+    "name": "Olena",
+    "last_name": "Koval",
+    "amount": 45000,
+    "full_amount": 45000,
+    "phone": "+380501234567",
+    "delivery_method": "nova_poshta",
+    "settlement": "Kyiv",
+    "warehouse": "12",
+    "products": [
+        {"name": "Shampoo", "article": "SH-001", "number_of_items": 2,
+         "price_with_discount": 15000},
+        {"name": "Mask", "article": "MS-002", "number_of_items": 1,
+         "price_with_discount": 15000},
+    ],
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PaymentsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.mocks = {}
+        reset_search_backend()
+        self.addCleanup(reset_search_backend)
+        for target, kwargs in [
+            ("payments.views.MonoClient.create_invoice", {"return_value": {
+                "status_code": 200,
+                "json": {"invoiceId": "inv-1", "pageUrl": "https://pay.example.com/inv-1"},
+            }}),
+            ("payments.views.MonoClient.verify_webhook_signature", {"return_value": True}),
+            ("payments.webhooks.send_order_to_admin", {"return_value": True}),
+            ("payments.webhooks.get_shop_admin_ids", {"return_value": [1, 2]}),
+            ("payments.webhooks.request_webhook_processing", {}),
+            ("products.signals.request_sitemap_ping", {}),
+        ]:
+            patcher = mock.patch(target, **kwargs)
+            self.mocks[target.rsplit(".", 1)[-1]] = patcher.start()
+            self.addCleanup(patcher.stop)
+        type_category = ProductTypeCategory.objects.create(
+            type_name_en="Hair", type_name_uk="Волосся"
+        )
+        for article, name, price in [("SH-001", "Shampoo", 150), ("MS-002", "Mask", 150)]:
+            Product.objects.create(
+                article=article, product_name_uk=name, product_name_en=name,
+                price=price, discount=0, available=True, type_category=type_category,
+                description_uk="Опис", description_en="Description", volume_ml=100,
+                ingredients="Aqua", application_uk="Застосування",
+                application_en="Application",
+            )
+
+    def create_invoice(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                reverse("payments:mono-create-invoice"), INVOICE_REQUEST, format="json"
+            )
+
+    def webhook(self, payload, process=True):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("payments:mono-webhook"), payload, format="json"
+            )
+        if process:
+            process_webhook_events()
+        return response
+
+
+class OrderLedgerTests(PaymentsTestCase):
+    def test_invoice_creation_writes_the_order_once(self):
+        response = self.create_invoice()
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get(invoice_id="inv-1")
+        self.assertEqual(order.reference, response.json()["reference"])
+        self.assertEqual(order.status, Order.STATUS_PENDING)
+        self.assertEqual(
+            list(order.items.values_list("article", "number_of_items")),
+            [("SH-001", 2), ("MS-002", 1)],
+        )
+
+    def test_paid_webhook_survives_cache_eviction(self):
+        self.create_invoice()
+        cache.clear()
+        response = self.webhook({"invoiceId": "inv-1", "status": "success"})
+        self.assertEqual(response.status_code, 200)
+
+        order = Order.objects.get(invoice_id="inv-1")
+        self.assertEqual(order.status, Order.STATUS_PAID)
+        self.assertIsNotNone(order.paid_at)
+        message = self.mocks["send_order_to_admin"].call_args.args[1]
+        self.assertIn("Koval", message)
+        self.assertIn("Shampoo SH-001 - 2", message)
+
+    def test_failed_invoice_is_marked_failed(self):
+        self.create_invoice()
+        self.webhook({"invoiceId": "inv-1", "status": "expired"})
+        self.assertEqual(Order.objects.get().status, Order.STATUS_FAILED)
+        self.mocks["send_order_to_admin"].assert_not_called()
+
+    def test_invoice_data_is_read_through_the_cache(self):
+        self.create_invoice()
+        cache.clear()
+        with self.assertNumQueries(2):
+            data = get_invoice_data("inv-1")
+        with self.assertNumQueries(0):
+            self.assertEqual(get_invoice_data("inv-1"), data)
+
+
+class WebhookProcessingTests(PaymentsTestCase):
+    def test_webhook_is_stored_and_acknowledged_without_sending(self):
+        self.create_invoice()
+        response = self.webhook({"invoiceId": "inv-1", "status": "success"}, process=False)
+        self.assertEqual(response.status_code, 200)
+        self.mocks["send_order_to_admin"].assert_not_called()
+        self.mocks["request_webhook_processing"].assert_called_once()
+        event = WebhookEvent.objects.get()
+        self.assertEqual((event.status, event.state), ("success", WebhookEvent.STATE_PENDING))
+
+        self.assertEqual(process_webhook_events(), {"done": 1, "retried": 0, "dead": 0})
+        self.assertEqual(self.mocks["send_order_to_admin"].call_count, 2)
+        self.assertEqual(Order.objects.get().status, Order.STATUS_PAID)
+
+    @override_settings(PAYMENT_WEBHOOKS={"RETRY_DELAY": 0, "MAX_ATTEMPTS": 3})
+    def test_failed_notifications_are_retried_for_the_missing_admins_only(self):
+        self.create_invoice()
+        send = self.mocks["send_order_to_admin"]
+        send.side_effect = lambda chat_id, *args: chat_id == 1 or send.call_count > 3
+
+        self.webhook({"invoiceId": "inv-1", "status": "success"})
+        event = WebhookEvent.objects.get()
+        self.assertEqual((event.state, event.attempts), (WebhookEvent.STATE_DONE, 2))
+        self.assertEqual(event.notified, [1, 2])
+        self.assertEqual([call.args[0] for call in send.call_args_list], [1, 2, 2, 2])
+
+    @override_settings(PAYMENT_WEBHOOKS={"RETRY_DELAY": 0, "MAX_ATTEMPTS": 2})
+    def test_events_are_parked_as_dead(self):
+        self.mocks["send_order_to_admin"].return_value = False
+        self.webhook({"invoiceId": "unknown", "status": "success", "amount": 100})
+        event = WebhookEvent.objects.get()
+        self.assertEqual((event.state, event.attempts), (WebhookEvent.STATE_DEAD, 2))
+        self.assertIn("Telegram notification failed", event.last_error)
+
+
+    def test_failing_event_does_not_hold_back_later_webhooks(self):
+        self.mocks["request_webhook_processing"].side_effect = request_webhook_processing
+        self.mocks["send_order_to_admin"].side_effect = [False, False, True, True]
+        self.create_invoice()
+        with mock.patch("products.background.threading.Timer") as timer:
+            self.webhook({"invoiceId": "inv-1", "status": "success"})
+            # The first run's window has passed.
+            cache.delete(SCHEDULED_KEY)
+            self.webhook(
+                {"invoiceId": "inv-2", "status": "success", "amount": 100}, process=False
+            )
+        self.assertEqual([call.args[0] for call in timer.call_args_list], [1, 30, 1])
+
+        process_webhook_events()
+        self.assertEqual(
+            WebhookEvent.objects.get(invoice_id="inv-2").state, WebhookEvent.STATE_DONE
+        )
+        self.assertEqual(
+            WebhookEvent.objects.get(invoice_id="inv-1").state, WebhookEvent.STATE_PENDING
+        )
+
+
+    def test_worker_command_picks_up_events_a_lost_timer_left_behind(self):
+        self.create_invoice()
+        self.webhook({"invoiceId": "inv-1", "status": "success"}, process=False)
+        with mock.patch(
+            "payments.management.commands.process_webhook_events.time.sleep",
+            side_effect=KeyboardInterrupt,
+        ), self.assertRaises(KeyboardInterrupt):
+            call_command("process_webhook_events", every=15, stdout=io.StringIO())
+        self.assertEqual(WebhookEvent.objects.get().state, WebhookEvent.STATE_DONE)
+        self.assertEqual(Order.objects.get().status, Order.STATUS_PAID)
+
+
+    def test_claimed_events_go_to_one_run_until_the_lease_ends(self):
+        self.webhook({"invoiceId": "inv-9", "status": "expired"}, process=False)
+        lease = timedelta(seconds=30)
+        self.assertEqual(len(_claim_batch(10, lease)), 1)
+        self.assertEqual(_claim_batch(10, lease), [])
+
+        WebhookEvent.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(len(_claim_batch(10, lease)), 1)
+
+
+class WebhookIdempotencyTests(PaymentsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.create_invoice()
+
+    def test_redelivered_webhook_is_stored_and_sent_once(self):
+        payload = {
+            "invoiceId": "inv-1", "status": "success",
+            "modifiedDate": "2026-10-18T10:00:00Z",
+        }
+        self.webhook(payload)
+        response = self.webhook(payload)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(WebhookEvent.objects.count(), 1)
+        self.assertEqual(self.mocks["send_order_to_admin"].call_count, 2)
+
+    def test_redelivery_without_a_modified_date_is_sent_once(self):
+        payload = {"invoiceId": "inv-1", "status": "success", "amount": 45000}
+        self.webhook(payload)
+        self.webhook(payload)
+        self.assertEqual(WebhookEvent.objects.count(), 1)
+        self.assertEqual(self.mocks["send_order_to_admin"].call_count, 2)
+
+    def test_repeated_status_with_a_new_date_sends_nothing(self):
+        self.webhook({"invoiceId": "inv-1", "status": "success",
+                      "modifiedDate": "2026-10-18T10:00:00Z"})
+        self.webhook({"invoiceId": "inv-1", "status": "success",
+                      "modifiedDate": "2026-10-18T10:05:00Z"})
+        self.assertEqual(WebhookEvent.objects.count(), 2)
+        self.assertEqual(self.mocks["send_order_to_admin"].call_count, 2)
+
+    def test_stale_status_does_not_undo_a_newer_one(self):
+        self.webhook({"invoiceId": "inv-1", "status": "reversed",
+                      "modifiedDate": "2026-10-18T11:00:00Z"})
+        self.webhook({"invoiceId": "inv-1", "status": "success",
+                      "modifiedDate": "2026-10-18T10:00:00Z"})
+        self.assertEqual(Order.objects.get().status, Order.STATUS_REFUNDED)
+        self.mocks["send_order_to_admin"].assert_not_called()
+
+
+class ReferenceCodeTests(PaymentsTestCase):
+    def test_permutation_is_a_bijection(self):
+        for size in (36, 1296, 46656):
+            codes = {_permute(n, size, b"key") for n in range(size)}
+            self.assertEqual(codes, set(range(size)))
+
+    @override_settings(ORDER_REFERENCES={"LENGTH": 1})
+    def test_codes_are_unique_until_exhausted(self):
+        codes = [generate_reference_code() for _ in range(36)]
+        self.assertEqual(len(set(codes)), 36)
+        self.assertTrue(all(len(code) == 2 for code in codes))
+        with self.assertRaises(ReferenceCodesExhausted):
+            generate_reference_code()
+
+    @override_settings(ORDER_REFERENCES={"LENGTH": 5})
+    def test_length_is_configurable(self):
+        self.assertEqual(len(generate_reference_code()), 6)
+
+    def test_released_code_is_no_longer_held(self):
+        code = generate_reference_code()
+        self.assertTrue(cache.get(f"reference_code:{code}"))
+        release_reference_code(code)
+        self.assertIsNone(cache.get(f"reference_code:{code}"))
+
+    def test_june_and_july_share_a_counter(self):
+        self.assertEqual(
+            _reference_period(datetime(2026, 7, 3)), _reference_period(datetime(2026, 6, 3))
+        )
+        self.assertNotEqual(
+            _reference_period(datetime(2026, 8, 3)), _reference_period(datetime(2026, 7, 3))
+        )
+
+    @override_settings(ORDER_REFERENCES={"LENGTH": 1})
+    def test_invoice_is_refused_once_references_run_out(self):
+        for _ in range(36):
+            generate_reference_code()
+        response = self.create_invoice()
+        self.assertEqual(response.status_code, 503)
+        self.mocks["create_invoice"].assert_not_called()
+
+
+class PricingTests(PaymentsTestCase):
+    def quote(self, **data):
+        data.setdefault("products", [
+            {"article": "SH-001", "number_of_items": 2},
+            {"article": "MS-002", "number_of_items": 1},
+        ])
+        return self.client.post(reverse("payments:quote"), data, format="json")
+
+    def test_quote_is_priced_from_the_catalog(self):
+        Product.objects.filter(article="SH-001").update(discount=10)
+        bump_catalog_version()
+        body = self.quote().json()
+        self.assertEqual(body["products"][0]["price_with_discount"], 13500)
+        self.assertEqual(body["full_amount"], 42000)
+        self.assertEqual(body["amount"], 42000)
+
+    def test_promo_code_and_partial_payment(self):
+        PromoCode.objects.create(
+            code="SPRING", discount_percent=10,
+            started_at=timezone.now() - timedelta(days=1),
+            expires_at=timezone.now() + timedelta(days=1),
+        )
+        body = self.quote(promocode="spring", payment_option="partial", amount=15000).json()
+        self.assertEqual(body["promocode"], "SPRING")
+        self.assertEqual(body["full_amount"], 40500)
+        self.assertEqual(body["amount"], 15000)
+
+    def test_partial_amount_must_fit_the_total(self):
+        for amount in (None, 45001):
+            data = {"payment_option": "partial"}
+            if amount:
+                data["amount"] = amount
+            response = self.quote(**data)
+            self.assertEqual(response.status_code, 400, amount)
+            self.assertIn("error", response.json())
+
+    def test_unavailable_and_unknown_products_are_refused(self):
+        Product.objects.filter(article="MS-002").update(available=False)
+        bump_catalog_version()
+        response = self.quote()
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("MS-002", response.json()["error"])
+        response = self.quote(products=[{"article": "NOPE", "number_of_items": 1}])
+        self.assertEqual(response.status_code, 400)
+
+    def test_snapshot_is_one_query_then_cached(self):
+        with self.assertNumQueries(1):
+            get_price_snapshot(["SH-001", "MS-002"])
+        with self.assertNumQueries(0):
+            self.assertEqual(get_price_snapshot(["SH-001"])["SH-001"]["price"], 15000)
+
+    def test_invoice_ignores_client_prices(self):
+        request = {**INVOICE_REQUEST, "amount": 1, "full_amount": 1, "products": [
+            {"name": "Shampoo", "article": "SH-001", "number_of_items": 2,
+             "price_with_discount": 1},
+        ]}
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("payments:mono-create-invoice"), request, format="json"
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.mocks["create_invoice"].call_args.args[0]["amount"], 30000)
+        order = Order.objects.get()
+        self.assertEqual((order.amount, order.full_amount), (30000, 30000))
+        self.assertEqual(order.items.get().price_with_discount, 15000)
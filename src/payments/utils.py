@@ -1,19 +1,100 @@
-import secrets
+import hashlib
+import hmac
 from datetime import datetime
+
+from django.conf import settings
 from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Now
+
+from payments.models import Order, OrderItem
 
 CACHE_TTL = 60 * 60 * 24  # 24h
 
+# Monobank invoice statuses that end an order.
+PAID_STATUSES = ("success", "paid")
+FAILED_STATUSES = ("failure", "expired", "canceled")
+REFUNDED_STATUSES = ("reversed", "refund", "refunded")
+
+REFERENCE_ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+MONTH_LETTERS = "JFMAMJJASOND"
+
 def cache_store_invoice(invoice_id: str, data: dict, ttl: int = CACHE_TTL):
     cache.set(f"invoice:{invoice_id}", data, ttl)
 
-def cache_pop_invoice(invoice_id: str):
+def create_order(invoice_id: str, reference: str, data: dict) -> Order:
+    """Write the order and its items once, then warm the invoice cache."""
+    with transaction.atomic():
+        order = Order.objects.create(
+            invoice_id=invoice_id,
+            reference=reference,
+            name=data["name"],
+            last_name=data["last_name"],
+            phone=data["phone"],
+            telegram_name=data.get("telegram_name") or "",
+            delivery_method=data.get("delivery_method") or "pickup",
+            settlement=data.get("settlement") or "",
+            warehouse=data.get("warehouse") or "",
+            comment=data.get("comment") or "",
+            amount=data["amount"],
+            full_amount=data["full_amount"],
+            ccy=data.get("ccy", 980),
+            payment_option=data.get("payment_option") or "full",
+            promocode=data.get("promocode") or "",
+        )
+        items = OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                name=product["name"],
+                article=product["article"],
+                number_of_items=product["number_of_items"],
+                price_with_discount=product["price_with_discount"],
+            )
+            for product in data.get("products", [])
+        ])
+    transaction.on_commit(
+        lambda: cache_store_invoice(invoice_id, order.as_invoice_data(items))
+    )
+    return order
+
+def get_invoice_data(invoice_id: str) -> dict | None:
+    """Read-through cache in front of the order ledger."""
     key = f"invoice:{invoice_id}"
     data = cache.get(key)
-    if data is not None:
-        cache.delete(key)
+    if data is None:
+        order = (
+            Order.objects.prefetch_related("items").filter(invoice_id=invoice_id).first()
+        )
+        if order is None:
+            return None
+        data = order.as_invoice_data()
+        cache_store_invoice(invoice_id, data)
     return data
 
+def update_order_status(invoice_id: str, mono_status: str, modified_at=None) -> int:
+    """
+    One indexed UPDATE by invoice id; returns the number of orders changed.
+    With Monobank's ``modified_at``, a status older than the one applied
+    last is ignored, so out-of-order webhooks cannot undo a transition.
+    """
+    if mono_status in PAID_STATUSES:
+        changes = {"status": Order.STATUS_PAID, "paid_at": Now()}
+    elif mono_status in FAILED_STATUSES:
+        changes = {"status": Order.STATUS_FAILED}
+    elif mono_status in REFUNDED_STATUSES:
+        changes = {"status": Order.STATUS_REFUNDED}
+    else:
+        return 0
+    # Repeating the current status changes nothing, so it triggers nothing.
+    orders = Order.objects.filter(invoice_id=invoice_id).exclude(status=changes["status"])
+    if modified_at is not None:
+        orders = orders.filter(
+            Q(status_modified_at__isnull=True) | Q(status_modified_at__lt=modified_at)
+        )
+        changes["status_modified_at"] = modified_at
+    return orders.update(**changes, updated_at=Now())
+
 def format_order_message(data: dict) -> str:
     lines = []
     lines.append("✅ Оплата успішна!")
@@ -51,19 +132,84 @@ def format_order_message(data: dict) -> str:
         lines.append(f"📝 Коментар: {data['comment']}")
     return "\n".join(lines)
 
-def generate_reference_code(ttl_seconds: int = CACHE_TTL * 30) -> str:
-    alphabet = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
-    month_letters = 'JFMAMJJASOND'
-    month_index = datetime.now().month
-    month_prefix = month_letters[month_index - 1]
+class ReferenceCodesExhausted(RuntimeError):
+    pass
+
+
+def get_reference_settings() -> dict:
+    conf = getattr(settings, "ORDER_REFERENCES", {})
+    return {
+        "LENGTH": conf.get("LENGTH", 3),
+        "KEY": conf.get("KEY", settings.SECRET_KEY),
+        "HOLD_DAYS": conf.get("HOLD_DAYS", 30),
+    }
+
+
+def _reference_period(now) -> str:
+    """Months sharing a letter back to back (June, July) share one counter."""
+    month = now.month
+    while month > 1 and MONTH_LETTERS[month - 2] == MONTH_LETTERS[month - 1]:
+        month -= 1
+    return f"{now.year}-{month:02d}"
 
+
+def _permute(number: int, size: int, key: bytes) -> int:
+    """
+    Keyed bijection of ``range(size)``: a 4-round Feistel network over the
+    smallest even bit width that fits, cycle-walked back into range.
+    """
+    half = ((size - 1).bit_length() + 1) // 2
+    mask = (1 << half) - 1
     while True:
-        random_part = ''.join(secrets.choice(alphabet) for _ in range(3))
-        reference_code = f"{month_prefix}{random_part}"
-        if not cache.get(f"reference_code:{reference_code}"):
-            cache.set(f"reference_code:{reference_code}", True, ttl_seconds)
+        left, right = number >> half, number & mask
+        for round_ in range(4):
+            digest = hmac.new(key, f"{round_}:{right}".encode(), hashlib.sha256).digest()
+            left, right = right, left ^ (int.from_bytes(digest[:8], "big") & mask)
+        number = left << half | right
+        if number < size:
+            return number
+
+
+def _next_counter(key: str, timeout: int) -> int:
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout)
+        return cache.incr(key)
+
+
+def generate_reference_code() -> str:
+    """
+    Month letter plus ``LENGTH`` base-36 characters. An atomic per-month
+    counter is mapped through a keyed permutation of the code space, so
+    codes look random but never repeat within the month; raises
+    ``ReferenceCodesExhausted`` once all of them are taken.
+    """
+    conf = get_reference_settings()
+    now = datetime.now()
+    period = _reference_period(now)
+    size = len(REFERENCE_ALPHABET) ** conf["LENGTH"]
+    key = f"{conf['KEY']}:{period}".encode()
+    hold = conf["HOLD_DAYS"] * CACHE_TTL
+
+    while True:
+        # The counter has to outlive its period, two months at most.
+        number = _next_counter(f"reference_counter:{period}", 62 * CACHE_TTL) - 1
+        if number >= size:
+            raise ReferenceCodesExhausted(
+                f"All {size} order references for {period} are taken."
+            )
+        number = _permute(number, size, key)
+        random_part = ""
+        for _ in range(conf["LENGTH"]):
+            number, digit = divmod(number, len(REFERENCE_ALPHABET))
+            random_part = REFERENCE_ALPHABET[digit] + random_part
+        reference_code = f"{MONTH_LETTERS[now.month - 1]}{random_part}"
+        # Only fails if the counter was lost while older codes are still held.
+        if cache.add(f"reference_code:{reference_code}", True, hold):
             return reference_code
-        
+
+
 def release_reference_code(reference_code: str):
     if not reference_code:
         return
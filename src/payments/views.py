@@ -1,44 +1,80 @@
-import os
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from django.db import transaction
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
 
 
+from payments.pricing import PricingError, price_cart
 from payments.serializers import (
     CreateInvoiceInSerializer,
     CreateInvoiceOutSerializer,
     InvoiceStatusSerializer,
+    QuoteInSerializer,
+    QuoteOutSerializer,
 )
 from payments.utils import (
-    cache_store_invoice,
-    cache_pop_invoice,
-    format_order_message,
+    ReferenceCodesExhausted,
+    create_order,
     generate_reference_code,
     release_reference_code,
 )
 from payments.api import MonoClient
-from payments.telegram_utils import send_order_to_admin
+from payments.webhooks import record_webhook_event
 
 
 
-def get_shop_admin_ids() -> list[int]:
-    admin_ids = os.getenv("SHOP_ADMIN_ID", "")
-    if not admin_ids:
-        return []
-    return [int(admin_id.strip()) for admin_id in admin_ids.split(",") if admin_id.strip()]
+class QuoteView(APIView):
+    """Cart totals as checkout will charge them, computed from the catalog."""
+
+    def post(self, request):
+        data_serializer = QuoteInSerializer(data=request.data)
+        data_serializer.is_valid(raise_exception=True)
+        valid_data = data_serializer.validated_data
+        try:
+            quote = price_cart(
+                valid_data["products"],
+                valid_data.get("promocode"),
+                valid_data["payment_option"],
+                valid_data.get("amount"),
+            )
+        except PricingError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(QuoteOutSerializer(quote).data)
+
 
 class CreateInvoiceView(APIView):
-    @transaction.atomic
+    # No transaction around the Monobank call: the order is written in one
+    # short transaction once the invoice exists.
     def post(self, request):
         data_serializer = CreateInvoiceInSerializer(data=request.data)
         data_serializer.is_valid(raise_exception=True)
         valid_data = data_serializer.validated_data
-
-        reference = generate_reference_code()
+        try:
+            quote = price_cart(
+                valid_data["products"],
+                valid_data.get("promocode"),
+                valid_data["payment_option"],
+                valid_data.get("amount"),
+            )
+        except PricingError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        valid_data.update(
+            amount=quote["amount"],
+            full_amount=quote["full_amount"],
+            products=quote["products"],
+            promocode=quote["promocode"],
+        )
+
+        try:
+            reference = generate_reference_code()
+        except ReferenceCodesExhausted as e:
+            print(f"Reference allocation error: {e}")
+            return Response(
+                {"detail": "No order references left"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
 
         payload = {
             "amount": valid_data["amount"],        
@@ -58,6 +94,7 @@ class CreateInvoiceView(APIView):
         out = client.create_invoice(payload)
 
         if out["status_code"] not in (200, 201):
+            release_reference_code(reference)
             return Response(
                 {"detail": "Monobank error", "monobank": out["json"]},
                 status=status.HTTP_502_BAD_GATEWAY,
@@ -69,23 +106,7 @@ class CreateInvoiceView(APIView):
             "reference": reference,
         }
 
-        cache_store_invoice(resp_data["invoice_id"], {
-            "name": valid_data.get("name"),
-            "last_name": valid_data.get("last_name"),
-            "phone": valid_data.get("phone"),
-            "telegram_name": valid_data.get("telegram_name"),
-            "delivery_method": valid_data.get("delivery_method"),
-            "settlement": valid_data.get("settlement"),
-            "warehouse": valid_data.get("warehouse"),
-            "comment": valid_data.get("comment"),
-            "amount": valid_data.get("amount"),
-            "full_amount": valid_data.get("full_amount"),
-            "reference": reference,
-            "ccy": valid_data.get("ccy", 980),
-            "payment_option": valid_data.get("payment_option"),
-            "products": valid_data.get("products"),
-            "promocode": valid_data.get("promocode"),
-        })
+        create_order(resp_data["invoice_id"], reference, valid_data)
 
         return Response(CreateInvoiceOutSerializer(resp_data).data, status=status.HTTP_201_CREATED)
 
@@ -100,50 +121,9 @@ class MonoWebhookView(APIView):
         if not MonoClient.verify_webhook_signature(request.body, x_sign):
             return Response({"detail": "Invalid signature"}, status=status.HTTP_403_FORBIDDEN)
         
-        data = request.data
-        status_value = str(data.get("status", "")).lower()
-        invoice_id = data.get("invoiceId")
-
-        if status_value in ("success", "paid"):
-            full = cache_pop_invoice(invoice_id) or {
-                "name": "-",
-                "last_name": "-",
-                "phone": "-",
-                "telegram_name": None,
-                "delivery_method": "pickup",
-                "settlement": None,
-                "warehouse": None,
-                "comment": None,
-                "amount": data.get("amount"),
-                "full_amount": data.get("amount"),
-                "reference": data.get("reference"),
-                "destination": data.get("destination"),
-                "ccy": data.get("ccy", 980),
-                "payment_option": "full",
-                "products": data.get("products", []),
-                "promocode": None,
-            }
-
-            message = format_order_message(full)
-            admin_ids = get_shop_admin_ids()
-
-            for admin_id in admin_ids:
-                try:
-                    send_order_to_admin(
-                        admin_id,
-                        message,
-                        full.get("name") or "-",
-                        full.get("last_name") or "-",
-                        full.get("reference") or "-",
-                    )
-                except Exception as e:
-                    print(f"Telegram send error: {e}")
-
-        elif status_value in ("failure", "expired", "reversed", "refund", "refunded", "canceled"):
-            full = cache_pop_invoice(invoice_id)
-            if full:
-                reference = full.get("reference")
-                release_reference_code(reference)
+        # Acknowledge at once; the order update and the Telegram fan-out run
+        # in the background with retries.
+        record_webhook_event(request.data)
 
         return Response({"ok": True}, status=status.HTTP_200_OK)
     
@@ -0,0 +1,226 @@
+import hashlib
+import json
+import logging
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from payments.models import Order, WebhookEvent
+from payments.telegram_utils import get_shop_admin_ids, send_order_to_admin
+from payments.utils import (FAILED_STATUSES, PAID_STATUSES, REFUNDED_STATUSES,
+                            format_order_message, get_invoice_data,
+                            release_reference_code, update_order_status)
+from products.background import run_later_once
+
+
+logger = logging.getLogger(__name__)
+
+SCHEDULED_KEY = "payments-webhooks:scheduled"
+# Retries claim their own slot, so a pending retry never holds back the
+# short-delay run that fresh webhooks ask for.
+RETRY_KEY = "payments-webhooks:retry"
+
+
+def get_webhook_settings() -> dict:
+    conf = getattr(settings, "PAYMENT_WEBHOOKS", {})
+    return {
+        "PROCESS_DELAY": conf.get("PROCESS_DELAY", 1),
+        "BATCH_SIZE": conf.get("BATCH_SIZE", 50),
+        "MAX_ATTEMPTS": conf.get("MAX_ATTEMPTS", 8),
+        "RETRY_DELAY": conf.get("RETRY_DELAY", 30),
+    }
+
+
+def _dedup_key(data: dict, modified_date) -> str:
+    if modified_date is not None:
+        invoice_id, status = data.get("invoiceId") or "", str(data.get("status", "")).lower()
+        source = f"{invoice_id}:{status}:{modified_date.isoformat()}"
+    else:
+        source = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(source.encode()).hexdigest()
+
+
+def record_webhook_event(data: dict) -> WebhookEvent | None:
+    """
+    Persist a verified webhook and schedule processing; nothing slow happens
+    here. A redelivery of the same ``(invoiceId, status, modifiedDate)``,
+    or of the same payload when it has no usable ``modifiedDate``, hits
+    the unique ``dedup_key`` and returns ``None``.
+    """
+    try:
+        modified_date = parse_datetime(str(data.get("modifiedDate") or ""))
+    except ValueError:
+        modified_date = None
+    if modified_date is None:
+        logger.debug("Webhook without a usable modifiedDate: %s", data.get("invoiceId"))
+    try:
+        with transaction.atomic():
+            event = WebhookEvent.objects.create(
+                invoice_id=data.get("invoiceId") or "",
+                status=str(data.get("status", "")).lower(),
+                modified_date=modified_date,
+                dedup_key=_dedup_key(data, modified_date),
+                payload=data,
+            )
+    except IntegrityError:
+        return None
+    transaction.on_commit(request_webhook_processing)
+    return event
+
+
+def request_webhook_processing(delay=None) -> None:
+    if delay is None:
+        delay = get_webhook_settings()["PROCESS_DELAY"]
+    run_later_once(SCHEDULED_KEY, delay, process_webhook_events)
+
+
+def _request_retry_run(delay) -> None:
+    run_later_once(RETRY_KEY, delay, process_webhook_events)
+
+
+def _placeholder_order(payload: dict) -> dict:
+    """What the notification shows for an invoice with no order row."""
+    return {
+        "name": "-",
+        "last_name": "-",
+        "phone": "-",
+        "telegram_name": None,
+        "delivery_method": "pickup",
+        "settlement": None,
+        "warehouse": None,
+        "comment": None,
+        "amount": payload.get("amount"),
+        "full_amount": payload.get("amount"),
+        "reference": payload.get("reference"),
+        "destination": payload.get("destination"),
+        "ccy": payload.get("ccy", 980),
+        "payment_option": "full",
+        "products": payload.get("products", []),
+        "promocode": None,
+    }
+
+
+def _notify_admins(event, full: dict) -> None:
+    message = format_order_message(full)
+    failed = []
+    for admin_id in get_shop_admin_ids():
+        if admin_id in event.notified:
+            continue
+        try:
+            sent = send_order_to_admin(
+                admin_id,
+                message,
+                full.get("name") or "-",
+                full.get("last_name") or "-",
+                full.get("reference") or "-",
+            )
+        except Exception:
+            logger.exception("Telegram send to admin %s failed", admin_id)
+            sent = False
+        if sent:
+            event.notified.append(admin_id)
+        else:
+            failed.append(admin_id)
+    if failed:
+        raise RuntimeError(f"Telegram notification failed for {failed}")
+
+
+def handle_webhook_event(event) -> None:
+    """
+    Order transition, admin notification and reference release for one
+    event. The transition is applied once; an event that changes nothing,
+    being stale or a repeat of the current status, has no side effects.
+    Retries only redo the side effects that failed.
+    """
+    if not event.applied:
+        with transaction.atomic():
+            changed = update_order_status(
+                event.invoice_id, event.status, event.modified_date
+            )
+            if not changed and Order.objects.filter(invoice_id=event.invoice_id).exists():
+                return
+            event.applied = True
+            event.save(update_fields=["applied"])
+    if event.status in PAID_STATUSES:
+        full = get_invoice_data(event.invoice_id) or _placeholder_order(event.payload)
+        _notify_admins(event, full)
+    elif event.status in FAILED_STATUSES + REFUNDED_STATUSES:
+        full = get_invoice_data(event.invoice_id)
+        if full:
+            release_reference_code(full.get("reference"))
+
+
+def _claim_batch(batch_size, lease):
+    """
+    Take due events with a conditional UPDATE, so two runs never get the
+    same event even without row locks (SQLite has none). Claimed events
+    whose lease ran out, after a run died, are due again.
+    """
+    now = timezone.now()
+    due = WebhookEvent.objects.filter(
+        state__in=[WebhookEvent.STATE_PENDING, WebhookEvent.STATE_CLAIMED],
+        next_attempt_at__lte=now,
+    )
+    candidates = list(
+        due.order_by("created_at", "id").values_list("pk", flat=True)[:batch_size]
+    )
+    if not candidates:
+        return []
+    claim = uuid.uuid4().hex
+    due.filter(pk__in=candidates).update(
+        state=WebhookEvent.STATE_CLAIMED, claim=claim, next_attempt_at=now + lease
+    )
+    return list(WebhookEvent.objects.filter(claim=claim).order_by("created_at", "id"))
+
+
+def process_webhook_events() -> dict:
+    """
+    Handle every due event in arrival order. Failures are retried with
+    exponential backoff and parked as dead after ``MAX_ATTEMPTS``; while
+    any event is pending, a retry run is kept scheduled.
+    """
+    conf = get_webhook_settings()
+    lease = timedelta(seconds=conf["RETRY_DELAY"])
+    report = {"done": 0, "retried": 0, "dead": 0}
+
+    while batch := _claim_batch(conf["BATCH_SIZE"], lease):
+        for event in batch:
+            try:
+                handle_webhook_event(event)
+            except Exception as e:
+                event.attempts += 1
+                event.last_error = str(e)[:1000]
+                if event.attempts >= conf["MAX_ATTEMPTS"]:
+                    event.state = WebhookEvent.STATE_DEAD
+                    report["dead"] += 1
+                else:
+                    event.state = WebhookEvent.STATE_PENDING
+                    event.next_attempt_at = timezone.now() + timedelta(
+                        seconds=conf["RETRY_DELAY"] * 2 ** (event.attempts - 1)
+                    )
+                    report["retried"] += 1
+            else:
+                event.state = WebhookEvent.STATE_DONE
+                report["done"] += 1
+            event.save(update_fields=[
+                "state", "applied", "notified", "attempts", "last_error", "next_attempt_at"
+            ])
+
+    upcoming = (
+        WebhookEvent.objects.filter(
+            state__in=[WebhookEvent.STATE_PENDING, WebhookEvent.STATE_CLAIMED]
+        )
+        .order_by("next_attempt_at")
+        .values_list("next_attempt_at", flat=True)
+        .first()
+    )
+    if upcoming is not None:
+        # Re-check at least every RETRY_DELAY seconds rather than sleeping
+        # through a long backoff on a timer a worker restart would lose.
+        delay = max((upcoming - timezone.now()).total_seconds(), 0)
+        _request_retry_run(min(delay + conf["PROCESS_DELAY"], conf["RETRY_DELAY"]))
+    return report
@@ -1,27 +1,50 @@
-from django.db.models import Count, Q
+import io
+
+from django.db.models import Case, Count, IntegerField, Prefetch, When
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.translation import get_language
 from django.utils.translation import gettext_lazy as _
 from django.utils.timezone import now
 from django_filters import CharFilter, ModelMultipleChoiceFilter
 from django_filters.rest_framework import (BooleanFilter, DjangoFilterBackend,
                                            FilterSet, NumberFilter)
-from rest_framework import status, viewsets
+from rest_framework import generics, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
-from rest_framework.filters import SearchFilter
+from rest_framework.filters import OrderingFilter, SearchFilter
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
-
+from rest_framework.views import APIView
+from users.constants import Role
+
+from products.caching import (CATALOG_CACHE_GROUP, CachedResponseMixin,
+                              get_response_cache_stats, normalize_query_string)
+from products.catalog_io import (get_format, import_products, iter_export_lines,
+                                 read_rows)
+from products.direct_uploads import DirectUploadError, confirm_upload, sign_upload
+from products.facets import get_product_facets
 from products.models import (BannerProduct, Product, ProductPurposeCategory,
                              ProductReview, ProductTypeCategory, PromoCode)
+from products.pagination import ProductPagination
 from products.permissions import (ReviewPermission, RoleIsAdmin, RoleIsManager,
                                   RoleIsUser)
+from products.search import get_search_backend
+from products.services import (bulk_update_prices, delete_review,
+                               get_bulk_queryset, set_review_approval)
 from products.serializers import (BannerProductSerializer,
+                                  DirectUploadConfirmSerializer,
+                                  DirectUploadSignSerializer,
+                                  ProductBulkPriceSerializer,
+                                  ProductListSerializer,
                                   ProductPurposeCategorySerializer,
                                   ProductReviewSerializer, ProductSerializer,
+                                  ProductSuggestQuerySerializer,
                                   ProductTypeCategorySerializer,
                                   PromoCodeSerializer,
                                   PromoCodeValidateResponseSerializer,
                                   PromoCodeValidateSerializer)
+from products.suggest import suggest_products
 
 
 class CaseInsensitiveSearchFilter(SearchFilter):
@@ -29,34 +52,23 @@ class CaseInsensitiveSearchFilter(SearchFilter):
         search_query = self.get_search_terms(request)
         if not search_query:
             return queryset
-        search_query_lower = [term.lower() for term in search_query]
-        name_uk_values = list(
-            queryset.values_list("product_name_uk", flat=True)
-            )
-        name_en_values = list(
-            queryset.values_list("product_name_en", flat=True)
-            )
-        matching_uk = [
-            name
-            for name in name_uk_values
-            if any(term in name.lower() for term in search_query_lower)
-        ]
-        matching_en = [
-            name
-            for name in name_en_values
-            if any(term in name.lower() for term in search_query_lower)
-        ]
-        q_objects = Q(product_name_uk__in=matching_uk) | Q(
-            product_name_en__in=matching_en
-        )
-        filtered_queryset = queryset.filter(q_objects)
-
-        if not filtered_queryset.exists():
+        # Filter backends run first; a filtered catalog is searched as a
+        # whole so the ``LIMIT`` cap cannot crowd out its matches.
+        ids = None
+        if queryset.query.where:
+            ids = set(queryset.values_list("id", flat=True))
+        product_ids = get_search_backend().search(" ".join(search_query), ids=ids)
+        if not product_ids:
             raise ValidationError(
                 {"error": "No products found for the given search term."}
             )
 
-        return filtered_queryset
+        relevance = Case(
+            *[When(id=product_id, then=position)
+              for position, product_id in enumerate(product_ids)],
+            output_field=IntegerField(),
+        )
+        return queryset.filter(id__in=product_ids).order_by(relevance)
 
 
 class ProductFilter(FilterSet):
@@ -73,9 +85,7 @@ class ProductFilter(FilterSet):
         field_name="price_with_discount", lookup_expr="lte", label="Max Price"
         )
     type = ModelMultipleChoiceFilter(
-        queryset=ProductTypeCategory.objects.annotate(
-            product_count=Count("products")
-            ),
+        queryset=ProductTypeCategory.objects.all(),
         field_name="type_category",
         to_field_name="id",
         label="Type Category",
@@ -114,17 +124,19 @@ class PromoCodeFilter(FilterSet):
             return queryset.exclude(started_at__lte=time_now, expires_at__gte=time_now)
 
 
-class ProductPurposeCategoryViewSet(viewsets.ModelViewSet):
+class ProductPurposeCategoryViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     queryset = ProductPurposeCategory.objects.all()
     serializer_class = ProductPurposeCategorySerializer
+    cache_group = CATALOG_CACHE_GROUP
     permission_classes = [RoleIsAdmin | RoleIsManager | RoleIsUser]
 
 
-class ProductTypeCategoryViewSet(viewsets.ModelViewSet):
+class ProductTypeCategoryViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     queryset = ProductTypeCategory.objects.annotate(
         product_count=Count("products")
         )
     serializer_class = ProductTypeCategorySerializer
+    cache_group = CATALOG_CACHE_GROUP
     permission_classes = [RoleIsAdmin | RoleIsManager | RoleIsUser]
 
     def destroy(self, request, *args, **kwargs):
@@ -142,14 +154,180 @@ class ProductTypeCategoryViewSet(viewsets.ModelViewSet):
         return super().destroy(request, *args, **kwargs)
 
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     queryset = Product.objects.all().order_by("price_with_discount")
     serializer_class = ProductSerializer
-    filter_backends = [DjangoFilterBackend, CaseInsensitiveSearchFilter]
+    cache_group = CATALOG_CACHE_GROUP
+    filter_backends = [DjangoFilterBackend, CaseInsensitiveSearchFilter, OrderingFilter]
     filterset_class = ProductFilter
     search_fields = ["product_name_uk", "product_name_en"]
+    ordering_fields = ["price_with_discount", "rating_avg", "rating_count"]
+    pagination_class = ProductPagination
     permission_classes = [RoleIsAdmin | RoleIsManager | RoleIsUser]
 
+    def get_serializer_class(self):
+        user = self.request.user
+        if self.action == "list" and not (
+            user.is_authenticated and user.role in [Role.ADMIN, Role.MANAGER]
+        ):
+            return ProductListSerializer
+        return super().get_serializer_class()
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        expand = self.request.query_params.get("expand", "")
+        if self.get_serializer_class() is ProductSerializer or expand:
+            return queryset.with_detail_relations()
+        return queryset.with_card_relations()
+
+    @action(
+            detail=False,
+            methods=["post"],
+            url_path="bulk-price",
+            permission_classes=[RoleIsAdmin | RoleIsManager],
+            serializer_class=ProductBulkPriceSerializer
+            )
+    def bulk_price(self, request):
+        serializer = ProductBulkPriceSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        queryset = get_bulk_queryset(
+            articles=data.get("articles"),
+            type_category=data.get("type_category"),
+            purpose_category=data.get("purpose_category"),
+        )
+        updated = bulk_update_prices(
+            queryset,
+            price=data.get("price"),
+            price_percent=data.get("price_percent"),
+            discount=data.get("discount"),
+        )
+        return Response({"updated": updated}, status=status.HTTP_200_OK)
+
+
+class ProductSuggestView(APIView):
+    """
+    Autocomplete for the storefront search box: id, name and price of the
+    products whose name has a word starting with ``q``.
+    """
+    authentication_classes = []
+    permission_classes = []
+
+    def get(self, request):
+        query_serializer = ProductSuggestQuerySerializer(data=request.query_params)
+        query_serializer.is_valid(raise_exception=True)
+        suggestions = suggest_products(
+            query_serializer.validated_data["q"],
+            get_language(),
+            query_serializer.validated_data["limit"],
+        )
+        return Response(suggestions, status=status.HTTP_200_OK)
+
+
+class ProductFacetsView(generics.GenericAPIView):
+    """
+    Sidebar counts for the products matching the same filters and search
+    as ``products_list``: per type and purpose category, per flag and per
+    price bucket, plus the price range.
+    """
+    queryset = Product.objects.all()
+    filter_backends = [DjangoFilterBackend, CaseInsensitiveSearchFilter]
+    filterset_class = ProductFilter
+    search_fields = ["product_name_uk", "product_name_en"]
+    pagination_class = None
+    permission_classes = []
+
+    def get(self, request):
+        # Search and filtering only run when the facets are not cached.
+        facets = get_product_facets(
+            normalize_query_string(request.query_params),
+            lambda: self.filter_queryset(self.get_queryset()),
+        )
+        return Response(facets, status=status.HTTP_200_OK)
+
+
+class ProductExportView(APIView):
+    """Streams the whole catalog as ``?file_format=csv`` (default) or ``jsonl``."""
+    permission_classes = [RoleIsAdmin | RoleIsManager]
+
+    def get(self, request):
+        try:
+            file_format = get_format("", request.query_params.get("file_format", "csv"))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        content_type = "text/csv" if file_format == "csv" else "application/jsonl"
+        response = StreamingHttpResponse(
+            iter_export_lines(file_format), content_type=f"{content_type}; charset=utf-8"
+        )
+        response["Content-Disposition"] = f'attachment; filename="products.{file_format}"'
+        return response
+
+
+class ProductImportView(APIView):
+    """
+    Upserts products by article from an uploaded CSV or JSONL ``file`` and
+    returns the number of imported rows and the errors per line.
+    """
+    permission_classes = [RoleIsAdmin | RoleIsManager]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response(
+                {"error": "A CSV or JSONL file is required."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            file_format = get_format(upload.name, request.data.get("file_format"))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        stream = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+        report = import_products(read_rows(stream, file_format))
+        return Response(report, status=status.HTTP_200_OK)
+
+
+class DirectUploadSignView(APIView):
+    """
+    Signed parameters for uploading one image from the browser straight to
+    Cloudinary, so the file body never passes through our workers.
+    """
+    permission_classes = [RoleIsAdmin | RoleIsManager]
+
+    def post(self, request):
+        serializer = DirectUploadSignSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            params = sign_upload(**serializer.validated_data)
+        except DirectUploadError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(params, status=status.HTTP_200_OK)
+
+
+class DirectUploadConfirmView(APIView):
+    """Attaches a finished direct upload to its product, banner or blog slot."""
+    permission_classes = [RoleIsAdmin | RoleIsManager]
+
+    def post(self, request):
+        serializer = DirectUploadConfirmSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            obj = confirm_upload(**serializer.validated_data)
+        except DirectUploadError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(
+            {"id": obj.id, "public_id": serializer.validated_data["public_id"]},
+            status=status.HTTP_201_CREATED,
+        )
+
+
+class ResponseCacheStatsView(APIView):
+    permission_classes = [RoleIsAdmin | RoleIsManager]
+
+    def get(self, request):
+        return Response(get_response_cache_stats(), status=status.HTTP_200_OK)
+
 
 class ProductReviewViewSet(viewsets.ModelViewSet):
     serializer_class = ProductReviewSerializer
@@ -158,7 +336,9 @@ class ProductReviewViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         product_id = self.kwargs.get("product_id")
         if product_id:
-            return ProductReview.objects.filter(product_id=product_id)
+            return ProductReview.objects.filter(
+                product_id=product_id
+            ).select_related("product")
         return ProductReview.objects.none()
 
     def create(self, request, *args, **kwargs):
@@ -170,6 +350,7 @@ class ProductReviewViewSet(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
 
         product = get_object_or_404(Product, id=product_id)
+        # New reviews only count towards the product rating once approved.
         serializer.save(product=product, is_approved=False)
         return Response(serializer.data, status=201)
 
@@ -188,8 +369,7 @@ class ProductReviewViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
                 )
         review = get_object_or_404(ProductReview, pk=pk, product_id=product_id)
-        review.is_approved = True
-        review.save()
+        set_review_approval(review, approved=True)
         return Response({"status": "approved"}, status=status.HTTP_200_OK)
 
     @action(
@@ -207,10 +387,12 @@ class ProductReviewViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
                 )
         review = get_object_or_404(ProductReview, pk=pk, product_id=product_id)
-        review.is_approved = False
-        review.save()
+        set_review_approval(review, approved=False)
         return Response({"status": "rejected"}, status=status.HTTP_200_OK)
 
+    def perform_destroy(self, instance):
+        delete_review(instance)
+
 
 class PromoCodeViewSet(viewsets.ModelViewSet):
     queryset = PromoCode.objects.all()
@@ -260,14 +442,17 @@ class PromoCodeViewSet(viewsets.ModelViewSet):
         return super().filter_queryset(queryset)
 
 
-class BannerProductViewSet(viewsets.ModelViewSet):
-    queryset = BannerProduct.objects.all()
+class BannerProductViewSet(CachedResponseMixin, viewsets.ModelViewSet):
+    queryset = BannerProduct.objects.prefetch_related(
+        Prefetch("product", queryset=Product.objects.with_card_relations())
+    )
     serializer_class = BannerProductSerializer
+    cache_group = CATALOG_CACHE_GROUP
     permission_classes = [RoleIsAdmin | RoleIsManager | RoleIsUser]
 
 
 class AllProductReviewViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = ProductReview.objects.all()
+    queryset = ProductReview.objects.select_related("product")
     serializer_class = ProductReviewSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ["is_approved"]
@@ -282,5 +467,5 @@ class AllProductReviewViewSet(viewsets.ReadOnlyModelViewSet):
                     {"is_approved": "Must be either 'true' or 'false'."}
                     )
             bool_value = value == "true"
-            return ProductReview.objects.filter(is_approved=bool_value)
-        return ProductReview.objects.all()
+            return self.queryset.filter(is_approved=bool_value)
+        return self.queryset.all()
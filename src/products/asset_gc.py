@@ -0,0 +1,86 @@
+from datetime import timedelta
+from itertools import islice
+
+from django.apps import apps
+from django.utils import timezone
+
+from products.assets import get_asset_client, get_assets_settings, get_public_id
+from products.models import AssetDeletion, ImageAsset
+
+
+# Every model field that stores a Cloudinary asset.
+REFERENCE_FIELDS = [
+    ("products.ProductImage", "image"),
+    ("products.ProductPurposeCategory", "image"),
+    ("products.BannerProduct", "image"),
+    ("products.BannerProduct", "background_image"),
+    ("blog.BlogImage", "image"),
+]
+
+
+def get_referenced_public_ids() -> set[str]:
+    """Public ids any row still points at, plus the indexed and queued ones."""
+    referenced = set()
+    for label, field in REFERENCE_FIELDS:
+        values = (
+            apps.get_model(label).objects.exclude(**{f"{field}__isnull": True})
+            .values_list(field, flat=True)
+            .iterator(chunk_size=2000)
+        )
+        referenced.update(get_public_id(value) for value in values)
+    referenced.update(ImageAsset.objects.values_list("public_id", flat=True))
+    # Queued assets are deleted by the outbox, with its retries.
+    referenced.update(AssetDeletion.objects.values_list("public_id", flat=True))
+    referenced.discard(None)
+    referenced.discard("")
+    return referenced
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def collect_orphaned_assets(client=None, grace_period=None, dry_run=False) -> dict:
+    """
+    Delete Cloudinary assets no row references. The listing is paged and
+    diffed against the referenced set page by page; assets younger than the
+    grace period are skipped, which covers uploads whose row is not
+    committed yet. ``dry_run`` only reports what would be deleted.
+    """
+    conf = get_assets_settings()
+    client = client or get_asset_client()
+    if grace_period is None:
+        grace_period = conf["ORPHAN_GRACE_PERIOD"]
+    # Read the references first: anything referenced after this point was
+    # uploaded after it, so it is still inside the grace period.
+    referenced = get_referenced_public_ids()
+    cutoff = timezone.now() - timedelta(seconds=grace_period)
+    report = {"scanned": 0, "orphaned": 0, "deleted": 0, "failed": 0, "orphans": []}
+
+    resources = client.list_resources(prefix=conf["ORPHAN_PREFIX"])
+    for page in _chunks(resources, conf["DELETE_BATCH_SIZE"]):
+        report["scanned"] += len(page)
+        orphans = sorted(
+            {public_id for public_id, created_at in page if created_at < cutoff}
+            - referenced
+        )
+        if not orphans:
+            continue
+        report["orphaned"] += len(orphans)
+        if dry_run:
+            report["orphans"].extend(orphans)
+            continue
+        try:
+            results = client.delete(orphans)
+        except Exception as e:
+            print(f"Cloudinary delete error: {e}")
+            report["failed"] += len(orphans)
+            continue
+        deleted = sum(
+            results.get(public_id) in ("deleted", "not_found") for public_id in orphans
+        )
+        report["deleted"] += deleted
+        report["failed"] += len(orphans) - deleted
+    return report
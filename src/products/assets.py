@@ -0,0 +1,400 @@
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import timedelta
+
+import cloudinary
+import cloudinary.api
+import cloudinary.uploader
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.module_loading import import_string
+
+from products.background import run_later_once
+from products.images import content_hash, get_image_settings, perceptual_hash
+from products.models import AssetDeletion, ImageAsset
+
+
+DRAIN_SCHEDULED_KEY = "asset-deletion:scheduled"
+
+
+def get_assets_settings() -> dict:
+    conf = getattr(settings, "CLOUDINARY_ASSETS", {})
+    return {
+        "CLIENT": conf.get("CLIENT", "products.assets.CloudinaryAssetClient"),
+        "DELETE_BATCH_SIZE": conf.get("DELETE_BATCH_SIZE", 100),
+        "MAX_ATTEMPTS": conf.get("MAX_ATTEMPTS", 5),
+        "RETRY_DELAY": conf.get("RETRY_DELAY", 60),
+        "DRAIN_DELAY": conf.get("DRAIN_DELAY", 5),
+        "UPLOAD_WORKERS": conf.get("UPLOAD_WORKERS", 5),
+        "DIRECT_UPLOAD_TTL": conf.get("DIRECT_UPLOAD_TTL", 600),
+        "ORPHAN_GRACE_PERIOD": conf.get("ORPHAN_GRACE_PERIOD", 60 * 60 * 24),
+        "ORPHAN_PREFIX": conf.get("ORPHAN_PREFIX", ""),
+    }
+
+
+class CloudinaryAssetClient:
+    """The Cloudinary API calls used for uploads and asset housekeeping."""
+
+    def upload(self, file, resource_type="image"):
+        """Upload one file and return the CloudinaryResource to store on a model."""
+        if hasattr(file, "seek"):
+            file.seek(0)
+        return cloudinary.uploader.upload_resource(
+            file, type="upload", resource_type=resource_type
+        )
+
+    def resource(self, public_id, resource_type="image") -> dict:
+        """Stored metadata of one asset: format, bytes, width, height..."""
+        return cloudinary.api.resource(public_id, resource_type=resource_type)
+
+    def list_resources(self, resource_type="image", prefix=""):
+        """Yield ``(public_id, created_at)`` for every uploaded asset, page by page."""
+        cursor = None
+        while True:
+            options = {"type": "upload", "resource_type": resource_type, "max_results": 500}
+            if prefix:
+                options["prefix"] = prefix
+            if cursor:
+                options["next_cursor"] = cursor
+            page = cloudinary.api.resources(**options)
+            for resource in page.get("resources", []):
+                yield resource["public_id"], parse_datetime(resource["created_at"])
+            cursor = page.get("next_cursor")
+            if not cursor:
+                return
+
+    def delete(self, public_ids, resource_type="image") -> dict:
+        """Map each public_id to Cloudinary's result, e.g. "deleted" or "not_found"."""
+        response = cloudinary.api.delete_resources(
+            public_ids, resource_type=resource_type
+        )
+        return response.get("deleted", {})
+
+
+def get_asset_client():
+    return import_string(get_assets_settings()["CLIENT"])()
+
+
+def get_public_id(asset) -> str | None:
+    if not asset:
+        return None
+    return getattr(asset, "public_id", None) or str(asset).rsplit(".", 1)[0]
+
+
+def discard_uploads(resources, client=None) -> None:
+    """Best-effort synchronous delete of assets nothing will reference."""
+    public_ids = [get_public_id(resource) for resource in resources]
+    if not public_ids:
+        return
+    try:
+        (client or get_asset_client()).delete(public_ids)
+    except Exception as e:
+        print(f"Cloudinary delete error: {e}")
+
+
+def upload_files(files, client=None) -> list:
+    """
+    Upload ``files`` concurrently on a bounded thread pool and return their
+    resources in the same order. If any upload fails, the ones that made
+    it are destroyed and the first error is raised.
+    """
+    files = list(files)
+    if not files:
+        return []
+    client = client or get_asset_client()
+    workers = min(len(files), get_assets_settings()["UPLOAD_WORKERS"])
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(client.upload, file) for file in files]
+        wait(futures)
+
+    errors = [future.exception() for future in futures if future.exception()]
+    if errors:
+        discard_uploads(
+            [future.result() for future in futures if not future.exception()], client
+        )
+        raise errors[0]
+    return [future.result() for future in futures]
+
+
+def _as_resource(asset):
+    return cloudinary.CloudinaryResource(
+        public_id=asset.public_id,
+        version=asset.version,
+        format=asset.format or None,
+        type="upload",
+        resource_type=asset.resource_type,
+    )
+
+
+def _find_known_assets(hashes):
+    known = {
+        asset.sha256: asset.pk
+        for asset in ImageAsset.objects.filter(sha256__in=[sha for sha, _ in hashes])
+    }
+    phashes = {phash for sha, phash in hashes if phash and sha not in known}
+    if phashes:
+        by_phash = dict(
+            ImageAsset.objects.filter(phash__in=phashes)
+            .order_by("-pk")
+            .values_list("phash", "pk")
+        )
+        for sha, phash in hashes:
+            if sha not in known and phash in by_phash:
+                known[sha] = by_phash[phash]
+    return known
+
+
+class _AssetReleased(Exception):
+    pass
+
+
+def _take_references(hashes, known, new_assets):
+    """Lock the matching index rows, add the references and return one asset per file."""
+    with transaction.atomic():
+        ImageAsset.objects.bulk_create(new_assets, ignore_conflicts=True)
+        locked = list(
+            ImageAsset.objects.select_for_update()
+            .filter(Q(sha256__in=[sha for sha, _ in hashes]) | Q(pk__in=known.values()))
+            .order_by("pk")
+        )
+        by_sha = {asset.sha256: asset for asset in locked}
+        by_pk = {asset.pk: asset for asset in locked}
+        assets = []
+        for sha, _ in hashes:
+            asset = by_sha.get(sha) or by_pk.get(known.get(sha))
+            if asset is None:
+                # Its last reference went between the lookup and the lock.
+                raise _AssetReleased
+            assets.append(asset)
+        for pk, count in Counter(asset.pk for asset in assets).items():
+            ImageAsset.objects.filter(pk=pk).update(ref_count=F("ref_count") + count)
+    return assets
+
+
+def _upload_unknown(files, hashes, client):
+    """Look the files up in the index and upload, once each, the contents it lacks."""
+    known = _find_known_assets(hashes)
+    pending = {}
+    for file, (sha, phash) in zip(files, hashes):
+        if sha not in known and sha not in pending:
+            pending[sha] = (file, phash)
+    uploaded = upload_files([file for file, _ in pending.values()], client)
+    new_assets = [
+        ImageAsset(
+            sha256=sha,
+            phash=phash,
+            public_id=get_public_id(resource),
+            resource_type=getattr(resource, "resource_type", None) or "image",
+            version=getattr(resource, "version", None),
+            format=getattr(resource, "format", None) or "",
+        )
+        for (sha, (_file, phash)), resource in zip(pending.items(), uploaded)
+    ]
+    return known, uploaded, new_assets
+
+
+def _acquire(files, write, client):
+    files = list(files)
+    client = client or get_asset_client()
+    with_phash = get_image_settings()["PERCEPTUAL_DEDUP"]
+    hashes = [
+        (content_hash(file), perceptual_hash(file) if with_phash else "")
+        for file in files
+    ]
+
+    for _attempt in range(3):
+        # Network I/O first, so no transaction is held open across it.
+        known, uploaded, new_assets = _upload_unknown(files, hashes, client)
+        try:
+            with transaction.atomic():
+                assets = _take_references(hashes, known, new_assets)
+                result = write([_as_resource(asset) for asset in assets])
+        except _AssetReleased:
+            discard_uploads(uploaded, client)
+            continue
+        except Exception:
+            discard_uploads(uploaded, client)
+            raise
+
+        # Uploads that lost a race with another request indexing the same content.
+        used = {asset.public_id for asset in assets}
+        discard_uploads(
+            [resource for resource in uploaded if get_public_id(resource) not in used],
+            client,
+        )
+        fresh = [resource for resource in uploaded if get_public_id(resource) in used]
+        return result, fresh
+    raise RuntimeError("The image index kept changing, try the upload again.")
+
+
+def write_with_uploads(files, write, client=None):
+    """
+    Upload the ``files`` the asset index lacks, in parallel and outside any
+    transaction, then call ``write(resources)`` in one short transaction
+    that also takes a reference per file. Files whose SHA-256 (or, with
+    ``PERCEPTUAL_DEDUP``, perceptual hash) is indexed reuse that asset.
+    Assets uploaded here are destroyed if ``write`` fails; returns its
+    result. Call it outside ``transaction.atomic``.
+    """
+    result, _fresh = _acquire(files, write, client)
+    return result
+
+
+def acquire_assets(files, client=None) -> tuple[list, list]:
+    """
+    Resources for ``files``, taking one reference each in the asset index.
+    Returns them in order and the ones uploaded by this call, which are the
+    only ones safe to destroy if the caller fails.
+    """
+    return _acquire(files, lambda resources: resources, client)
+
+
+def release_assets(assets) -> list[str]:
+    """
+    Drop one reference per entry of ``assets`` and return the public ids
+    nothing references any more. Assets outside the index, uploaded before
+    it existed or directly from the browser, have a single reference.
+    """
+    counts = Counter(get_public_id(asset) for asset in assets)
+    counts.pop(None, None)
+    counts.pop("", None)
+    if not counts:
+        return []
+    released = []
+    with transaction.atomic():
+        indexed = ImageAsset.objects.select_for_update().filter(
+            public_id__in=counts
+        ).order_by("pk")
+        for asset in indexed:
+            asset.ref_count = max(asset.ref_count - counts.pop(asset.public_id), 0)
+            if asset.ref_count:
+                asset.save(update_fields=["ref_count"])
+            else:
+                asset.delete()
+                released.append(asset.public_id)
+    return released + list(counts)
+
+
+def create_with_uploads(model, files, build, client=None) -> list:
+    """
+    ``write_with_uploads`` inserting one ``model`` row per file with a
+    single ``bulk_create``; ``build(resource, position)`` returns the
+    unsaved instance.
+    """
+    return write_with_uploads(
+        files,
+        lambda resources: model.objects.bulk_create(
+            [build(resource, position) for position, resource in enumerate(resources)]
+        ),
+        client,
+    )
+
+
+def enqueue_asset_deletion(*assets, resource_type="image") -> None:
+    """
+    Release assets (CloudinaryResource objects or public ids) and record
+    the ones without references left for deletion. The rows share the
+    caller's transaction, so nothing is destroyed if it rolls back, and the
+    drain is scheduled once it commits.
+    """
+    public_ids = set(release_assets(assets))
+    if not public_ids:
+        return
+    AssetDeletion.objects.bulk_create([
+        AssetDeletion(public_id=public_id, resource_type=resource_type)
+        for public_id in sorted(public_ids)
+    ])
+    transaction.on_commit(request_asset_drain)
+
+
+def request_asset_drain() -> None:
+    run_later_once(
+        DRAIN_SCHEDULED_KEY, get_assets_settings()["DRAIN_DELAY"], drain_asset_deletions
+    )
+
+
+def _claim_batch(batch_size, lease):
+    """
+    Take due rows with a conditional UPDATE, so two drains never get the
+    same row even without row locks (SQLite has none). Claimed rows whose
+    lease ran out, after a drain died, are due again.
+    """
+    now = timezone.now()
+    due = AssetDeletion.objects.filter(
+        status__in=[AssetDeletion.STATUS_PENDING, AssetDeletion.STATUS_CLAIMED],
+        next_attempt_at__lte=now,
+    )
+    candidates = list(
+        due.order_by("next_attempt_at", "id").values_list("pk", flat=True)[:batch_size]
+    )
+    if not candidates:
+        return []
+    claim = uuid.uuid4().hex
+    due.filter(pk__in=candidates).update(
+        status=AssetDeletion.STATUS_CLAIMED, claim=claim, next_attempt_at=now + lease
+    )
+    return list(AssetDeletion.objects.filter(claim=claim).order_by("id"))
+
+
+def _record_failures(rows, error, conf):
+    now = timezone.now()
+    for row in rows:
+        row.attempts += 1
+        row.last_error = str(error)[:1000]
+        if row.attempts >= conf["MAX_ATTEMPTS"]:
+            row.status = AssetDeletion.STATUS_DEAD
+        else:
+            row.status = AssetDeletion.STATUS_PENDING
+            row.next_attempt_at = now + timedelta(
+                seconds=conf["RETRY_DELAY"] * 2 ** (row.attempts - 1)
+            )
+    AssetDeletion.objects.bulk_update(
+        rows, ["attempts", "last_error", "status", "next_attempt_at"]
+    )
+
+
+def drain_asset_deletions(client=None) -> dict:
+    """
+    Destroy every due asset with one ``delete_resources`` call per batch.
+    Deleted and already missing assets leave the outbox; failures are
+    retried with exponential backoff and parked as dead after
+    ``MAX_ATTEMPTS``.
+    """
+    conf = get_assets_settings()
+    client = client or get_asset_client()
+    lease = timedelta(seconds=conf["RETRY_DELAY"])
+    report = {"deleted": 0, "retried": 0, "dead": 0}
+
+    while batch := _claim_batch(conf["DELETE_BATCH_SIZE"], lease):
+        by_type = {}
+        for row in batch:
+            by_type.setdefault(row.resource_type, []).append(row)
+
+        done, failed = [], []
+        for resource_type, rows in by_type.items():
+            try:
+                results = client.delete(
+                    [row.public_id for row in rows], resource_type=resource_type
+                )
+            except Exception as e:
+                _record_failures(rows, e, conf)
+                failed.extend(rows)
+                continue
+            rejected = [
+                row for row in rows
+                if results.get(row.public_id) not in ("deleted", "not_found")
+            ]
+            if rejected:
+                _record_failures(rejected, "Cloudinary did not delete the asset", conf)
+                failed.extend(rejected)
+            done.extend(row.pk for row in rows if row not in rejected)
+
+        AssetDeletion.objects.filter(pk__in=done).delete()
+        report["deleted"] += len(done)
+        report["dead"] += sum(row.status == AssetDeletion.STATUS_DEAD for row in failed)
+        report["retried"] += sum(row.status != AssetDeletion.STATUS_DEAD for row in failed)
+    return report
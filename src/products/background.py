@@ -0,0 +1,34 @@
+import logging
+import threading
+
+from django.core.cache import cache
+from django.db import connection
+
+
+logger = logging.getLogger(__name__)
+
+
+def _run(func):
+    try:
+        func()
+    except Exception:
+        logger.exception("Background task %s failed", func.__name__)
+    finally:
+        # The timer thread opened its own connection.
+        connection.close()
+
+
+def run_later_once(key: str, delay: float, func) -> bool:
+    """
+    Run ``func`` on a daemon timer thread after ``delay`` seconds, unless a
+    run is already pending under ``key``. The claim lives in the shared
+    cache, so calls from every worker in the window coalesce into one run.
+    The timer dies with its worker; queues that must not stall also need a
+    management command running on a schedule.
+    """
+    if not cache.add(key, 1, delay):
+        return False
+    timer = threading.Timer(delay, _run, args=[func])
+    timer.daemon = True
+    timer.start()
+    return True
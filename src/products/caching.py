@@ -0,0 +1,199 @@
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from django.utils.translation import get_language
+from rest_framework.response import Response
+from users.constants import Role
+
+
+CATALOG_CACHE_GROUP = "catalog"
+RESPONSE_CACHE_GROUPS = (CATALOG_CACHE_GROUP, "blog", "partners", "contacts")
+
+
+def get_cache_version(group: str) -> int:
+    key = f"version:{group}"
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, 1, None)
+        version = cache.get(key, 1)
+    return version
+
+
+def bump_cache_version(group: str) -> int:
+    key = f"version:{group}"
+    cache.set(f"modified:{group}", int(time.time()), None)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, None)
+        return cache.incr(key)
+
+
+def get_cache_modified(group: str) -> int:
+    """Unix time of the last bump, seeded with "now" if the cache lost it."""
+    key = f"modified:{group}"
+    modified = cache.get(key)
+    if modified is None:
+        cache.add(key, int(time.time()), None)
+        modified = cache.get(key, int(time.time()))
+    return modified
+
+
+def bump_cache_version_on_commit(group: str) -> None:
+    transaction.on_commit(lambda: bump_cache_version(group))
+
+
+def _incr_counter(key: str) -> None:
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def get_response_cache_stats() -> dict:
+    stats = {}
+    for group in RESPONSE_CACHE_GROUPS:
+        hits = cache.get(f"response-cache:hits:{group}", 0)
+        misses = cache.get(f"response-cache:misses:{group}", 0)
+        stats[group] = {
+            "hits": hits,
+            "misses": misses,
+            "version": get_cache_version(group),
+        }
+    return stats
+
+
+def get_role_bucket(request) -> str:
+    """Staff see untranslated fields, everyone else shares one representation."""
+    user = request.user
+    if user.is_authenticated and user.role in [Role.ADMIN, Role.MANAGER]:
+        return "staff"
+    return "public"
+
+
+def normalize_query_string(query_params) -> str:
+    return urlencode(sorted(
+        (key, value)
+        for key in query_params
+        for value in query_params.getlist(key)
+    ))
+
+
+class CachedResponseMixin:
+    """
+    Caches successful ``list``/``retrieve`` responses. The key combines the
+    version counter of ``cache_group`` (bumped whenever a model of the
+    group is saved or deleted), the active language, the role bucket, the
+    negotiated format and the normalized query string, so stale entries
+    are never read and simply expire.
+
+    The same key, hashed, is the strong ETag of the response, and
+    Last-Modified is the newest ``updated_at`` of the viewset's model or
+    the last bump of the group, whichever is later (deletes and related
+    rows do not touch ``updated_at``). Conditional requests are answered with 304
+    before the queryset is evaluated or anything is serialized.
+    """
+
+    cache_group = None
+    vary_headers = ("Accept", "Accept-Language", "Authorization", "Cookie")
+
+    def get_response_cache_key(self, request):
+        return ":".join([
+            "response",
+            self.cache_group,
+            f"v{get_cache_version(self.cache_group)}",
+            get_language() or settings.LANGUAGE_CODE,
+            get_role_bucket(request),
+            request.accepted_renderer.format,
+            request.get_host(),
+            request.path,
+            normalize_query_string(request.query_params),
+        ])
+
+    def get_etag(self, key):
+        return quote_etag(hashlib.sha1(key.encode()).hexdigest())
+
+    def get_last_modified(self):
+        modified = get_cache_modified(self.cache_group)
+        updated_at = self.queryset.model._default_manager.aggregate(
+            value=Max("updated_at")
+        )["value"]
+        if updated_at is not None:
+            modified = max(modified, int(updated_at.timestamp()))
+        return modified
+
+    def is_not_modified(self, request, etag, last_modified):
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match is not None:
+            etags = parse_etags(if_none_match)
+            return "*" in etags or etag in etags
+        if_modified_since = parse_http_date_safe(
+            request.headers.get("If-Modified-Since", "")
+        )
+        return (
+            if_modified_since is not None
+            and last_modified is not None
+            and last_modified <= if_modified_since
+        )
+
+    def finalize_conditional_response(self, request, response, etag, last_modified):
+        response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified)
+        patch_vary_headers(response, self.vary_headers)
+        if get_role_bucket(request) == "staff":
+            patch_cache_control(response, private=True, no_cache=True)
+        else:
+            patch_cache_control(response, no_cache=True)
+        return response
+
+    def not_modified(self, request, etag, last_modified):
+        response = Response(status=304)
+        return self.finalize_conditional_response(request, response, etag, last_modified)
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        key = self.get_response_cache_key(request)
+        etag = self.get_etag(key)
+        if "If-None-Match" in request.headers and self.is_not_modified(
+            request, etag, None
+        ):
+            _incr_counter(f"response-cache:hits:{self.cache_group}")
+            return self.not_modified(request, etag, None)
+
+        cached = cache.get(key)
+        if cached is not None:
+            _incr_counter(f"response-cache:hits:{self.cache_group}")
+            data, last_modified = cached
+            if self.is_not_modified(request, etag, last_modified):
+                return self.not_modified(request, etag, last_modified)
+            response = Response(data)
+            response["X-Cache"] = "HIT"
+            return self.finalize_conditional_response(
+                request, response, etag, last_modified
+            )
+
+        _incr_counter(f"response-cache:misses:{self.cache_group}")
+        last_modified = self.get_last_modified()
+        if self.is_not_modified(request, etag, last_modified):
+            return self.not_modified(request, etag, last_modified)
+        response = handler(request, *args, **kwargs)
+        response["X-Cache"] = "MISS"
+        if response.status_code != 200:
+            return response
+        timeout = getattr(settings, "RESPONSE_CACHE", {}).get("TIMEOUT", 60 * 60)
+        cache.set(key, (response.data, last_modified), timeout)
+        return self.finalize_conditional_response(request, response, etag, last_modified)
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(super().retrieve, request, *args, **kwargs)
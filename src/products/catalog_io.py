@@ -0,0 +1,219 @@
+import csv
+import json
+from itertools import islice
+
+from django.db import DatabaseError, transaction
+from rest_framework.exceptions import ValidationError
+
+from products.models import (Product, ProductPurposeCategory,
+                             ProductPurposeCategoryProduct, ProductTypeCategory)
+from products.serializers import ProductImportRowSerializer
+from products.services import products_bulk_updated
+
+
+FORMATS = ("csv", "jsonl")
+# Columns of both formats; purpose_category is "|"-separated in CSV files.
+CATALOG_FIELDS = [
+    "article",
+    "available",
+    "product_name_uk",
+    "product_name_en",
+    "price",
+    "discount",
+    "description_uk",
+    "description_en",
+    "volume_ml",
+    "type_category",
+    "purpose_category",
+    "is_new",
+    "is_best_seller",
+    "ingredients",
+    "application_uk",
+    "application_en",
+    "meta_tag_title_uk",
+    "meta_tag_title_en",
+    "meta_tag_description_uk",
+    "meta_tag_description_en",
+]
+PRODUCT_FIELDS = [field for field in CATALOG_FIELDS if field != "purpose_category"]
+MODEL_FIELDS = [
+    "type_category_id" if field == "type_category" else field for field in PRODUCT_FIELDS
+]
+CSV_LIST_SEPARATOR = "|"
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def get_format(filename: str, file_format: str | None = None) -> str:
+    file_format = (file_format or filename.rsplit(".", 1)[-1]).lower()
+    if file_format not in FORMATS:
+        raise ValueError(f"Unsupported format '{file_format}', use one of {FORMATS}.")
+    return file_format
+
+
+def read_rows(stream, file_format: str):
+    """Yield ``(line_number, row)`` from a text stream without loading it whole."""
+    if file_format == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            row = {key: value for key, value in row.items() if key and value != ""}
+            if "purpose_category" in row:
+                row["purpose_category"] = [
+                    value for value in row["purpose_category"].split(CSV_LIST_SEPARATOR)
+                    if value.strip()
+                ]
+            yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            row = e
+        yield line_number, row
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _write_chunk(valid_rows):
+    products = [
+        Product(**dict(zip(MODEL_FIELDS, (data[field] for field in PRODUCT_FIELDS))))
+        for _, data in valid_rows
+    ]
+    Product.objects.bulk_create(
+        products,
+        update_conflicts=True,
+        unique_fields=["article"],
+        update_fields=[field for field in MODEL_FIELDS if field != "article"]
+        + ["updated_at"],
+    )
+    ids = dict(
+        Product.objects.filter(
+            article__in=[data["article"] for _, data in valid_rows]
+        ).values_list("article", "pk")
+    )
+
+    with_categories = [data for _, data in valid_rows if "purpose_category" in data]
+    if with_categories:
+        product_ids = [ids[data["article"]] for data in with_categories]
+        ProductPurposeCategoryProduct.objects.filter(product_id__in=product_ids).delete()
+        ProductPurposeCategoryProduct.objects.bulk_create(
+            [
+                ProductPurposeCategoryProduct(
+                    product_id=ids[data["article"]], purpose_category_id=category_id
+                )
+                for data in with_categories
+                for category_id in set(data["purpose_category"])
+            ],
+            batch_size=DEFAULT_CHUNK_SIZE,
+        )
+    return list(ids.values())
+
+
+def import_products(rows, chunk_size=DEFAULT_CHUNK_SIZE, on_progress=None) -> dict:
+    """
+    Upsert products by article from ``(line_number, row)`` pairs; rows are
+    complete products, omitted columns take their defaults. Every
+    chunk is validated, written with one ``bulk_create(update_conflicts=True)``
+    plus one batch for the purpose category links, and committed on its
+    own, so a bad chunk does not roll back the ones before it.
+    """
+    context = {
+        "type_categories": set(ProductTypeCategory.objects.values_list("pk", flat=True)),
+        "purpose_categories": set(
+            ProductPurposeCategory.objects.values_list("pk", flat=True)
+        ),
+    }
+    # One instance validates every row, as ListSerializer does with its child;
+    # building the fields per row would dominate the import time.
+    serializer = ProductImportRowSerializer(context=context)
+    report = {"processed": 0, "imported": 0, "errors": []}
+
+    for chunk in _chunks(rows, chunk_size):
+        valid_rows = {}
+        for line_number, row in chunk:
+            if isinstance(row, Exception) or not isinstance(row, dict):
+                report["errors"].append({"line": line_number, "errors": str(row)})
+                continue
+            try:
+                data = serializer.run_validation(row)
+            except ValidationError as e:
+                report["errors"].append({
+                    "line": line_number,
+                    "article": row.get("article"),
+                    "errors": e.detail,
+                })
+                continue
+            # A later row for the same article wins, as a sequential import would.
+            valid_rows[data["article"]] = (line_number, data)
+
+        if valid_rows:
+            try:
+                with transaction.atomic():
+                    product_ids = _write_chunk(list(valid_rows.values()))
+                    products_bulk_updated.send(
+                        sender=Product, product_ids=product_ids, fields=CATALOG_FIELDS
+                    )
+            except DatabaseError as e:
+                report["errors"].extend(
+                    {"line": line_number, "article": article, "errors": str(e)}
+                    for article, (line_number, _) in valid_rows.items()
+                )
+            else:
+                report["imported"] += len(valid_rows)
+
+        report["processed"] += len(chunk)
+        if on_progress:
+            on_progress(report)
+    return report
+
+
+def iter_export_rows(chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield products as import-compatible dicts. Products are streamed with
+    ``.iterator()`` and purpose categories fetched once per chunk.
+    """
+    products = (
+        Product.objects.order_by("pk")
+        .values("pk", *MODEL_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+    for chunk in _chunks(products, chunk_size):
+        categories = {}
+        links = ProductPurposeCategoryProduct.objects.filter(
+            product_id__in=[product["pk"] for product in chunk]
+        ).order_by("purpose_category_id").values_list("product_id", "purpose_category_id")
+        for product_id, category_id in links:
+            categories.setdefault(product_id, []).append(category_id)
+
+        for product in chunk:
+            row = dict(zip(PRODUCT_FIELDS, (product[field] for field in MODEL_FIELDS)))
+            row["purpose_category"] = categories.get(product["pk"], [])
+            yield {field: row[field] for field in CATALOG_FIELDS}
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def iter_export_lines(file_format: str, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Serialized export, one line at a time, for files and streaming responses."""
+    rows = iter_export_rows(chunk_size)
+    if file_format == "jsonl":
+        for row in rows:
+            yield json.dumps(row, ensure_ascii=False) + "\n"
+        return
+
+    writer = csv.DictWriter(_Echo(), fieldnames=CATALOG_FIELDS)
+    yield writer.writeheader()
+    for row in rows:
+        row["purpose_category"] = CSV_LIST_SEPARATOR.join(
+            str(category_id) for category_id in row["purpose_category"]
+        )
+        yield writer.writerow(row)
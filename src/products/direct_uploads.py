@@ -0,0 +1,189 @@
+import time
+
+import cloudinary
+import cloudinary.utils
+from django.core import signing
+from django.db import IntegrityError, transaction
+
+from blog.models import BlogImage
+from products.assets import (discard_uploads, enqueue_asset_deletion,
+                             get_asset_client, get_assets_settings,
+                             get_public_id)
+from products.models import BannerProduct, ImageAsset, Product, ProductImage
+
+
+TOKEN_SALT = "products.direct_uploads"
+MAX_PRODUCT_IMAGES = 10
+FORMATS = ("jpg", "jpeg", "png", "webp")
+# Limits of ImageValidator and BannerProductSerializer._validate_file,
+# enforced by Cloudinary's metadata when the upload is confirmed.
+SLOTS = {
+    "product_image": {
+        "model": Product,
+        "folder": "products/{id}",
+        "max_bytes": 1024 * 1024,
+        "max_width": 1920,
+        "max_height": 1080,
+    },
+    "banner_image": {
+        "model": BannerProduct,
+        "folder": "banners/{id}",
+        "max_bytes": 10 * 1024 * 1024,
+    },
+    "banner_background_image": {
+        "model": BannerProduct,
+        "folder": "banners/{id}",
+        "max_bytes": 10 * 1024 * 1024,
+    },
+    "blog_image": {
+        "model": None,
+        "folder": "blog",
+        "max_bytes": 1024 * 1024,
+        "max_width": 1920,
+        "max_height": 1080,
+    },
+}
+
+
+ALREADY_CONFIRMED = "This upload has already been confirmed."
+
+
+class DirectUploadError(ValueError):
+    pass
+
+
+def _get_target(slot, object_id, lock=False):
+    model = SLOTS[slot]["model"]
+    if model is None:
+        return None
+    if object_id is None:
+        raise DirectUploadError(f"object_id is required for '{slot}'.")
+    objects = model.objects.select_for_update() if lock else model.objects
+    try:
+        return objects.get(pk=object_id)
+    except model.DoesNotExist:
+        raise DirectUploadError(f"No {model._meta.verbose_name} with id {object_id}.")
+
+
+def sign_upload(slot: str, object_id: int | None = None) -> dict:
+    """
+    Parameters for one signed upload straight from the browser to Cloudinary.
+    The file never reaches Django; the returned ``token`` binds the upload to
+    ``slot`` and its object for ``DIRECT_UPLOAD_TTL`` seconds.
+    """
+    conf = SLOTS[slot]
+    target = _get_target(slot, object_id)
+    folder = conf["folder"].format(id=getattr(target, "pk", None))
+    config = cloudinary.config()
+    params = {
+        "timestamp": int(time.time()),
+        "folder": folder,
+        "allowed_formats": ",".join(FORMATS),
+    }
+    if "max_width" in conf:
+        params["transformation"] = f"c_limit,w_{conf['max_width']},h_{conf['max_height']}"
+    signature = cloudinary.utils.api_sign_request(
+        params, config.api_secret, config.signature_algorithm
+    )
+    token = signing.dumps(
+        {"slot": slot, "object_id": getattr(target, "pk", None), "folder": folder},
+        salt=TOKEN_SALT,
+    )
+    return {
+        "upload_url": cloudinary.utils.cloudinary_api_url("upload"),
+        "params": {**params, "api_key": config.api_key, "signature": signature},
+        "token": token,
+        "max_bytes": conf["max_bytes"],
+        "max_width": conf.get("max_width"),
+        "max_height": conf.get("max_height"),
+    }
+
+
+def _check_resource(resource, conf):
+    if resource.get("format") not in FORMATS:
+        return f"Only formats {FORMATS} are allowed."
+    if resource.get("bytes", 0) > conf["max_bytes"]:
+        return f"File size must be <= {conf['max_bytes']} bytes."
+    if "max_width" in conf and (
+        resource.get("width", 0) > conf["max_width"]
+        or resource.get("height", 0) > conf["max_height"]
+    ):
+        return f"Image resolution must be <= {conf['max_width']}x{conf['max_height']}px."
+    return None
+
+
+class _SlotFull(DirectUploadError):
+    pass
+
+
+def _attach(slot, claim, image):
+    # Locked so concurrent confirms cannot both pass the image limit.
+    target = _get_target(slot, claim["object_id"], lock=True)
+    if slot == "product_image":
+        existing_count = target.images.count()
+        if existing_count >= MAX_PRODUCT_IMAGES:
+            raise _SlotFull(f"You can't add more than {MAX_PRODUCT_IMAGES} images.")
+        return ProductImage.objects.create(
+            product=target, image=image, order=existing_count
+        )
+    if slot == "blog_image":
+        return BlogImage.objects.create(image=image)
+
+    field = slot.removeprefix("banner_")
+    old_image = getattr(target, field)
+    setattr(target, field, image)
+    target.save(update_fields=[field, "updated_at"])
+    if old_image and get_public_id(old_image) != image.public_id:
+        enqueue_asset_deletion(old_image)
+    return target
+
+
+def confirm_upload(token: str, public_id: str, version: int, signature: str, client=None):
+    """
+    Attach a finished direct upload to its model after checking the token,
+    Cloudinary's response signature and the stored asset's metadata. Assets
+    that break the slot limits are destroyed. Each upload is indexed in
+    ``ImageAsset`` when it is attached, so a replayed confirmation is
+    refused before it can touch the asset.
+    """
+    try:
+        claim = signing.loads(
+            token, salt=TOKEN_SALT, max_age=get_assets_settings()["DIRECT_UPLOAD_TTL"]
+        )
+    except signing.BadSignature:
+        raise DirectUploadError("The upload token is invalid or has expired.")
+
+    if not public_id.startswith(f"{claim['folder']}/"):
+        raise DirectUploadError("The upload does not belong to this slot.")
+    if not cloudinary.utils.verify_api_response_signature(public_id, version, signature):
+        raise DirectUploadError("The upload signature is invalid.")
+    if ImageAsset.objects.filter(public_id=public_id).exists():
+        raise DirectUploadError(ALREADY_CONFIRMED)
+
+    slot = claim["slot"]
+    conf = SLOTS[slot]
+    client = client or get_asset_client()
+    resource = client.resource(public_id)
+    error = _check_resource(resource, conf)
+    if error:
+        discard_uploads([public_id], client)
+        raise DirectUploadError(error)
+
+    image = cloudinary.CloudinaryResource(
+        public_id=public_id, version=version, format=resource["format"],
+        type="upload", resource_type="image",
+    )
+    try:
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    ImageAsset.objects.create(
+                        public_id=public_id, version=version,
+                        format=resource["format"], ref_count=1,
+                    )
+            except IntegrityError:
+                raise DirectUploadError(ALREADY_CONFIRMED)
+            return _attach(slot, claim, image)
+    except _SlotFull:
+        discard_uploads([public_id], client)
+        raise
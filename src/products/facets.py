@@ -0,0 +1,86 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max, Min, Q
+
+from products.models import Product, ProductPurposeCategoryProduct
+from products.services import get_catalog_version
+
+
+def get_price_buckets() -> list[tuple[int, int | None]]:
+    bounds = getattr(settings, "PRODUCT_FACETS", {}).get(
+        "PRICE_BUCKETS", (500, 1000, 2000)
+    )
+    lower = [0, *bounds]
+    upper = [*bounds, None]
+    return list(zip(lower, upper))
+
+
+def compute_facets(queryset) -> dict:
+    """
+    Counts for the sidebar over the products in ``queryset``, in three
+    grouped queries whatever the number of active filters: one aggregate
+    for the flags, price range and price buckets, one GROUP BY for type
+    categories and one over the purpose category through table.
+    """
+    products = Product.objects.filter(pk__in=queryset.order_by().values("pk"))
+    buckets = get_price_buckets()
+
+    aggregates = {
+        "total": Count("id"),
+        "min_price": Min("price_with_discount"),
+        "max_price": Max("price_with_discount"),
+        "is_new": Count("id", filter=Q(is_new=True)),
+        "is_best_seller": Count("id", filter=Q(is_best_seller=True)),
+        "is_discount": Count("id", filter=Q(discount__gt=0)),
+    }
+    for index, (lower, upper) in enumerate(buckets):
+        bucket = Q(price_with_discount__gte=lower)
+        if upper is not None:
+            bucket &= Q(price_with_discount__lt=upper)
+        aggregates[f"bucket_{index}"] = Count("id", filter=bucket)
+    totals = products.aggregate(**aggregates)
+
+    type_counts = (
+        products.order_by()
+        .values_list("type_category")
+        .annotate(count=Count("id"))
+        .order_by("type_category")
+    )
+    purpose_counts = (
+        ProductPurposeCategoryProduct.objects.filter(product__in=products)
+        .values_list("purpose_category")
+        .annotate(count=Count("product", distinct=True))
+        .order_by("purpose_category")
+    )
+
+    return {
+        "total": totals["total"],
+        "price": {"min": totals["min_price"], "max": totals["max_price"]},
+        "price_buckets": [
+            {"min": lower, "max": upper, "count": totals[f"bucket_{index}"]}
+            for index, (lower, upper) in enumerate(buckets)
+        ],
+        "type_category": [
+            {"id": category_id, "count": count} for category_id, count in type_counts
+        ],
+        "purpose_category": [
+            {"id": category_id, "count": count} for category_id, count in purpose_counts
+        ],
+        "is_new": totals["is_new"],
+        "is_best_seller": totals["is_best_seller"],
+        "is_discount": totals["is_discount"],
+    }
+
+
+def get_product_facets(filter_key: str, get_queryset) -> dict:
+    """
+    ``compute_facets`` cached per catalog version and filter state; the
+    filtered queryset is only built, by calling ``get_queryset``, on a miss.
+    """
+    key = f"facets:v{get_catalog_version()}:{filter_key}"
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute_facets(get_queryset())
+        timeout = getattr(settings, "RESPONSE_CACHE", {}).get("TIMEOUT", 60 * 60)
+        cache.set(key, facets, timeout)
+    return facets
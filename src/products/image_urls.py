@@ -0,0 +1,59 @@
+from functools import lru_cache
+
+from django.conf import settings
+
+from products.assets import get_public_id
+
+
+DEFAULT_PRESETS = {
+    "thumbnail": {"width": 160, "height": 160, "crop": "fill", "dprs": [1, 2, 3]},
+    "card": {"widths": [240, 360, 480, 720], "width": 480},
+    "gallery": {"widths": [480, 768, 1080, 1440, 1920], "width": 1080},
+    "banner": {"widths": [640, 960, 1280, 1920], "width": 1280},
+}
+
+
+def get_image_presets() -> dict:
+    return {**DEFAULT_PRESETS, **getattr(settings, "IMAGE_PRESETS", {})}
+
+
+def _transformation(width, height=None, crop="limit", dpr=1) -> str:
+    parts = ["f_auto", "q_auto", f"c_{crop}", f"w_{width}"]
+    if height:
+        parts.append(f"h_{height}")
+    if dpr != 1:
+        parts.append(f"dpr_{dpr:.1f}")
+    return ",".join(parts)
+
+
+@lru_cache(maxsize=8192)
+def _build_variants(cloud_name, public_id, preset) -> dict:
+    preset = dict(preset)
+    base = f"https://res.cloudinary.com/{cloud_name}/image/upload"
+    height, crop = preset.get("height"), preset.get("crop", "limit")
+
+    def url(width, dpr=1):
+        return f"{base}/{_transformation(width, height, crop, dpr)}/{public_id}"
+
+    if preset.get("dprs"):
+        srcset = ", ".join(f"{url(preset['width'], dpr)} {dpr}x" for dpr in preset["dprs"])
+    else:
+        srcset = ", ".join(f"{url(width)} {width}w" for width in preset["widths"])
+    return {"src": url(preset["width"]), "srcset": srcset}
+
+
+def get_image_variants(image, preset: str) -> dict | None:
+    """
+    ``{"src", "srcset"}`` for a Cloudinary image in one of the
+    ``IMAGE_PRESETS``: ``f_auto``/``q_auto`` URLs by width, or by DPR for
+    fixed-size presets. Results are cached per public_id and preset.
+    """
+    public_id = get_public_id(image)
+    if not public_id:
+        return None
+    options = get_image_presets()[preset]
+    frozen = tuple(
+        (key, tuple(value) if isinstance(value, list) else value)
+        for key, value in sorted(options.items())
+    )
+    return _build_variants(settings.CLOUDINARY_CLOUD_NAME, public_id, frozen)
@@ -0,0 +1,118 @@
+import hashlib
+import io
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image, ImageOps
+
+
+# Header formats accepted from uploads, by Pillow's format name.
+IMAGE_FORMATS = ("JPEG", "PNG", "WEBP")
+TRANSCODE_MODES = ("off", "oversized", "all")
+
+
+class ImageError(ValueError):
+    pass
+
+
+def get_image_settings() -> dict:
+    conf = getattr(settings, "IMAGE_UPLOADS", {})
+    return {
+        "MAX_PIXELS": conf.get("MAX_PIXELS", 40_000_000),
+        "TRANSCODE": conf.get("TRANSCODE", "oversized"),
+        "FORMAT": conf.get("FORMAT", "WEBP"),
+        "QUALITY": conf.get("QUALITY", 80),
+        "WORKERS": conf.get("WORKERS", 4),
+        "PERCEPTUAL_DEDUP": conf.get("PERCEPTUAL_DEDUP", False),
+    }
+
+
+def read_image_header(file) -> tuple[str, int, int]:
+    """
+    ``(format, width, height)`` from the image header only; the pixel data
+    is never decoded. Images over ``MAX_PIXELS`` are rejected before Pillow
+    gets a chance to allocate them.
+    """
+    file.seek(0)
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+            with Image.open(file) as img:
+                header = img.format, *img.size
+    except Image.DecompressionBombError:
+        raise ImageError("Image has too many pixels.")
+    except Exception:
+        raise ImageError("Upload a valid image.")
+    finally:
+        file.seek(0)
+
+    image_format, width, height = header
+    if image_format not in IMAGE_FORMATS:
+        raise ImageError(f"Only image formats {IMAGE_FORMATS} are allowed.")
+    if width * height > get_image_settings()["MAX_PIXELS"]:
+        raise ImageError("Image has too many pixels.")
+    return header
+
+
+def transcode_image(file, max_width=None, max_height=None):
+    """Downscale ``file`` to fit the limits and re-encode it in ``FORMAT``."""
+    conf = get_image_settings()
+    file.seek(0)
+    with Image.open(file) as img:
+        if max_width and max_height:
+            # JPEG decodes straight to a smaller scale, which is much cheaper.
+            img.draft("RGB", (max_width, max_height))
+        img = ImageOps.exif_transpose(img)
+        if max_width and max_height:
+            img.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+        output = io.BytesIO()
+        img.save(output, format=conf["FORMAT"], quality=conf["QUALITY"])
+
+    name = f"{file.name.rsplit('.', 1)[0]}.{conf['FORMAT'].lower()}"
+    return SimpleUploadedFile(
+        name, output.getvalue(), content_type=f"image/{conf['FORMAT'].lower()}"
+    )
+
+
+def transcode_images(files, max_width=None, max_height=None) -> list:
+    """``transcode_image`` for several files on a bounded pool; Pillow releases the GIL."""
+    files = list(files)
+    if len(files) <= 1:
+        return [transcode_image(file, max_width, max_height) for file in files]
+    workers = min(len(files), get_image_settings()["WORKERS"])
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(
+            pool.map(lambda file: transcode_image(file, max_width, max_height), files)
+        )
+
+
+def content_hash(file) -> str:
+    """SHA-256 of the file contents, read in chunks."""
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def perceptual_hash(file) -> str:
+    """
+    64-bit difference hash, usually equal for the same picture re-encoded,
+    resized or lightly recompressed.
+    """
+    file.seek(0)
+    with Image.open(file) as img:
+        img.draft("L", (64, 64))
+        pixels = list(img.convert("L").resize((9, 8), Image.Resampling.LANCZOS).getdata())
+    file.seek(0)
+    bits = 0
+    for row in range(8):
+        for column in range(8):
+            left, right = pixels[row * 9 + column], pixels[row * 9 + column + 1]
+            bits = bits << 1 | (left > right)
+    return f"{bits:016x}"
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from products.serializers import ProductBulkPriceSerializer
+from products.services import bulk_update_prices, get_bulk_queryset
+
+
+class Command(BaseCommand):
+    help = "Change price and/or discount of many products with one UPDATE."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--articles", help="Comma-separated product articles.")
+        parser.add_argument("--type-category", type=int)
+        parser.add_argument("--purpose-category", type=int)
+        parser.add_argument("--all", action="store_true", help="Every product.")
+        parser.add_argument("--price", type=int, help="New absolute price.")
+        parser.add_argument(
+            "--price-percent", type=int, help="Change price by percent, e.g. -15."
+        )
+        parser.add_argument("--discount", type=int, help="New discount percent.")
+
+    def handle(self, *args, **options):
+        data = {
+            key: options[key]
+            for key in ("type_category", "purpose_category", "price",
+                        "price_percent", "discount")
+            if options[key] is not None
+        }
+        if options["articles"]:
+            data["articles"] = [
+                article.strip() for article in options["articles"].split(",")
+                if article.strip()
+            ]
+        data["all"] = options["all"]
+
+        serializer = ProductBulkPriceSerializer(data=data)
+        if not serializer.is_valid():
+            raise CommandError(serializer.errors)
+        validated = serializer.validated_data
+        queryset = get_bulk_queryset(
+            articles=validated.get("articles"),
+            type_category=validated.get("type_category"),
+            purpose_category=validated.get("purpose_category"),
+        )
+        updated = bulk_update_prices(
+            queryset,
+            price=validated.get("price"),
+            price_percent=validated.get("price_percent"),
+            discount=validated.get("discount"),
+        )
+        self.stdout.write(self.style.SUCCESS(f"Updated {updated} products."))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from products.asset_gc import collect_orphaned_assets
+
+
+class Command(BaseCommand):
+    help = "Delete Cloudinary assets that no product, banner, category or blog image uses."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run", action="store_true", help="List orphans without deleting them."
+        )
+        parser.add_argument(
+            "--grace-period",
+            type=int,
+            default=None,
+            help="Skip assets younger than this many seconds.",
+        )
+
+    def handle(self, *args, **options):
+        report = collect_orphaned_assets(
+            grace_period=options["grace_period"], dry_run=options["dry_run"]
+        )
+        if options["dry_run"]:
+            for public_id in report["orphans"]:
+                self.stdout.write(public_id)
+            self.stdout.write(self.style.SUCCESS(
+                f"Scanned {report['scanned']}, {report['orphaned']} orphaned."
+            ))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Scanned {report['scanned']}, deleted {report['deleted']}, "
+            f"failed {report['failed']}."
+        ))
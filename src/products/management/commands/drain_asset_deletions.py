@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from products.assets import drain_asset_deletions
+from products.models import AssetDeletion
+
+
+class Command(BaseCommand):
+    help = "Destroy queued Cloudinary assets in batches; list or requeue dead ones."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--list-dead", action="store_true", help="Show assets that gave up retrying."
+        )
+        parser.add_argument(
+            "--requeue-dead", action="store_true", help="Retry dead assets from scratch."
+        )
+        parser.add_argument(
+            "--every", type=float, metavar="SECONDS",
+            help="Keep running and drain due assets every SECONDS.",
+        )
+
+    def handle(self, *args, **options):
+        dead = AssetDeletion.objects.filter(status=AssetDeletion.STATUS_DEAD)
+        if options["list_dead"]:
+            for row in dead.order_by("id"):
+                self.stdout.write(
+                    f"{row.public_id} attempts={row.attempts} error={row.last_error}"
+                )
+            return
+        if options["requeue_dead"]:
+            requeued = dead.update(
+                status=AssetDeletion.STATUS_PENDING,
+                attempts=0,
+                next_attempt_at=timezone.now(),
+            )
+            self.stdout.write(f"Requeued {requeued} dead assets.")
+
+        while True:
+            report = drain_asset_deletions()
+            if not options["every"] or any(report.values()):
+                self.stdout.write(self.style.SUCCESS(
+                    f"Deleted {report['deleted']}, retrying {report['retried']}, "
+                    f"dead {report['dead']}."
+                ))
+            if not options["every"]:
+                return
+            close_old_connections()
+            time.sleep(options["every"])
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from products.catalog_io import (DEFAULT_CHUNK_SIZE, FORMATS, get_format,
+                                 iter_export_lines)
+
+
+class Command(BaseCommand):
+    help = "Stream every product to a CSV or JSONL file (or stdout with '-')."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=FORMATS, dest="file_format")
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        try:
+            file_format = get_format(
+                path, options["file_format"] or ("jsonl" if path == "-" else None)
+            )
+        except ValueError as e:
+            raise CommandError(e)
+
+        lines = iter_export_lines(file_format, chunk_size=options["chunk_size"])
+        if path == "-":
+            for line in lines:
+                self.stdout.write(line, ending="")
+            return
+        with open(path, "w", encoding="utf-8", newline="") as stream:
+            stream.writelines(lines)
+        self.stdout.write(self.style.SUCCESS(f"Exported products to {path}."))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from products.catalog_io import (DEFAULT_CHUNK_SIZE, FORMATS, get_format,
+                                 import_products, read_rows)
+
+
+class Command(BaseCommand):
+    help = "Upsert products by article from a CSV or JSONL file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=FORMATS, dest="file_format")
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            file_format = get_format(options["path"], options["file_format"])
+        except ValueError as e:
+            raise CommandError(e)
+
+        def progress(report):
+            self.stdout.write(
+                f"{report['processed']} rows processed, {report['imported']} imported, "
+                f"{len(report['errors'])} errors"
+            )
+
+        with open(options["path"], encoding="utf-8-sig", newline="") as stream:
+            report = import_products(
+                read_rows(stream, file_format),
+                chunk_size=options["chunk_size"],
+                on_progress=progress,
+            )
+
+        for error in report["errors"]:
+            self.stderr.write(
+                f"line {error['line']} {error.get('article') or ''}: {error['errors']}"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report['imported']} of {report['processed']} rows."
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from products.services import rebuild_rating_aggregates
+
+
+class Command(BaseCommand):
+    help = "Recompute stored product rating aggregates from approved reviews."
+
+    def handle(self, *args, **options):
+        updated = rebuild_rating_aggregates()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt ratings for {updated} products."))
@@ -1,12 +1,9 @@
-import cloudinary.uploader
 from cloudinary.models import CloudinaryField
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
-from django.db.models.signals import post_delete
-from django.dispatch import receiver
+from django.db.models import F, Prefetch
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
-import math
 
 
 class ProductPurposeCategory(models.Model):
@@ -27,6 +24,7 @@ class ProductPurposeCategory(models.Model):
         },
     )
     image = CloudinaryField(_("image"), null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_("Updated at"))
 
     class Meta:
         db_table = "product_purpose_category"
@@ -44,6 +42,7 @@ class ProductTypeCategory(models.Model):
         max_length=255,
         verbose_name=_("Type name (ukrainian)"),
     )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_("Updated at"))
 
     class Meta:
         db_table = "product_type_category"
@@ -60,6 +59,26 @@ class ProductPurposeCategoryProduct(models.Model):
         unique_together = ("product", "purpose_category")
 
 
+class ProductQuerySet(models.QuerySet):
+    def with_card_relations(self):
+        """Everything ProductListSerializer reads, in a constant number of queries."""
+        return self.prefetch_related("images")
+
+    def with_detail_relations(self):
+        """Adds approved reviews and purpose category ids for ProductSerializer."""
+        return self.with_card_relations().prefetch_related(
+            Prefetch(
+                "reviews",
+                queryset=ProductReview.objects.filter(is_approved=True),
+                to_attr="approved_reviews",
+            ),
+            Prefetch(
+                "purpose_category",
+                queryset=ProductPurposeCategory.objects.only("id"),
+            ),
+        )
+
+
 class Product(models.Model):
     article = models.CharField(
         max_length=50,
@@ -79,9 +98,17 @@ class Product(models.Model):
     price = models.IntegerField(
         validators=[MinValueValidator(1)], verbose_name=_("Price")
     )
-    discount = models.IntegerField(verbose_name=_("Discount"))
-    price_with_discount = models.IntegerField(
-        editable=False, verbose_name=_("Price with discount")
+    discount = models.IntegerField(
+        validators=[MinValueValidator(0), MaxValueValidator(100)],
+        verbose_name=_("Discount"),
+    )
+    # ceil(price * (100 - discount) / 100) in integer arithmetic, kept by the
+    # database so set-based UPDATEs of price/discount cannot leave it stale.
+    price_with_discount = models.GeneratedField(
+        expression=(F("price") * (100 - F("discount")) + 99) / 100,
+        output_field=models.IntegerField(),
+        db_persist=True,
+        verbose_name=_("Price with discount"),
     )
     description_uk = models.TextField(verbose_name=_("Description (ukrainian)"))
     description_en = models.TextField(verbose_name=_("Description (english)"))
@@ -121,28 +148,67 @@ class Product(models.Model):
         default="Meta tag description EN",
         verbose_name=_("Meta tag description (english)")
         )
+    # Aggregates over approved reviews, kept current by products.services.
+    rating_avg = models.FloatField(
+        default=0, editable=False, verbose_name=_("Average rating")
+    )
+    rating_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name=_("Rating count")
+    )
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_1_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_2_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_3_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_4_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_5_count = models.PositiveIntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_("Updated at"))
 
+    objects = ProductQuerySet.as_manager()
 
     class Meta:
         db_table = "product"
+        indexes = [
+            models.Index(
+                fields=["price_with_discount", "id"], name="product_price_id_idx"
+            ),
+            models.Index(fields=["-rating_avg", "id"], name="product_rating_idx"),
+        ]
 
     def __str__(self):
         return f"{self.product_name_en} ({self.article})"
 
     def get_average_rating(self):
-        reviews = self.reviews.all()
-        if not reviews:
-            return 0
+        return round(self.rating_avg, 2)
+
+    def get_rating_histogram(self):
+        return {
+            str(stars): getattr(self, f"rating_{stars}_count") for stars in range(1, 6)
+        }
+
+    def get_approved_reviews(self):
+        if hasattr(self, "approved_reviews"):
+            return self.approved_reviews
+        return self.reviews.filter(is_approved=True)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_pricing = instance._get_pricing()
+        return instance
 
-        total_rating = sum([review.rating for review in reviews])
-        average_rating = round(total_rating / len(reviews), 2)
-        return average_rating
+    def _get_pricing(self):
+        # Read from __dict__ so deferred fields are not loaded.
+        return self.__dict__.get("price"), self.__dict__.get("discount")
 
     def save(self, *args, **kwargs):
-        self.price_with_discount = math.ceil(
-            self.price - (self.price * self.discount / 100)
-        )
+        adding = self._state.adding
         super().save(*args, **kwargs)
+        pricing = self._get_pricing()
+        if not adding and pricing != getattr(self, "_saved_pricing", None):
+            # The generated column is only returned by INSERTs.
+            self.refresh_from_db(fields=["price_with_discount"])
+        self._saved_pricing = pricing
+
     def get_absolute_url(self):
         return f"/catalog/{self.pk}/"
 
@@ -231,6 +297,7 @@ class BannerProduct(models.Model):
     left = models.BooleanField(default=True, verbose_name=_("Left side banner"))
     image = CloudinaryField("Main image", blank=True, null=True)
     background_image = CloudinaryField("Background image", blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_("Updated at"))
 
     class Meta:
         db_table="banner_product"
@@ -239,16 +306,66 @@ class BannerProduct(models.Model):
         return f"Banner for {self.product}" 
     
 
-def delete_cloudinary_image(sender_model):
-    @receiver(post_delete, sender=sender_model)
-    def _delete_cloudinary_image_handler(sender, instance, **kwargs):
-        if hasattr(instance, "image") and instance.image:
-            cloudinary.uploader.destroy(instance.image.public_id)
-        if hasattr(instance, "background_image") and instance.background_image:
-            cloudinary.uploader.destroy(instance.background_image.public_id)
+class AssetDeletion(models.Model):
+    """
+    Outbox of Cloudinary assets to destroy. Rows are written in the same
+    transaction as the delete or update that orphaned the asset and are
+    drained in batches by ``products.assets.drain_asset_deletions``.
+    """
+
+    STATUS_PENDING = "pending"
+    STATUS_CLAIMED = "claimed"
+    STATUS_DEAD = "dead"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, _("Pending")),
+        (STATUS_CLAIMED, _("Claimed")),
+        (STATUS_DEAD, _("Dead")),
+    ]
+
+    public_id = models.CharField(max_length=255, verbose_name=_("Public ID"))
+    resource_type = models.CharField(max_length=20, default="image")
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING
+    )
+    # Set by the drain that claimed the row; the claim lapses at next_attempt_at.
+    claim = models.CharField(max_length=32, blank=True, default="")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        db_table = "asset_deletion"
+        indexes = [
+            models.Index(
+                fields=["status", "next_attempt_at"], name="asset_deletion_due_idx"
+            ),
+        ]
 
-delete_cloudinary_image(ProductImage)
-delete_cloudinary_image(ProductPurposeCategory)
-delete_cloudinary_image(BannerProduct)
-      
\ No newline at end of file
+    def __str__(self):
+        return f"{self.public_id} ({self.status})"
+
+
+class ImageAsset(models.Model):
+    """
+    Index of uploaded images by content hash. Uploads with a known hash
+    reuse ``public_id`` and take a reference; the asset is destroyed only
+    when ``ref_count`` drops to zero. Confirmed direct uploads are indexed
+    by ``public_id`` alone.
+    """
+
+    # None for direct uploads, whose content never passes through Django.
+    sha256 = models.CharField(max_length=64, unique=True, null=True, blank=True)
+    phash = models.CharField(max_length=16, blank=True, default="", db_index=True)
+    public_id = models.CharField(max_length=255, unique=True, verbose_name=_("Public ID"))
+    resource_type = models.CharField(max_length=20, default="image")
+    version = models.PositiveBigIntegerField(null=True, blank=True)
+    format = models.CharField(max_length=10, blank=True, default="")
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "image_asset"
+
+    def __str__(self):
+        return f"{self.public_id} ({self.ref_count})"
@@ -0,0 +1,194 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on a unique ``(ordering_field, id)`` key. Each page is
+    a range query on the composite index, so deep pages cost the same as
+    the first one. The field and its direction come from ``?ordering=``
+    when it names one of the view's ``ordering_fields``, search results
+    included; orderings a key cannot express are refused.
+    """
+
+    ordering_field = "price_with_discount"
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    ordering_query_param = api_settings.ORDERING_PARAM
+    page_size = 24
+    max_page_size = 100
+    invalid_cursor_message = "Invalid cursor"
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def get_ordering(self, request, view):
+        """``(field, descending)`` of the keyset for this request."""
+        ordering = request.query_params.get(self.ordering_query_param, "").strip()
+        if not ordering:
+            return self.ordering_field, False
+        field = ordering.removeprefix("-")
+        if "," in ordering or field not in getattr(view, "ordering_fields", ()):
+            raise ValidationError({"error": (
+                f"Cursor pages support ordering by one of "
+                f"{list(getattr(view, 'ordering_fields', ()))}, optionally with '-'."
+            )})
+        return field, ordering.startswith("-")
+
+    def encode_cursor(self, value, pk, reverse):
+        raw = f"{self.ordering}:{value!r}:{pk}:{int(reverse)}".encode("ascii")
+        return urlsafe_b64encode(raw).decode("ascii")
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            ordering, value, pk, reverse = urlsafe_b64decode(
+                encoded.encode("ascii")).decode("ascii").split(":")
+            if ordering != self.ordering:
+                raise ValueError(ordering)
+            value = model._meta.get_field(self.field).to_python(value)
+            return value, int(pk), bool(int(reverse))
+        except (TypeError, ValueError, UnicodeError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size_value = self.get_page_size(request)
+        self.field, descending = self.get_ordering(request, view)
+        self.ordering = f"-{self.field}" if descending else self.field
+        cursor = self.decode_cursor(request, queryset.model)
+        field = self.field
+
+        self.reverse = bool(cursor and cursor[2])
+        # Walking back flips the direction of both parts of the key.
+        backwards = descending != self.reverse
+        if cursor:
+            value, pk = cursor[0], cursor[1]
+            after = "lt" if backwards else "gt"
+            pk_after = "lt" if self.reverse else "gt"
+            queryset = queryset.filter(
+                Q(**{f"{field}__{after}": value})
+                | Q(**{field: value, f"pk__{pk_after}": pk})
+            )
+        ordering = (
+            f"-{field}" if backwards else field,
+            "-pk" if self.reverse else "pk",
+        )
+        items = list(queryset.order_by(*ordering)[:self.page_size_value + 1])
+
+        has_more = len(items) > self.page_size_value
+        items = items[:self.page_size_value]
+        if self.reverse:
+            items.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+        self.page = items
+        return items
+
+    def _link(self, item, reverse):
+        url = self.request.build_absolute_uri()
+        cursor = self.encode_cursor(getattr(item, self.field), item.pk, reverse)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self._link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            url = self.request.build_absolute_uri()
+            return remove_query_param(url, self.cursor_query_param)
+        return self._link(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "The pagination cursor value.",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.page_size_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Number of results to return per page.",
+                "schema": {"type": "integer"},
+            },
+        ]
+
+
+class ProductPagination(BasePagination):
+    """
+    Opt-in pagination for the catalog. ``cursor``/``page_size`` switch to
+    keyset pages for the storefront, ``limit``/``offset`` keep offset pages
+    for the admin UI, and without either the full list is returned as before.
+    """
+
+    keyset_class = KeysetPagination
+    offset_class = LimitOffsetPagination
+
+    def get_delegate(self, request):
+        params = request.query_params
+        if (
+            self.keyset_class.cursor_query_param in params
+            or self.keyset_class.page_size_query_param in params
+        ):
+            return self.keyset_class()
+        if self.offset_class.limit_query_param in params:
+            return self.offset_class()
+        return None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.delegate = self.get_delegate(request)
+        if self.delegate is None:
+            return None
+        return self.delegate.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.delegate.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.keyset_class().get_paginated_response_schema(schema)
+
+    def get_schema_operation_parameters(self, view):
+        return (
+            self.keyset_class().get_schema_operation_parameters(view)
+            + self.offset_class().get_schema_operation_parameters(view)
+        )
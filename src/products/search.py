@@ -0,0 +1,373 @@
+import math
+import re
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+
+from products.models import Product
+from products.services import get_catalog_version
+
+
+# Fields indexed for search and their ranking weights.
+SEARCH_FIELDS = {
+    "product_name_uk": 10.0,
+    "product_name_en": 10.0,
+    "article": 5.0,
+    "ingredients": 2.0,
+    "description_uk": 1.0,
+    "description_en": 1.0,
+}
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def get_search_settings() -> dict:
+    conf = getattr(settings, "PRODUCT_SEARCH", {})
+    return {
+        "BACKEND": conf.get("BACKEND", "auto"),
+        "LIMIT": conf.get("LIMIT", 200),
+        "MIN_SIMILARITY": conf.get("MIN_SIMILARITY", 0.4),
+    }
+
+
+def normalize(text: str) -> str:
+    return (text or "").casefold().replace("ʼ", "'").replace("’", "'")
+
+
+def split_terms(query: str) -> list[str]:
+    return _WORD_RE.findall(normalize(query))
+
+
+def document_ngrams(text: str) -> set[str]:
+    """Trigrams of every word padded with spaces, plus the word-start bigram."""
+    grams = set()
+    for word in split_terms(text):
+        padded = f" {word} "
+        grams.add(padded[:2])
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+def query_ngrams(term: str) -> list[str]:
+    """
+    Short terms match word starts only, longer terms are matched by their
+    trigrams so that substrings and single typos still hit.
+    """
+    if len(term) < 3:
+        return [f" {term}"]
+    return sorted({term[i:i + 3] for i in range(len(term) - 2)})
+
+
+def score_terms(terms, doc_grams_by_field, min_similarity):
+    """
+    Relevance of one document for the query terms. A term counts only when
+    at least ``min_similarity`` of its n-grams are present in the document.
+    """
+    score = 0.0
+    for term in terms:
+        grams = query_ngrams(term)
+        required = max(1, math.ceil(len(grams) * min_similarity))
+        matched = 0
+        weight = 0.0
+        for gram in grams:
+            gram_weight = sum(
+                SEARCH_FIELDS[field]
+                for field, field_grams in doc_grams_by_field.items()
+                if gram in field_grams
+            )
+            if gram_weight:
+                matched += 1
+                weight += gram_weight
+        if matched >= required:
+            score += weight / len(grams)
+    return score
+
+
+class BaseSearchBackend:
+    def search(self, query: str, limit: int | None = None, ids=None) -> list[int]:
+        """
+        Return product ids ordered by relevance, at most ``limit`` or
+        ``LIMIT``. ``ids`` restricts the search to those products, the
+        already filtered catalog, and lifts the default cap.
+        """
+        raise NotImplementedError
+
+    def index(self, product: Product) -> None:
+        raise NotImplementedError
+
+    def remove(self, product_id: int) -> None:
+        raise NotImplementedError
+
+    def rebuild(self) -> None:
+        raise NotImplementedError
+
+    @staticmethod
+    def iter_documents():
+        fields = ["id", *SEARCH_FIELDS]
+        return Product.objects.values(*fields).iterator(chunk_size=500)
+
+
+class InMemorySearchBackend(BaseSearchBackend):
+    """
+    Process-local n-gram inverted index. Used when the database cannot host
+    an FTS5 table; each worker builds it lazily on the first search, keeps
+    it current from the Product signals and rebuilds it when another worker
+    has changed the catalog.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = None
+        self._documents = {}
+        self._version = None
+
+    def _ensure_built(self):
+        if self._postings is None or self._version != get_catalog_version():
+            self.rebuild()
+
+    def rebuild(self):
+        version = get_catalog_version()
+        postings = defaultdict(dict)
+        documents = {}
+        for row in self.iter_documents():
+            self._add(postings, documents, row["id"], row)
+        with self._lock:
+            self._postings = postings
+            self._documents = documents
+            self._version = version
+
+    @staticmethod
+    def _add(postings, documents, product_id, values):
+        grams_by_field = {
+            field: document_ngrams(values.get(field)) for field in SEARCH_FIELDS
+        }
+        documents[product_id] = grams_by_field
+        for field, grams in grams_by_field.items():
+            for gram in grams:
+                bucket = postings[gram]
+                bucket[product_id] = bucket.get(product_id, 0.0) + SEARCH_FIELDS[field]
+
+    def _discard(self, product_id):
+        grams_by_field = self._documents.pop(product_id, None)
+        if not grams_by_field:
+            return
+        for grams in grams_by_field.values():
+            for gram in grams:
+                bucket = self._postings.get(gram)
+                if bucket is not None:
+                    bucket.pop(product_id, None)
+                    if not bucket:
+                        del self._postings[gram]
+
+    def index(self, product):
+        if self._postings is None:
+            return
+        values = {field: getattr(product, field) for field in SEARCH_FIELDS}
+        with self._lock:
+            self._discard(product.pk)
+            self._add(self._postings, self._documents, product.pk, values)
+
+    def remove(self, product_id):
+        if self._postings is None:
+            return
+        with self._lock:
+            self._discard(product_id)
+
+    def search(self, query, limit=None, ids=None):
+        conf = get_search_settings()
+        if ids is None:
+            limit = limit or conf["LIMIT"]
+        terms = split_terms(query)
+        if not terms:
+            return []
+        self._ensure_built()
+
+        with self._lock:
+            candidates = set()
+            for term in terms:
+                for gram in query_ngrams(term):
+                    candidates.update(self._postings.get(gram, ()))
+            if ids is not None:
+                candidates.intersection_update(ids)
+            scored = []
+            for product_id in candidates:
+                score = score_terms(
+                    terms, self._documents[product_id], conf["MIN_SIMILARITY"]
+                )
+                if score:
+                    scored.append((-score, product_id))
+        scored.sort()
+        return [product_id for _, product_id in scored[:limit]]
+
+
+class SQLiteFTS5SearchBackend(BaseSearchBackend):
+    """
+    FTS5 virtual table with the trigram tokenizer, stored next to the
+    catalog so every worker shares it. Candidates are ranked by bm25 and
+    then checked against the same n-gram similarity as the in-memory index.
+    """
+
+    table = "product_search"
+    candidate_factor = 5
+
+    def __init__(self):
+        self._ready = False
+
+    @classmethod
+    def is_supported(cls):
+        if connection.vendor != "sqlite":
+            return False
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS temp.fts5_probe "
+                    "USING fts5(value, tokenize = 'trigram')"
+                )
+                cursor.execute("DROP TABLE temp.fts5_probe")
+        except Exception:
+            return False
+        return True
+
+    def _ensure_table(self):
+        if self._ready:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+                [self.table],
+            )
+            created = cursor.fetchone() is None
+            if created:
+                columns = ", ".join(SEARCH_FIELDS)
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING fts5("
+                    f"{columns}, names_folded UNINDEXED, tokenize = 'trigram')"
+                )
+        # A table created inside a transaction that is rolled back is gone,
+        # so readiness is only remembered once it has been committed.
+        transaction.on_commit(self._mark_ready)
+        if created:
+            self.rebuild()
+
+    def _mark_ready(self):
+        self._ready = True
+
+    def _insert(self, cursor, product_id, values):
+        # SQLite's LIKE only folds ASCII, so short queries are matched
+        # against a pre-folded copy of both names.
+        names_folded = " " + " ".join(
+            split_terms(f"{values.get('product_name_uk')} {values.get('product_name_en')}")
+        )
+        columns = ", ".join(SEARCH_FIELDS)
+        placeholders = ", ".join(["%s"] * (len(SEARCH_FIELDS) + 2))
+        cursor.execute(
+            f"INSERT INTO {self.table} (rowid, {columns}, names_folded) "
+            f"VALUES ({placeholders})",
+            [
+                product_id,
+                *(values.get(field) or "" for field in SEARCH_FIELDS),
+                names_folded,
+            ],
+        )
+
+    def rebuild(self):
+        self._ensure_table()
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+            for row in self.iter_documents():
+                self._insert(cursor, row["id"], row)
+
+    def index(self, product):
+        self._ensure_table()
+        values = {field: getattr(product, field) for field in SEARCH_FIELDS}
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid = %s", [product.pk])
+            self._insert(cursor, product.pk, values)
+
+    def remove(self, product_id):
+        self._ensure_table()
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid = %s", [product_id])
+
+    def search(self, query, limit=None, ids=None):
+        conf = get_search_settings()
+        if ids is None:
+            limit = limit or conf["LIMIT"]
+        # Restricted searches rank every match and drop the rest afterwards.
+        candidate_limit = limit * self.candidate_factor if limit else -1
+        terms = split_terms(query)
+        if not terms:
+            return []
+        self._ensure_table()
+
+        columns = ", ".join(SEARCH_FIELDS)
+        grams = sorted({g for term in terms if len(term) >= 3 for g in query_ngrams(term)})
+        with connection.cursor() as cursor:
+            if grams:
+                weights = ", ".join(
+                    [str(weight) for weight in SEARCH_FIELDS.values()] + ["0.0"]
+                )
+                match = " OR ".join('"{}"'.format(g.replace('"', '""')) for g in grams)
+                cursor.execute(
+                    f"SELECT rowid, {columns} FROM {self.table} "
+                    f"WHERE {self.table} MATCH %s "
+                    f"ORDER BY bm25({self.table}, {weights}) LIMIT %s",
+                    [match, candidate_limit],
+                )
+                rows = cursor.fetchall()
+            else:
+                # The trigram tokenizer needs at least three characters,
+                # shorter terms are matched as word prefixes of the names.
+                conditions = ["instr(names_folded, %s) > 0"] * len(terms)
+                params = [f" {term}" for term in terms]
+                cursor.execute(
+                    f"SELECT rowid, {columns} FROM {self.table} "
+                    f"WHERE {' OR '.join(conditions)} LIMIT %s",
+                    [*params, candidate_limit],
+                )
+                rows = cursor.fetchall()
+
+        scored = []
+        for row in rows:
+            if ids is not None and row[0] not in ids:
+                continue
+            grams_by_field = {
+                field: document_ngrams(value)
+                for field, value in zip(SEARCH_FIELDS, row[1:])
+            }
+            score = score_terms(terms, grams_by_field, conf["MIN_SIMILARITY"])
+            if score:
+                scored.append((-score, row[0]))
+        scored.sort()
+        return [product_id for _, product_id in scored[:limit]]
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_search_backend() -> BaseSearchBackend:
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                path = get_search_settings()["BACKEND"]
+                if path == "auto":
+                    backend_class = (
+                        SQLiteFTS5SearchBackend
+                        if SQLiteFTS5SearchBackend.is_supported()
+                        else InMemorySearchBackend
+                    )
+                else:
+                    backend_class = import_string(path)
+                _backend = backend_class()
+    return _backend
+
+
+def reset_search_backend():
+    global _backend
+    _backend = None
@@ -1,17 +1,74 @@
-import cloudinary.uploader
-from django.conf import settings
 from django.utils.translation import get_language
 from django.utils.translation import gettext_lazy as _
-from PIL import Image
 from rest_framework import serializers
 from users.constants import Role
 
+from products.assets import enqueue_asset_deletion, write_with_uploads
+from products.direct_uploads import SLOTS
+from products.image_urls import get_image_variants
+from products.images import (ImageError, get_image_settings, read_image_header,
+                             transcode_images)
 from products.models import (BannerProduct, Product, ProductImage,
                              ProductPurposeCategory, ProductReview,
                              ProductTypeCategory, PromoCode)
 
 
+class SparseFieldsetMixin:
+    """
+    Sparse fieldsets for read requests: ``?fields=id,name`` keeps only the
+    listed keys and ``?expand=reviews`` adds fields from
+    ``Meta.expandable_fields``, which are left out by default. Only the
+    top-level serializer of a request is affected; serializers that add
+    keys in ``to_representation`` pass the result through
+    ``filter_sparse_fields``.
+    """
+
+    fields_query_param = "fields"
+    expand_query_param = "expand"
+
+    def get_requested_fields(self, param):
+        request = self.context.get("request", None)
+        if request is None or request.method not in ("GET", "HEAD"):
+            return None
+        parent = self.parent
+        if parent is not None and not (
+            isinstance(parent, serializers.ListSerializer) and parent.parent is None
+        ):
+            return None
+        value = request.query_params.get(param)
+        if value is None:
+            return None
+        return {name.strip() for name in value.split(",") if name.strip()}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        expand = self.get_requested_fields(self.expand_query_param) or set()
+        for name in getattr(self.Meta, "expandable_fields", ()):
+            if name not in expand:
+                fields.pop(name, None)
+        only = self.get_requested_fields(self.fields_query_param)
+        if only:
+            for name in list(fields):
+                if name not in only:
+                    fields.pop(name)
+        return fields
+
+    def filter_sparse_fields(self, representation):
+        only = self.get_requested_fields(self.fields_query_param)
+        if only:
+            for key in list(representation):
+                if key not in only:
+                    representation.pop(key)
+        return representation
+
+
 class ImageValidator:
+    """
+    Checks uploads from the image header alone. Files over the size or
+    resolution limits are downscaled and re-encoded locally when
+    ``IMAGE_UPLOADS["TRANSCODE"]`` allows it, instead of being rejected.
+    """
+
     def __init__(self, max_size_mb=1, max_width=1920, max_height=1080, allowed_extensions=None):
         self.max_size_mb = max_size_mb
         self.max_width = max_width
@@ -19,24 +76,67 @@ class ImageValidator:
         self.allowed_extensions = allowed_extensions or (".jpg", ".jpeg", ".png", ".webp")
 
     def __call__(self, image):
+        return self.prepare([image], many=False)[0]
+
+    def check(self, image) -> bool:
+        """Validate ``image`` and return whether it has to be transcoded."""
         if not image.name.lower().endswith(self.allowed_extensions):
             raise serializers.ValidationError(_(f"Only file types {self.allowed_extensions} are allowed."))
-
-        if image.size > self.max_size_mb * 1024 * 1024:
+        try:
+            _format, width, height = read_image_header(image)
+        except ImageError as e:
+            raise serializers.ValidationError(_(str(e)))
+
+        transcode = get_image_settings()["TRANSCODE"]
+        too_large = image.size > self.max_size_mb * 1024 * 1024
+        too_wide = self.max_width is not None and (
+            width > self.max_width or height > self.max_height
+        )
+        if transcode == "all" or (transcode == "oversized" and (too_large or too_wide)):
+            return True
+        if too_large:
             raise serializers.ValidationError(_(f"File size must be <= {self.max_size_mb}MB."))
-
-        image.file.seek(0)
-        img = Image.open(image.file)
-        width, height = img.size
-        if width > self.max_width or height > self.max_height:
+        if too_wide:
             raise serializers.ValidationError(
                 _(f"Image resolution must be <= {self.max_width}x{self.max_height}px.")
             )
+        return False
+
+    def prepare(self, images, many=True):
+        """
+        Validate every image, then transcode the flagged ones in parallel.
+        Errors are collected per file as ``[name, message]``.
+        """
+        images = list(images)
+        errors, flagged = [], []
+        for index, image in enumerate(images):
+            try:
+                if self.check(image):
+                    flagged.append(index)
+            except serializers.ValidationError as e:
+                if not many:
+                    raise
+                errors.append([image.name, str(e)])
+        if errors:
+            raise serializers.ValidationError(errors)
+
+        transcoded = transcode_images(
+            [images[index] for index in flagged], self.max_width, self.max_height
+        )
+        for index, image in zip(flagged, transcoded):
+            if image.size > self.max_size_mb * 1024 * 1024:
+                errors.append(
+                    [images[index].name, _(f"File size must be <= {self.max_size_mb}MB.")]
+                )
+            images[index] = image
+        if errors:
+            raise serializers.ValidationError(errors if many else errors[0][1])
+        return images
 
 
-class ProductPurposeCategorySerializer(serializers.ModelSerializer):
+class ProductPurposeCategorySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     image = serializers.ImageField(required=False)
-    upload_image = serializers.ImageField(write_only=True, required=False)
+    upload_image = serializers.FileField(write_only=True, required=False)
 
     class Meta:
         model = ProductPurposeCategory
@@ -44,8 +144,7 @@ class ProductPurposeCategorySerializer(serializers.ModelSerializer):
 
     def validate_upload_image(self, image):
         validator = ImageValidator()
-        validator(image)
-        return image
+        return validator(image)
 
     def to_representation(self, instance):
         representation = super().to_representation(instance)
@@ -65,11 +164,12 @@ class ProductPurposeCategorySerializer(serializers.ModelSerializer):
         else:
             representation.pop("category_name_uk", None)
             representation.pop("category_name_en", None)
-        if instance.image:
-            representation["image"] = (
-                f"https://res.cloudinary.com/{settings.CLOUDINARY_CLOUD_NAME}/image/upload/{instance.image}"
-            )
-        return representation
+        # ``image`` stays the full-size original; the thumbnail is a crop.
+        variants = get_image_variants(instance.image, "thumbnail")
+        if variants:
+            representation["image_thumbnail"] = variants["src"]
+            representation["image_srcset"] = variants["srcset"]
+        return self.filter_sparse_fields(representation)
 
     def create(self, validated_data):
         image = validated_data.pop("image", None)
@@ -93,33 +193,36 @@ class ProductPurposeCategorySerializer(serializers.ModelSerializer):
                     )
                 }
             )
-        instance = ProductPurposeCategory.objects.create(**validated_data)
-        if image:
-            instance.image = image
-            instance.save()
-        return instance
+
+        def write(resources):
+            instance = ProductPurposeCategory.objects.create(**validated_data)
+            if resources:
+                instance.image = resources[0]
+                instance.save()
+            return instance
+
+        return write_with_uploads([image] if image else [], write)
 
     def update(self, instance, validated_data):
         new_image = validated_data.pop("upload_image", None)
-        if new_image and instance.image:
-            try:
-                public_id = (
-                    instance.image.public_id
-                    if hasattr(instance.image, "public_id")
-                    else instance.image.name.split(".")[0]
-                )
-                cloudinary.uploader.destroy(public_id)
-            except Exception as e:
-                print(f"Cloudinary delete error: {e}")
 
-            instance.image = new_image
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
-        return instance
+        def write(resources):
+            old_image = None
+            if resources:
+                old_image = instance.image
+                instance.image = resources[0]
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            instance.save()
+            enqueue_asset_deletion(old_image)
+            return instance
+
+        return write_with_uploads(
+            [new_image] if new_image and instance.image else [], write
+        )
 
 
-class ProductTypeCategorySerializer(serializers.ModelSerializer):
+class ProductTypeCategorySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     product_count = serializers.IntegerField(read_only=True)
 
     class Meta:
@@ -174,18 +277,22 @@ class ProductTypeCategorySerializer(serializers.ModelSerializer):
         else:
             representation.pop("type_name_uk", None)
             representation.pop("type_name_en", None)
-        return representation
+        return self.filter_sparse_fields(representation)
 
 
 class ProductImageSerializer(serializers.ModelSerializer):
     image = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = ProductImage
-        fields = ["id", "image", "order"]
+        fields = ["id", "image", "image_srcset", "order"]
 
     def get_image(self, obj):
-        return f"https://res.cloudinary.com/{settings.CLOUDINARY_CLOUD_NAME}/image/upload/{obj.image}"
+        return get_image_variants(obj.image, "gallery")["src"]
+
+    def get_image_srcset(self, obj):
+        return get_image_variants(obj.image, "gallery")["srcset"]
 
 
 class ProductReviewSerializer(serializers.ModelSerializer):
@@ -226,7 +333,7 @@ class ProductReviewSerializer(serializers.ModelSerializer):
         return obj.product.product_name_en
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     purpose_category = serializers.PrimaryKeyRelatedField(
         many=True,
         queryset=ProductPurposeCategory.objects.all(),
@@ -234,7 +341,7 @@ class ProductSerializer(serializers.ModelSerializer):
     )
     images = ProductImageSerializer(many=True, read_only=True)
     upload_images = serializers.ListField(
-        child=serializers.ImageField(),
+        child=serializers.FileField(),
         write_only=True,
         required=False,
         label=_("Upload Images"),
@@ -250,8 +357,11 @@ class ProductSerializer(serializers.ModelSerializer):
     write_only=True,
     required=False,
     )
-    reviews = ProductReviewSerializer(many=True, read_only=True)
+    reviews = ProductReviewSerializer(
+        many=True, read_only=True, source="get_approved_reviews"
+    )
     average_rating = serializers.SerializerMethodField(read_only=True)
+    rating_histogram = serializers.SerializerMethodField(read_only=True)
     is_discount = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
@@ -282,6 +392,8 @@ class ProductSerializer(serializers.ModelSerializer):
             "application_en",
             "reviews",
             "average_rating",
+            "rating_count",
+            "rating_histogram",
             "meta_tag_title_uk",
             "meta_tag_title_en",
             "meta_tag_description_uk",
@@ -290,15 +402,7 @@ class ProductSerializer(serializers.ModelSerializer):
 
     def validate_upload_images(self, images):
         validator = ImageValidator()
-        errors = []
-        for image in images:
-            try:
-                validator(image)
-            except serializers.ValidationError as e:
-                errors.append([image.name, str(e)])
-        if errors:
-            raise serializers.ValidationError(errors)
-        return images
+        return validator.prepare(images)
     
     def validate_update_images_order(self, value):
         for image in value:
@@ -311,25 +415,45 @@ class ProductSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         purpose_categories = validated_data.pop("purpose_category", [])
         images_data = validated_data.pop("upload_images", [])
-        product = Product.objects.create(**validated_data)
-        product.purpose_category.set(purpose_categories)
         max_images = 5
         number_of_images = len(images_data)
         if number_of_images > max_images:
             raise serializers.ValidationError(
                 {"upload_images": _(f"You can't add more than {max_images} images.")}
             )
-        for image_data in images_data:
-            ProductImage.objects.create(product=product, image=image_data)
-        return product
+
+        def write(resources):
+            product = Product.objects.create(**validated_data)
+            product.purpose_category.set(purpose_categories)
+            self._add_images(product, resources)
+            return product
+
+        return self._write_with_uploads(images_data, write)
+
+    def _add_images(self, product, resources):
+        """Add the rows in one insert, ordered after the product's current images."""
+        first_order = product.images.count()
+        ProductImage.objects.bulk_create([
+            ProductImage(product=product, image=resource, order=first_order + position)
+            for position, resource in enumerate(resources)
+        ])
+
+    def _write_with_uploads(self, images_data, write):
+        """Upload in parallel before ``write`` runs in its short transaction."""
+        try:
+            return write_with_uploads(images_data, write)
+        except serializers.ValidationError:
+            raise
+        except Exception as e:
+            raise serializers.ValidationError(
+                {"upload_images": _(f"Image upload failed: {e}")}
+            )
 
     def update(self, instance, validated_data):
         remove_image_ids = validated_data.pop("remove_images", [])
-        ProductImage.objects.filter(id__in=remove_image_ids, product=instance).delete()
         images_data = validated_data.pop("upload_images", [])
         max_images = 10
-        product = Product.objects.get(id=instance.id)
-        existing_count = product.images.count()
+        existing_count = instance.images.exclude(id__in=remove_image_ids).count()
         new_count = len(images_data)
         if existing_count + new_count > max_images:
             raise serializers.ValidationError(
@@ -337,29 +461,31 @@ class ProductSerializer(serializers.ModelSerializer):
                 _(f"You can't add more than {max_images} images. Right now you have {existing_count} \
                 images and you are trying to add {new_count} new ones.")}
             )
-        for image_data in images_data:
-            ProductImage.objects.create(product=instance, image=image_data)
-
         order_data = validated_data.pop("update_images_order", [])
-        for image_info in order_data:
-            image_id = image_info.get("id")
-            new_order = image_info.get("order")
-            ProductImage.objects.filter(id=image_id, product=instance).update(order=new_order)
 
-        return super().update(instance, validated_data)
+        def write(resources):
+            ProductImage.objects.filter(id__in=remove_image_ids, product=instance).delete()
+            self._add_images(instance, resources)
+            for image_info in order_data:
+                image_id = image_info.get("id")
+                new_order = image_info.get("order")
+                ProductImage.objects.filter(id=image_id, product=instance).update(order=new_order)
+            return super(ProductSerializer, self).update(instance, validated_data)
+
+        return self._write_with_uploads(images_data, write)
 
     def get_average_rating(self, obj):
         return obj.get_average_rating()
 
+    def get_rating_histogram(self, obj):
+        return obj.get_rating_histogram()
+
     def get_is_discount(self, obj):
         return obj.discount > 0
 
     def to_representation(self, instance):
         representation = super().to_representation(instance)
         request = self.context.get("request", None)
-        approved_reviews = [
-            review for review in representation["reviews"] if review["is_approved"]
-        ]
         lang_code = get_language()
         if lang_code == "uk":
             representation["name"] = instance.product_name_uk
@@ -391,12 +517,89 @@ class ProductSerializer(serializers.ModelSerializer):
             representation.pop("meta_tag_title_en", None)
             representation.pop("meta_tag_description_uk", None)
             representation.pop("meta_tag_description_en", None)
+        return self.filter_sparse_fields(representation)
+
 
-        approved_reviews = [
-            review for review in representation["reviews"] if review["is_approved"]
+class ProductListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """
+    Catalog tile: name, prices, the first image, rating and flags. Heavier
+    fields are only serialized when requested with ``?expand=``.
+    """
+    name = serializers.SerializerMethodField()
+    is_discount = serializers.SerializerMethodField()
+    image = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
+    average_rating = serializers.SerializerMethodField()
+    description = serializers.SerializerMethodField()
+    images = ProductImageSerializer(many=True, read_only=True)
+    reviews = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Product
+        fields = [
+            "id",
+            "article",
+            "name",
+            "price",
+            "discount",
+            "is_discount",
+            "price_with_discount",
+            "image",
+            "image_srcset",
+            "average_rating",
+            "rating_count",
+            "available",
+            "is_new",
+            "is_best_seller",
+            "volume_ml",
+            "purpose_category",
+            "type_category",
+            "description",
+            "images",
+            "reviews",
         ]
-        representation["reviews"] = approved_reviews
-        return representation
+        read_only_fields = fields
+        expandable_fields = [
+            "volume_ml",
+            "purpose_category",
+            "type_category",
+            "description",
+            "images",
+            "reviews",
+        ]
+
+    def get_name(self, obj):
+        if get_language() == "uk":
+            return obj.product_name_uk
+        return obj.product_name_en
+
+    def get_description(self, obj):
+        if get_language() == "uk":
+            return obj.description_uk
+        return obj.description_en
+
+    def get_is_discount(self, obj):
+        return obj.discount > 0
+
+    def get_image(self, obj):
+        images = obj.images.all()
+        if not images:
+            return None
+        return get_image_variants(images[0].image, "card")["src"]
+
+    def get_image_srcset(self, obj):
+        images = obj.images.all()
+        if not images:
+            return None
+        return get_image_variants(images[0].image, "card")["srcset"]
+
+    def get_average_rating(self, obj):
+        return obj.get_average_rating()
+
+    def get_reviews(self, obj):
+        return ProductReviewSerializer(
+            obj.get_approved_reviews(), many=True, context=self.context
+        ).data
 
 
 class PromoCodeSerializer(serializers.ModelSerializer):
@@ -426,17 +629,111 @@ class PromoCodeValidateSerializer(serializers.Serializer):
 
 class PromoCodeValidateResponseSerializer(serializers.Serializer):
     discount_percent = serializers.IntegerField()
+
+
+class ProductSuggestQuerySerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=100, trim_whitespace=True)
+    limit = serializers.IntegerField(min_value=1, max_value=20, default=10)
+
+
+class ProductBulkPriceSerializer(serializers.Serializer):
+    articles = serializers.ListField(
+        child=serializers.CharField(max_length=50), required=False, allow_empty=False
+    )
+    type_category = serializers.PrimaryKeyRelatedField(
+        queryset=ProductTypeCategory.objects.all(), required=False
+    )
+    purpose_category = serializers.PrimaryKeyRelatedField(
+        queryset=ProductPurposeCategory.objects.all(), required=False
+    )
+    all = serializers.BooleanField(default=False)
+    price = serializers.IntegerField(min_value=1, required=False)
+    price_percent = serializers.IntegerField(min_value=-99, required=False)
+    discount = serializers.IntegerField(min_value=0, max_value=100, required=False)
+
+    def validate(self, data):
+        selectors = {"articles", "type_category", "purpose_category"} & data.keys()
+        if not selectors and not data["all"]:
+            raise serializers.ValidationError(
+                _("Select products by articles, type_category or purpose_category, "
+                  "or set all to true.")
+            )
+        if "price" in data and "price_percent" in data:
+            raise serializers.ValidationError(
+                {"price_percent": _("Use either price or price_percent, not both.")}
+            )
+        if not {"price", "price_percent", "discount"} & data.keys():
+            raise serializers.ValidationError(
+                _("Nothing to change: pass price, price_percent or discount.")
+            )
+        return data
+
+
+class DirectUploadSignSerializer(serializers.Serializer):
+    slot = serializers.ChoiceField(choices=list(SLOTS))
+    object_id = serializers.IntegerField(required=False)
+
+
+class DirectUploadConfirmSerializer(serializers.Serializer):
+    token = serializers.CharField()
+    public_id = serializers.CharField(max_length=255)
+    version = serializers.IntegerField()
+    signature = serializers.CharField()
     
 
-class BannerProductSerializer(serializers.ModelSerializer):
-    product = ProductSerializer(read_only=True)
+class ProductImportRowSerializer(serializers.Serializer):
+    """
+    One row of a catalog import. Category ids are checked against the sets
+    in ``context`` instead of one query per row.
+    """
+    article = serializers.CharField(max_length=50)
+    available = serializers.BooleanField(default=False)
+    product_name_uk = serializers.CharField(max_length=250)
+    product_name_en = serializers.CharField(max_length=250)
+    price = serializers.IntegerField(min_value=1)
+    discount = serializers.IntegerField(min_value=0, max_value=100, default=0)
+    description_uk = serializers.CharField(allow_blank=True, default="")
+    description_en = serializers.CharField(allow_blank=True, default="")
+    volume_ml = serializers.IntegerField(min_value=1)
+    type_category = serializers.IntegerField()
+    purpose_category = serializers.ListField(
+        child=serializers.IntegerField(), required=False
+    )
+    is_new = serializers.BooleanField(default=False)
+    is_best_seller = serializers.BooleanField(default=False)
+    ingredients = serializers.CharField(max_length=750, allow_blank=True, default="")
+    application_uk = serializers.CharField(allow_blank=True, default="")
+    application_en = serializers.CharField(allow_blank=True, default="")
+    meta_tag_title_uk = serializers.CharField(default="Meta tag UK")
+    meta_tag_title_en = serializers.CharField(default="Meta tag EN")
+    meta_tag_description_uk = serializers.CharField(default="Meta tag description UK")
+    meta_tag_description_en = serializers.CharField(default="Meta tag description EN")
+
+    def validate_type_category(self, value):
+        if value not in self.context["type_categories"]:
+            raise serializers.ValidationError(_("Unknown product type."))
+        return value
+
+    def validate_purpose_category(self, value):
+        unknown = set(value) - self.context["purpose_categories"]
+        if unknown:
+            raise serializers.ValidationError(
+                _("Unknown purpose categories: %s") % sorted(unknown)
+            )
+        return value
+
+
+class BannerProductSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    product = ProductListSerializer(read_only=True)
     product_id = serializers.PrimaryKeyRelatedField(
         queryset=Product.objects.all(), write_only=True
     )
-    image = serializers.ImageField(write_only=True, required=False)
+    image = serializers.FileField(write_only=True, required=False)
     image_url = serializers.SerializerMethodField(read_only=True)
-    background_image = serializers.ImageField(write_only=True, required=True)
+    image_srcset = serializers.SerializerMethodField()
+    background_image = serializers.FileField(write_only=True, required=True)
     background_image_url = serializers.SerializerMethodField()
+    background_image_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = BannerProduct
@@ -447,41 +744,37 @@ class BannerProductSerializer(serializers.ModelSerializer):
                   "left", 
                   "image", 
                   "image_url", 
+                  "image_srcset",
                   "background_image", 
-                  "background_image_url"
+                  "background_image_url",
+                  "background_image_srcset",
                   ]
         
     def validate_image(self, image):
-        self._validate_file(image, field_name="image")
-        return image
+        return self._validate_file(image, field_name="image")
 
     def validate_background_image(self, image):
-        self._validate_file(image, field_name="background_image")
-        return image
+        return self._validate_file(image, field_name="background_image")
 
     def _validate_file(self, image, field_name):
-        allowed_extensions = (".jpg", ".jpeg", ".png", ".webp")
-        max_size_mb = 10
-
-        if not image.name.lower().endswith(allowed_extensions):
-            raise serializers.ValidationError(
-                _(f"Only file types {allowed_extensions} are allowed.")
-            )
-
-        if image.size > max_size_mb * 1024 * 1024:
-            raise serializers.ValidationError(
-                _(f"File size must be <= {max_size_mb}MB.")
-            )
+        validator = ImageValidator(max_size_mb=10, max_width=None, max_height=None)
+        return validator(image)
 
     def get_image_url(self, obj):
-        if obj.image:
-            return f"https://res.cloudinary.com/{settings.CLOUDINARY_CLOUD_NAME}/image/upload/{obj.image}"
-        return None
+        variants = get_image_variants(obj.image, "banner")
+        return variants and variants["src"]
+
+    def get_image_srcset(self, obj):
+        variants = get_image_variants(obj.image, "banner")
+        return variants and variants["srcset"]
 
     def get_background_image_url(self, obj):
-        if obj.background_image:
-            return f"https://res.cloudinary.com/{settings.CLOUDINARY_CLOUD_NAME}/image/upload/{obj.background_image}"
-        return None
+        variants = get_image_variants(obj.background_image, "banner")
+        return variants and variants["src"]
+
+    def get_background_image_srcset(self, obj):
+        variants = get_image_variants(obj.background_image, "banner")
+        return variants and variants["srcset"]
     
     def create(self, validated_data):
         product = validated_data.pop("product_id") 
@@ -490,7 +783,13 @@ class BannerProductSerializer(serializers.ModelSerializer):
                 "product_id": _("Banner for this product already exists.")
             })
         validated_data["product"] = product
-        return super().create(validated_data)
+        fields = [field for field in ("image", "background_image") if validated_data.get(field)]
+
+        def write(resources):
+            validated_data.update(zip(fields, resources))
+            return super(BannerProductSerializer, self).create(validated_data)
+
+        return write_with_uploads([validated_data[field] for field in fields], write)
     
     def update(self, instance, validated_data):
         new_product = validated_data.pop("product_id", None)
@@ -500,28 +799,26 @@ class BannerProductSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError({"product_id": "This product is already linked to another banner."})
             instance.product = new_product
 
-        new_image = validated_data.pop("image", None)
-        new_background_image = validated_data.pop("background_image", None)
+        new_images = {
+            "image": validated_data.pop("image", None),
+            "background_image": validated_data.pop("background_image", None),
+        }
+        fields = [
+            field for field, file in new_images.items() if file and getattr(instance, field)
+        ]
 
-        if new_image and instance.image:
-            try:
-                public_id = instance.image.public_id if hasattr(instance.image, "public_id") else instance.image.name.split(".")[0]
-                cloudinary.uploader.destroy(public_id)
-            except Exception as e:
-                print(f"Cloudinary deletion error: {e}")
+        def write(resources):
+            replaced = []
+            for field, resource in zip(fields, resources):
+                replaced.append(getattr(instance, field))
+                setattr(instance, field, resource)
 
-            instance.image = new_image
-        
-        if new_background_image and instance.background_image:
-            try:
-                cloudinary.uploader.destroy(instance.background_image.public_id)
-            except Exception as e:
-                print(f"Cloudinary background delete error: {e}")
-            instance.background_image = new_background_image
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
 
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
+            instance.save()
+            enqueue_asset_deletion(*replaced)
+            return instance
 
-        instance.save()
-        return instance
+        return write_with_uploads([new_images[field] for field in fields], write)
     
\ No newline at end of file
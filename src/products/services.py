@@ -0,0 +1,143 @@
+from django.db import transaction
+from django.db.models import (Case, Count, F, FloatField, OuterRef, Q, Subquery,
+                              Sum, Value, When)
+from django.db.models.functions import Cast, Coalesce, Greatest, Now
+from django.dispatch import Signal
+
+from products.caching import (CATALOG_CACHE_GROUP, bump_cache_version,
+                              get_cache_version)
+from products.models import Product, ProductReview
+
+
+RATING_STARS = range(1, 6)
+
+# Sent once per set-based change of many products instead of post_save per row;
+# ``product_ids`` is a list or a ``values("pk")`` queryset, for ``pk__in``.
+products_bulk_updated = Signal()
+
+
+def get_catalog_version() -> int:
+    return get_cache_version(CATALOG_CACHE_GROUP)
+
+
+def bump_catalog_version() -> int:
+    return bump_cache_version(CATALOG_CACHE_GROUP)
+
+
+def apply_rating_change(product_id: int, rating: int, delta: int) -> None:
+    """
+    Add (delta=1) or remove (delta=-1) one approved review from the stored
+    aggregates with a single UPDATE. The SET expressions all read the row
+    as it was before the update, so the average is computed from the new
+    sum and count directly.
+    """
+    new_count = F("rating_count") + delta
+    new_sum = F("rating_sum") + rating * delta
+    Product.objects.filter(pk=product_id).update(
+        rating_count=new_count,
+        rating_sum=new_sum,
+        rating_avg=Case(
+            When(rating_count=-delta, then=Value(0.0)),
+            default=Cast(new_sum, FloatField()) / Cast(new_count, FloatField()),
+            output_field=FloatField(),
+        ),
+        **{f"rating_{rating}_count": F(f"rating_{rating}_count") + delta},
+        updated_at=Now(),
+    )
+    transaction.on_commit(bump_catalog_version)
+
+
+@transaction.atomic
+def set_review_approval(review: ProductReview, approved: bool) -> ProductReview:
+    review = ProductReview.objects.select_for_update().get(pk=review.pk)
+    if review.is_approved == approved:
+        return review
+    review.is_approved = approved
+    review.save(update_fields=["is_approved"])
+    apply_rating_change(review.product_id, review.rating, 1 if approved else -1)
+    return review
+
+
+@transaction.atomic
+def delete_review(review: ProductReview) -> None:
+    review = ProductReview.objects.select_for_update().get(pk=review.pk)
+    if review.is_approved:
+        apply_rating_change(review.product_id, review.rating, -1)
+    review.delete()
+
+
+@transaction.atomic
+def rebuild_rating_aggregates() -> int:
+    """Recompute every product's rating aggregates with two set-based UPDATEs."""
+    approved = ProductReview.objects.filter(
+        product=OuterRef("pk"), is_approved=True
+    ).values("product")
+
+    def aggregate(expression):
+        return Coalesce(
+            Subquery(approved.annotate(value=expression).values("value")), 0
+        )
+
+    updated = Product.objects.update(
+        rating_count=aggregate(Count("id")),
+        rating_sum=aggregate(Sum("rating")),
+        **{
+            f"rating_{stars}_count": aggregate(Count("id", filter=Q(rating=stars)))
+            for stars in RATING_STARS
+        },
+    )
+    Product.objects.update(
+        rating_avg=Case(
+            When(rating_count=0, then=Value(0.0)),
+            default=(
+                Cast(F("rating_sum"), FloatField())
+                / Cast(F("rating_count"), FloatField())
+            ),
+            output_field=FloatField(),
+        ),
+        updated_at=Now(),
+    )
+    transaction.on_commit(bump_catalog_version)
+    return updated
+
+
+def get_bulk_queryset(articles=None, type_category=None, purpose_category=None):
+    queryset = Product.objects.all()
+    if articles is not None:
+        queryset = queryset.filter(article__in=articles)
+    if type_category is not None:
+        queryset = queryset.filter(type_category=type_category)
+    if purpose_category is not None:
+        queryset = queryset.filter(
+            pk__in=Product.purpose_category.through.objects.filter(
+                purpose_category=purpose_category
+            ).values("product")
+        )
+    return queryset
+
+
+@transaction.atomic
+def bulk_update_prices(queryset, price=None, price_percent=None, discount=None) -> int:
+    """
+    Reprice every product of ``queryset`` with one UPDATE: ``price`` sets an
+    absolute price, ``price_percent`` scales it (rounded, never below 1)
+    and ``discount`` sets the discount. ``price_with_discount`` is a
+    generated column, so the database keeps it in step. The selection must
+    not depend on the changed fields: receivers re-query it by pk.
+    """
+    changes = {"updated_at": Now()}
+    if price is not None:
+        changes["price"] = Value(price)
+    elif price_percent is not None:
+        changes["price"] = Greatest(
+            (F("price") * (100 + price_percent) + 50) / 100, Value(1)
+        )
+    if discount is not None:
+        changes["discount"] = Value(discount)
+
+    updated = queryset.update(**changes)
+    if updated:
+        products_bulk_updated.send(
+            sender=Product, product_ids=queryset.values("pk"), fields=list(changes)
+        )
+    return updated
@@ -1,29 +1,58 @@
-import requests
-from django.db.models.signals import post_save, post_delete
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save, post_delete
 from django.dispatch import receiver
-from django.contrib.sites.models import Site
 from django.conf import settings
-from products.models import Product
+from products.assets import enqueue_asset_deletion
+from products.caching import CATALOG_CACHE_GROUP, bump_cache_version_on_commit
+from products.models import (BannerProduct, Product, ProductImage,
+                             ProductPurposeCategory, ProductTypeCategory)
+from products.search import SEARCH_FIELDS, get_search_backend
+from products.services import products_bulk_updated
+from products.sitemap_ping import request_sitemap_ping
 
-def ping_google_custom():
-    try:
-        current_site = Site.objects.get_current()
-        sitemap_url = f"https://{current_site.domain}/sitemap.xml"
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_delete, sender=ProductPurposeCategory)
+@receiver(post_delete, sender=BannerProduct)
+def delete_cloudinary_image(sender, instance, **kwargs):
+    enqueue_asset_deletion(
+        getattr(instance, "image", None), getattr(instance, "background_image", None)
+    )
 
-        ping_url = "https://www.google.com/ping"
-        params = {"sitemap": sitemap_url}
-
-        requests.get(ping_url, params=params, timeout=5)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(products_bulk_updated, sender=Product)
+def product_sitemap_changed(sender, **kwargs):
+    if not settings.DEBUG:
+        transaction.on_commit(request_sitemap_ping)
 
-    except Exception:
-        pass
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(products_bulk_updated, sender=Product)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=ProductPurposeCategory)
+@receiver(post_delete, sender=ProductPurposeCategory)
+@receiver(post_save, sender=ProductTypeCategory)
+@receiver(post_delete, sender=ProductTypeCategory)
+@receiver(post_save, sender=BannerProduct)
+@receiver(post_delete, sender=BannerProduct)
+@receiver(m2m_changed, sender=Product.purpose_category.through)
+def product_catalog_changed(sender, **kwargs):
+    bump_cache_version_on_commit(CATALOG_CACHE_GROUP)
 
 @receiver(post_save, sender=Product)
-def product_saved(sender, **kwargs):
-    if not settings.DEBUG:
-        ping_google_custom()
+def product_search_index(sender, instance, **kwargs):
+    get_search_backend().index(instance)
 
 @receiver(post_delete, sender=Product)
-def product_deleted(sender, **kwargs):
-    if not settings.DEBUG:
-        ping_google_custom()
+def product_search_remove(sender, instance, **kwargs):
+    get_search_backend().remove(instance.pk)
+
+@receiver(products_bulk_updated, sender=Product)
+def products_bulk_search_index(sender, product_ids, fields, **kwargs):
+    if not set(fields) & set(SEARCH_FIELDS):
+        return
+    backend = get_search_backend()
+    products = Product.objects.filter(pk__in=product_ids).only(*SEARCH_FIELDS)
+    for product in products.iterator(chunk_size=500):
+        backend.index(product)
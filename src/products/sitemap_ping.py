@@ -0,0 +1,56 @@
+import hashlib
+
+import requests
+from django.conf import settings
+from django.contrib.sites.models import Site
+from django.core.cache import cache
+
+from products.background import run_later_once
+from products.sitemaps import get_sitemap
+
+
+SCHEDULED_KEY = "sitemap-ping:scheduled"
+DIGEST_KEY = "sitemap-ping:digest"
+
+
+def get_ping_delay() -> int:
+    return getattr(settings, "SITEMAP_PING", {}).get("DELAY", 60)
+
+
+def ping_google_custom():
+    try:
+        current_site = Site.objects.get_current()
+        sitemap_url = f"https://{current_site.domain}/sitemap.xml"
+
+        ping_url = "https://www.google.com/ping"
+        params = {"sitemap": sitemap_url}
+
+        requests.get(ping_url, params=params, timeout=5)
+
+    except Exception:
+        pass
+
+
+def get_sitemap_digest() -> str:
+    """Hash of the rendered sitemap; rendering it also warms the cache for crawlers."""
+    digest = hashlib.sha1()
+    section = None
+    while (document := get_sitemap(section)) is not None:
+        digest.update(document.encode())
+        section = (section or 0) + 1
+    return digest.hexdigest()
+
+
+def flush_sitemap_ping() -> bool:
+    """Ping once for everything since the last flush, unless the sitemap is unchanged."""
+    digest = get_sitemap_digest()
+    if cache.get(DIGEST_KEY) == digest:
+        return False
+    ping_google_custom()
+    cache.set(DIGEST_KEY, digest, None)
+    return True
+
+
+def request_sitemap_ping() -> None:
+    """One background ping after ``DELAY`` seconds covers every change in between."""
+    run_later_once(SCHEDULED_KEY, get_ping_delay(), flush_sitemap_ping)
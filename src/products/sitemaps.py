@@ -1,9 +1,148 @@
-from django.contrib.sitemaps import Sitemap
-from products.models import Product
+from itertools import islice
+from xml.sax.saxutils import escape, quoteattr
 
-class ProductSitemap(Sitemap):
-    changefreq = "daily"
-    priority = 1.0
+from django.conf import settings
+from django.contrib.sites.models import Site
+from django.core.cache import cache
+from django.http import Http404, HttpResponse
 
-    def items(self):
-        return Product.objects.all()
+from products.models import Product, ProductImage
+from products.services import get_catalog_version
+
+
+# Google's limit is 50,000 <url> entries per file; every product is listed
+# once per language.
+MAX_URLS_PER_SITEMAP = 50000
+URLSET_OPEN = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" '
+    'xmlns:xhtml="http://www.w3.org/1999/xhtml" '
+    'xmlns:image="http://www.google.com/schemas/sitemap-image/1.1">\n'
+)
+URLSET_CLOSE = "</urlset>\n"
+
+
+def get_sitemap_settings() -> dict:
+    conf = getattr(settings, "SITEMAP", {})
+    return {
+        "LANGUAGE_PREFIXES": conf.get("LANGUAGE_PREFIXES", {"uk": "", "en": "/en"}),
+        "MAX_URLS": conf.get("MAX_URLS", MAX_URLS_PER_SITEMAP),
+        "TIMEOUT": conf.get("TIMEOUT", 60 * 60 * 24),
+    }
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _image_url(image) -> str:
+    return f"https://res.cloudinary.com/{settings.CLOUDINARY_CLOUD_NAME}/image/upload/{image}"
+
+
+def iter_product_entries(base_url, prefixes):
+    """
+    ``<url>`` elements for every product and language, with hreflang
+    alternates, lastmod and images. Products are read as ``(pk, updated_at)``
+    and images once per chunk of products.
+    """
+    products = (
+        Product.objects.only("pk", "updated_at").order_by("pk").iterator(chunk_size=2000)
+    )
+    for chunk in _chunks(products, 2000):
+        images = {}
+        rows = ProductImage.objects.filter(
+            product_id__in=[product.pk for product in chunk]
+        ).order_by("product_id", "order").values_list("product_id", "image")
+        for product_id, image in rows:
+            images.setdefault(product_id, []).append(_image_url(image))
+
+        for product in chunk:
+            path = product.get_absolute_url()
+            locations = {
+                language: f"{base_url}{prefix}{path}" for language, prefix in prefixes.items()
+            }
+            alternates = "".join(
+                f'<xhtml:link rel="alternate" hreflang="{language}" href={quoteattr(url)}/>'
+                for language, url in locations.items()
+            )
+            if settings.LANGUAGE_CODE in locations:
+                default = quoteattr(locations[settings.LANGUAGE_CODE])
+                alternates += (
+                    f'<xhtml:link rel="alternate" hreflang="x-default" href={default}/>'
+                )
+            product_images = "".join(
+                f"<image:image><image:loc>{escape(url)}</image:loc></image:image>"
+                for url in images.get(product.pk, [])
+            )
+            lastmod = product.updated_at.isoformat(timespec="seconds")
+            for url in locations.values():
+                yield (
+                    f"<url><loc>{escape(url)}</loc><lastmod>{lastmod}</lastmod>"
+                    f"<changefreq>daily</changefreq><priority>1.0</priority>"
+                    f"{alternates}{product_images}</url>\n"
+                )
+
+
+def render_sitemaps(base_url) -> tuple[str, list[str]]:
+    """Return the document served at /sitemap.xml and the numbered sections."""
+    conf = get_sitemap_settings()
+    entries = iter_product_entries(base_url, conf["LANGUAGE_PREFIXES"])
+    sections = [
+        URLSET_OPEN + "".join(chunk) + URLSET_CLOSE
+        for chunk in _chunks(entries, conf["MAX_URLS"])
+    ]
+    if len(sections) <= 1:
+        return (sections[0] if sections else URLSET_OPEN + URLSET_CLOSE), []
+
+    index = (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+        + "".join(
+            f"<sitemap><loc>{escape(base_url)}/sitemap-{number}.xml</loc></sitemap>\n"
+            for number in range(1, len(sections) + 1)
+        )
+        + "</sitemapindex>\n"
+    )
+    return index, sections
+
+
+def get_sitemap(section: int | None = None) -> str | None:
+    """
+    The cached sitemap document, rendered again after the catalog version
+    moves on or when a cached part was evicted. ``section`` selects one
+    file of a split sitemap; ``None`` is returned only for numbers outside
+    the range recorded with the root.
+    """
+    prefix = f"sitemap:v{get_catalog_version()}"
+    root_key = f"{prefix}:root"
+    key = root_key if section is None else f"{prefix}:{section}"
+    cached = cache.get_many([key, root_key])
+    if root_key in cached:
+        root, count = cached[root_key]
+        if section is None:
+            return root
+        if not 1 <= section <= count:
+            return None
+    if key in cached:
+        return cached[key]
+
+    base_url = f"https://{Site.objects.get_current().domain}"
+    root, sections = render_sitemaps(base_url)
+    documents = {root_key: (root, len(sections))}
+    documents.update({
+        f"{prefix}:{number}": document
+        for number, document in enumerate(sections, start=1)
+    })
+    cache.set_many(documents, get_sitemap_settings()["TIMEOUT"])
+    if section is None:
+        return root
+    return documents.get(key)
+
+
+def sitemap_view(request, section=None):
+    document = get_sitemap(section)
+    if document is None:
+        raise Http404("No such sitemap section.")
+    return HttpResponse(document, content_type="application/xml; charset=utf-8")
@@ -0,0 +1,96 @@
+import threading
+from bisect import bisect_left
+
+from products.models import Product
+from products.search import split_terms
+from products.services import get_catalog_version
+
+
+# Matches ranked per word position; bounds a lookup for very short prefixes.
+SCAN_LIMIT = 1000
+
+
+class SuggestIndex:
+    """
+    Sorted-array prefix index over product names. Every word start of a
+    name is a key, so "sham" finds both "Shampoo" and "Hair shampoo".
+    Keys are kept in one sorted array per word position, so names that
+    start with the prefix are always ranked ahead of the rest.
+    """
+
+    languages = ("uk", "en")
+
+    def __init__(self):
+        self.version = None
+        self._buckets = {language: [] for language in self.languages}
+
+    def build(self, version):
+        entries = {language: [] for language in self.languages}
+        rows = Product.objects.values_list(
+            "id", "product_name_uk", "product_name_en", "price", "price_with_discount"
+        ).iterator(chunk_size=1000)
+        for product_id, name_uk, name_en, price, price_with_discount in rows:
+            for language, name in (("uk", name_uk), ("en", name_en)):
+                item = (product_id, name, price, price_with_discount)
+                words = split_terms(name)
+                for position in range(len(words)):
+                    if position == len(entries[language]):
+                        entries[language].append([])
+                    key = " ".join(words[position:])
+                    entries[language][position].append((key, item))
+
+        for language in self.languages:
+            buckets = []
+            for bucket in entries[language]:
+                bucket.sort(key=lambda entry: entry[0])
+                buckets.append(
+                    ([entry[0] for entry in bucket], [entry[1] for entry in bucket])
+                )
+            self._buckets[language] = buckets
+        self.version = version
+
+    def lookup(self, prefix, language, limit):
+        language = language if language in self.languages else "uk"
+        prefix = " ".join(split_terms(prefix))
+        if not prefix:
+            return []
+        candidates = {}
+        for keys, items in self._buckets[language]:
+            if len(candidates) >= limit:
+                break
+            start = bisect_left(keys, prefix)
+            end = min(bisect_left(keys, prefix + "\U0010ffff"), start + SCAN_LIMIT)
+            matches = sorted(items[start:end], key=lambda item: (len(item[1]), item[0]))
+            for item in matches:
+                candidates.setdefault(item[0], item)
+        return list(candidates.values())[:limit]
+
+
+_index = SuggestIndex()
+_index_lock = threading.Lock()
+
+
+def get_suggest_index() -> SuggestIndex:
+    """The worker-wide index, rebuilt when the catalog version moves on."""
+    global _index
+    version = get_catalog_version()
+    if _index.version != version:
+        with _index_lock:
+            if _index.version != version:
+                index = SuggestIndex()
+                index.build(version)
+                _index = index
+    return _index
+
+
+def suggest_products(prefix: str, language: str, limit: int = 10) -> list[dict]:
+    return [
+        {
+            "id": product_id,
+            "name": name,
+            "price": price,
+            "price_with_discount": price_with_discount,
+        }
+        for product_id, name, price, price_with_discount
+        in get_suggest_index().lookup(prefix, language, limit)
+    ]
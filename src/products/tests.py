@@ -0,0 +1,1230 @@
+import hashlib
+import io
+import json
+from datetime import timedelta
+from unittest import mock
+
+import cloudinary
+import cloudinary.utils
+from PIL import Image
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from products.models import (AssetDeletion, BannerProduct, ImageAsset, Product,
+                             ProductImage, ProductPurposeCategory, ProductReview,
+                             ProductTypeCategory)
+from products.assets import (_claim_batch, acquire_assets, drain_asset_deletions,
+                             enqueue_asset_deletion)
+from products.asset_gc import collect_orphaned_assets
+from products.catalog_io import import_products
+from products.image_urls import get_image_variants
+from products.search import (InMemorySearchBackend, SQLiteFTS5SearchBackend,
+                             get_search_backend, reset_search_backend)
+from products.serializers import ImageValidator, ProductSerializer
+from products.suggest import suggest_products
+from products.services import (get_catalog_version, products_bulk_updated,
+                               rebuild_rating_aggregates)
+from products.sitemap_ping import flush_sitemap_ping, request_sitemap_ping
+from users.constants import Role
+from users.models import User
+
+
+LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+}
+
+
+def create_product(type_category, article, name_uk, name_en, **kwargs):
+    defaults = {
+        "price": 100,
+        "discount": 0,
+        "description_uk": "Опис",
+        "description_en": "Description",
+        "volume_ml": 100,
+        "ingredients": "Aqua",
+        "application_uk": "Застосування",
+        "application_en": "Application",
+    }
+    defaults.update(kwargs)
+    return Product.objects.create(
+        article=article,
+        product_name_uk=name_uk,
+        product_name_en=name_en,
+        type_category=type_category,
+        **defaults,
+    )
+
+
+class FakeAssetClient:
+    """Stands in for Cloudinary: ``assets`` maps public_id to resource type."""
+
+    def __init__(self, assets=(), fail=False):
+        self.assets = dict.fromkeys(assets, "image")
+        self.fail = fail
+        self.delete_calls = []
+        self.metadata = {}
+        self.created = {}
+
+    def list_resources(self, resource_type="image", prefix=""):
+        long_ago = timezone.now() - timedelta(days=30)
+        for public_id in list(self.assets):
+            if public_id.startswith(prefix):
+                yield public_id, self.created.get(public_id, long_ago)
+
+    def resource(self, public_id, resource_type="image"):
+        return self.metadata.get(
+            public_id, {"format": "jpg", "bytes": 1000, "width": 100, "height": 100}
+        )
+
+    def upload(self, file, resource_type="image"):
+        if "broken" in file.name:
+            raise ConnectionError("Upload failed")
+        public_id = file.name.rsplit(".", 1)[0]
+        self.assets[public_id] = resource_type
+        return cloudinary.CloudinaryResource(
+            public_id=public_id, type="upload", resource_type=resource_type,
+            version=1, format="jpg",
+        )
+
+    def delete(self, public_ids, resource_type="image"):
+        self.delete_calls.append(list(public_ids))
+        if self.fail:
+            raise ConnectionError("Cloudinary is down")
+        return {
+            public_id: "deleted" if self.assets.pop(public_id, None) else "not_found"
+            for public_id in public_ids
+        }
+
+
+def image_file(name, size=(10, 10), color=None):
+    """A PNG upload; its pixels differ per ``name`` unless ``color`` is given."""
+    if color is None:
+        color = tuple(hashlib.sha256(name.encode()).digest()[:3])
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, format="PNG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CatalogTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_search_backend()
+        for target in [
+            "products.signals.request_sitemap_ping",
+            "products.assets.request_asset_drain",
+        ]:
+            patcher = mock.patch(target)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.type_category = ProductTypeCategory.objects.create(
+            type_name_en="Hair", type_name_uk="Волосся"
+        )
+        self.shampoo = create_product(
+            self.type_category, "SH-001", "Шампунь для волосся", "Hair shampoo"
+        )
+        self.mask = create_product(
+            self.type_category, "MS-002", "Маска для обличчя", "Face mask",
+            ingredients="Shea butter",
+        )
+
+    def tearDown(self):
+        reset_search_backend()
+
+
+class SearchBackendTests(CatalogTestCase):
+    backend_class = InMemorySearchBackend
+
+    def get_backend(self):
+        backend = self.backend_class()
+        backend.rebuild()
+        return backend
+
+    def test_matches_both_languages(self):
+        backend = self.get_backend()
+        self.assertEqual(backend.search("шампунь"), [self.shampoo.id])
+        self.assertEqual(backend.search("SHAMPOO"), [self.shampoo.id])
+
+    def test_tolerates_typos_and_substrings(self):
+        backend = self.get_backend()
+        self.assertEqual(backend.search("shampo"), [self.shampoo.id])
+        self.assertEqual(backend.search("shempoo"), [self.shampoo.id])
+        self.assertEqual(backend.search("ms-002"), [self.mask.id])
+
+    def test_name_ranks_above_ingredients(self):
+        backend = self.get_backend()
+        self.assertEqual(backend.search("shea"), [self.mask.id])
+        self.assertEqual(backend.search("sh")[0], self.shampoo.id)
+
+    def test_incremental_updates(self):
+        backend = self.get_backend()
+        self.shampoo.product_name_en = "Conditioner"
+        self.shampoo.save()
+        backend.index(self.shampoo)
+        self.assertEqual(backend.search("conditioner"), [self.shampoo.id])
+
+        backend.remove(self.mask.id)
+        self.assertEqual(backend.search("mask"), [])
+
+    def test_sees_changes_made_by_another_worker(self):
+        worker = self.get_backend()
+        self.assertEqual(worker.search("serum"), [])
+        # Saved elsewhere: only the catalog version tells this worker.
+        with self.captureOnCommitCallbacks(execute=True):
+            serum = create_product(self.type_category, "SR-003", "Сироватка", "Serum")
+        self.assertEqual(worker.search("serum"), [serum.id])
+
+    def test_ids_restrict_the_search_and_lift_the_cap(self):
+        creams = [
+            create_product(self.type_category, f"CR-{i}", f"Крем {i}", f"Cream {i}")
+            for i in range(3)
+        ]
+        backend = self.get_backend()
+        with override_settings(PRODUCT_SEARCH={"LIMIT": 1}):
+            self.assertEqual(len(backend.search("cream")), 1)
+            self.assertEqual(
+                sorted(backend.search("cream", ids={c.id for c in creams[1:]})),
+                [c.id for c in creams[1:]],
+            )
+        self.assertEqual(backend.search("cream", ids={self.mask.id}), [])
+
+
+class FTS5SearchBackendTests(SearchBackendTests):
+    backend_class = SQLiteFTS5SearchBackend
+
+    def test_table_is_recreated_after_a_rollback(self):
+        backend = self.backend_class()
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {backend.table}")
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                self.assertEqual(backend.search("mask"), [self.mask.id])
+                raise RuntimeError
+        self.assertEqual(backend.search("mask"), [self.mask.id])
+
+
+@override_settings(PRODUCT_SEARCH={"BACKEND": "products.search.InMemorySearchBackend"})
+class ProductSearchApiTests(CatalogTestCase):
+    def test_search_uses_index_kept_current_by_signals(self):
+        client = APIClient()
+        url = reverse("products:products-list")
+        response = client.get(url, {"search": "mask"})
+        self.assertEqual([p["id"] for p in response.json()], [self.mask.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.mask.delete()
+        response = client.get(url, {"search": "mask"})
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(PRODUCT_SEARCH={
+        "BACKEND": "products.search.InMemorySearchBackend", "LIMIT": 2,
+    })
+    def test_filters_apply_before_the_limit(self):
+        for index in range(3):
+            create_product(self.type_category, f"CR-{index}", f"Крем {index}", f"Cream {index}")
+        face = ProductTypeCategory.objects.create(type_name_en="Face", type_name_uk="Обличчя")
+        face_cream = create_product(face, "CR-9", "Крем для обличчя", "Face cream")
+
+        response = APIClient().get(
+            reverse("products:products-list"), {"search": "cream", "type": face.id}
+        )
+        self.assertEqual([p["id"] for p in response.json()], [face_cream.id])
+
+
+class ProductSuggestApiTests(CatalogTestCase):
+    url = reverse("products:products-suggest")
+
+    def test_prefix_in_active_language(self):
+        client = APIClient()
+        response = client.get(self.url, {"q": "sham"}, HTTP_ACCEPT_LANGUAGE="en")
+        self.assertEqual(response.json(), [{
+            "id": self.shampoo.id,
+            "name": "Hair shampoo",
+            "price": 100,
+            "price_with_discount": 100,
+        }])
+
+        response = client.get(self.url, {"q": "Мас"}, HTTP_ACCEPT_LANGUAGE="uk")
+        self.assertEqual([p["name"] for p in response.json()], ["Маска для обличчя"])
+
+    def test_index_follows_catalog_version(self):
+        client = APIClient()
+        self.assertEqual(client.get(self.url, {"q": "serum"}).json(), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            serum = create_product(self.type_category, "SR-003", "Сироватка", "Serum")
+        response = client.get(self.url, {"q": "serum"}, HTTP_ACCEPT_LANGUAGE="en")
+        self.assertEqual([p["id"] for p in response.json()], [serum.id])
+
+
+    def test_name_starting_with_the_prefix_wins_over_many_later_words(self):
+        for index in range(45):
+            create_product(
+                self.type_category, f"SN-{index}", f"Крем {index}", f"Day sun {index:02d}"
+            )
+        sunscreen = create_product(self.type_category, "SN-99", "Крем", "Sunscreen")
+        suggestions = suggest_products("sun", "en", limit=10)
+        self.assertEqual(len(suggestions), 10)
+        self.assertEqual(suggestions[0]["id"], sunscreen.id)
+
+
+class ProductPaginationTests(CatalogTestCase):
+    url = reverse("products:products-list")
+
+    def setUp(self):
+        super().setUp()
+        for index in range(5):
+            create_product(
+                self.type_category, f"CR-{index}", f"Крем {index}", f"Cream {index}",
+                price=150,
+            )
+
+    def test_list_is_unpaginated_by_default(self):
+        response = APIClient().get(self.url)
+        self.assertEqual(len(response.json()), 7)
+
+    def test_cursor_pages_follow_price_and_id(self):
+        client = APIClient()
+        expected = list(
+            Product.objects.order_by("price_with_discount", "id").values_list("id", flat=True)
+        )
+        seen = []
+        response = client.get(self.url, {"page_size": 3}).json()
+        while True:
+            seen += [product["id"] for product in response["results"]]
+            if not response["next"]:
+                break
+            response = client.get(response["next"]).json()
+        self.assertEqual(seen, expected)
+
+        previous = client.get(response["previous"]).json()
+        self.assertEqual([p["id"] for p in previous["results"]], expected[3:6])
+
+    def test_cursor_pages_of_search_results(self):
+        client = APIClient()
+        for ordering in ("", "-price_with_discount"):
+            expected = list(
+                Product.objects.filter(article__startswith="CR-")
+                .order_by(ordering or "price_with_discount", "id")
+                .values_list("id", flat=True)
+            )
+            params = {"page_size": 2, "search": "cream"}
+            if ordering:
+                params["ordering"] = ordering
+            seen = []
+            response = client.get(self.url, params).json()
+            while True:
+                seen += [product["id"] for product in response["results"]]
+                if not response["next"]:
+                    break
+                response = client.get(response["next"]).json()
+            self.assertEqual(seen, expected, ordering)
+
+    def test_cursor_with_filters(self):
+        response = APIClient().get(self.url, {"page_size": 2, "min_price": 150}).json()
+        self.assertEqual(len(response["results"]), 2)
+        self.assertIsNotNone(response["next"])
+
+    def test_cursor_pages_follow_the_requested_ordering(self):
+        for index, rating in enumerate([4.5, 3.0, 4.5, 5.0, 1.0]):
+            Product.objects.filter(article=f"CR-{index}").update(rating_avg=rating)
+        expected = list(
+            Product.objects.order_by("-rating_avg", "id").values_list("id", flat=True)
+        )
+        client = APIClient()
+        seen = []
+        response = client.get(self.url, {"page_size": 3, "ordering": "-rating_avg"}).json()
+        while True:
+            seen += [product["id"] for product in response["results"]]
+            if not response["next"]:
+                break
+            response = client.get(response["next"]).json()
+        self.assertEqual(seen, expected)
+
+        previous = client.get(response["previous"]).json()
+        self.assertEqual([p["id"] for p in previous["results"]], expected[3:6])
+
+    def test_cursor_refuses_orderings_it_cannot_keep(self):
+        client = APIClient()
+        for params in [
+            {"page_size": 2, "ordering": "rating_avg,price_with_discount"},
+            {"page_size": 2, "ordering": "volume_ml"},
+        ]:
+            self.assertEqual(client.get(self.url, params).status_code, 400, params)
+
+        response = client.get(self.url, {"page_size": 2}).json()
+        response = client.get(f"{response['next']}&ordering=-rating_avg")
+        self.assertEqual(response.status_code, 404)
+
+    def test_offset_pagination_for_admin(self):
+        response = APIClient().get(self.url, {"limit": 2, "offset": 6}).json()
+        self.assertEqual(response["count"], 7)
+        self.assertEqual(len(response["results"]), 1)
+
+
+class SparseFieldsetTests(CatalogTestCase):
+    list_url = reverse("products:products-list")
+
+    def test_list_uses_card_representation(self):
+        card = APIClient().get(self.list_url).json()[0]
+        self.assertNotIn("description", card)
+        self.assertNotIn("reviews", card)
+        self.assertIn("image", card)
+        self.assertIn("average_rating", card)
+
+    def test_fields_and_expand(self):
+        client = APIClient()
+        cards = client.get(
+            self.list_url, {"fields": "id,name,reviews", "expand": "reviews"},
+            HTTP_ACCEPT_LANGUAGE="en",
+        ).json()
+        self.assertEqual(
+            cards[0], {"id": self.shampoo.id, "name": "Hair shampoo", "reviews": []}
+        )
+
+        url = reverse("products:products-detail", args=[self.mask.id])
+        detail = client.get(url, {"fields": "id,name"}, HTTP_ACCEPT_LANGUAGE="en").json()
+        self.assertEqual(detail, {"id": self.mask.id, "name": "Face mask"})
+
+        url = reverse("products:producttypecategory-list")
+        categories = client.get(url, {"fields": "id"}).json()
+        self.assertEqual(categories, [{"id": self.type_category.id}])
+
+
+class ProductQueryCountTests(CatalogTestCase):
+    # Cached endpoints spend one extra MAX(updated_at) on a miss for Last-Modified.
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        for product in Product.objects.all():
+            ProductImage.objects.create(product=product, image="sample")
+            ProductReview.objects.create(product=product, rating=5, is_approved=True)
+            ProductReview.objects.create(product=product, rating=1)
+        rebuild_rating_aggregates()
+
+    def add_products(self, count):
+        for index in range(count):
+            product = create_product(
+                self.type_category, f"EX-{index}", f"Товар {index}", f"Item {index}"
+            )
+            ProductImage.objects.create(product=product, image="sample")
+            ProductReview.objects.create(product=product, rating=4, is_approved=True)
+
+    def assertConstantQueries(self, num, url, params=None):
+        with self.assertNumQueries(num):
+            self.client.get(url, params)
+        self.add_products(3)
+        cache.clear()
+        with self.assertNumQueries(num):
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_product_list(self):
+        self.assertConstantQueries(3, reverse("products:products-list"))
+
+    def test_product_list_expanded(self):
+        response = self.assertConstantQueries(
+            5, reverse("products:products-list"), {"expand": "reviews,purpose_category"}
+        )
+        shampoo = next(p for p in response.json() if p["id"] == self.shampoo.id)
+        self.assertEqual([r["rating"] for r in shampoo["reviews"]], [5])
+        self.assertEqual(shampoo["average_rating"], 5)
+
+    def test_product_detail(self):
+        url = reverse("products:products-detail", args=[self.shampoo.id])
+        with self.assertNumQueries(5):
+            self.client.get(url)
+
+    def test_all_reviews(self):
+        self.assertConstantQueries(1, reverse("products:all-reviews-list"))
+
+    def test_banners(self):
+        for product in Product.objects.all()[:2]:
+            BannerProduct.objects.create(product=product)
+        self.assertConstantQueries(4, reverse("products:banner-products-list"))
+
+
+class RatingAggregateTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        admin = User.objects.create_user(email="admin@example.com", role=Role.ADMIN)
+        self.client.force_authenticate(admin)
+
+    def review_url(self, review, action=None):
+        name = f"products:product-reviews-{action or 'detail'}"
+        return reverse(name, kwargs={"product_id": review.product_id, "pk": review.pk})
+
+    def test_approve_reject_delete(self):
+        first = ProductReview.objects.create(product=self.shampoo, rating=5)
+        second = ProductReview.objects.create(product=self.shampoo, rating=2)
+
+        self.client.post(self.review_url(first, "approve"))
+        self.client.post(self.review_url(first, "approve"))
+        self.client.post(self.review_url(second, "approve"))
+        self.shampoo.refresh_from_db()
+        self.assertEqual(self.shampoo.rating_count, 2)
+        self.assertEqual(self.shampoo.get_average_rating(), 3.5)
+        self.assertEqual(
+            self.shampoo.get_rating_histogram(), {"1": 0, "2": 1, "3": 0, "4": 0, "5": 1}
+        )
+
+        self.client.post(self.review_url(first, "reject"))
+        self.shampoo.refresh_from_db()
+        self.assertEqual((self.shampoo.rating_count, self.shampoo.rating_avg), (1, 2.0))
+
+        self.client.delete(self.review_url(second))
+        self.shampoo.refresh_from_db()
+        self.assertEqual((self.shampoo.rating_count, self.shampoo.rating_avg), (0, 0.0))
+        self.assertEqual(self.shampoo.rating_2_count, 0)
+
+    def test_rebuild_counts_only_approved_reviews(self):
+        ProductReview.objects.create(product=self.mask, rating=4, is_approved=True)
+        ProductReview.objects.create(product=self.mask, rating=1, is_approved=True)
+        ProductReview.objects.create(product=self.mask, rating=5)
+        rebuild_rating_aggregates()
+        self.mask.refresh_from_db()
+        self.assertEqual((self.mask.rating_count, self.mask.rating_avg), (2, 2.5))
+        self.assertEqual(self.mask.get_rating_histogram()["4"], 1)
+
+
+class ResponseCacheTests(CatalogTestCase):
+    url = reverse("products:products-list")
+
+    def test_repeated_reads_skip_the_database(self):
+        client = APIClient()
+        first = client.get(self.url, {"b": "2", "a": "1"})
+        self.assertEqual(first["X-Cache"], "MISS")
+        with self.assertNumQueries(0):
+            second = client.get(self.url, {"a": "1", "b": "2"})
+        self.assertEqual(second["X-Cache"], "HIT")
+        self.assertEqual(second.json(), first.json())
+
+        other_language = client.get(self.url, HTTP_ACCEPT_LANGUAGE="en")
+        self.assertEqual(other_language["X-Cache"], "MISS")
+
+    def test_saving_a_catalog_model_invalidates(self):
+        client = APIClient()
+        client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.mask.price = 500
+            self.mask.save()
+        response = client.get(self.url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertIn(500, [product["price"] for product in response.json()])
+
+    def test_staff_responses_are_cached_separately(self):
+        client = APIClient()
+        client.get(self.url)
+        manager = User.objects.create_user(email="manager@example.com", role=Role.MANAGER)
+        client.force_authenticate(manager)
+        response = client.get(self.url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertIn("product_name_uk", response.json()[0])
+
+        stats = client.get(reverse("products:cache-stats")).json()
+        self.assertEqual(stats["catalog"]["hits"], 0)
+        self.assertEqual(stats["catalog"]["misses"], 2)
+
+
+class ConditionalGetTests(CatalogTestCase):
+    url = reverse("products:products-list")
+
+    def test_if_none_match_skips_the_database(self):
+        client = APIClient()
+        first = client.get(self.url)
+        self.assertIn("Accept-Language", first["Vary"])
+        cache.clear()
+        with self.assertNumQueries(0):
+            response = client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], first["ETag"])
+
+        other_language = client.get(
+            self.url, HTTP_IF_NONE_MATCH=first["ETag"], HTTP_ACCEPT_LANGUAGE="en"
+        )
+        self.assertEqual(other_language.status_code, 200)
+
+    def test_etag_changes_with_catalog_and_role(self):
+        client = APIClient()
+        etag = client.get(self.url)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.mask.price = 500
+            self.mask.save()
+        response = client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+        manager = User.objects.create_user(email="manager@example.com", role=Role.MANAGER)
+        client.force_authenticate(manager)
+        staff = client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(staff.status_code, 200)
+        self.assertIn("private", staff["Cache-Control"])
+
+    def test_if_modified_since(self):
+        client = APIClient()
+        last_modified = client.get(self.url)["Last-Modified"]
+        response = client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+        response = client.get(
+            self.url, HTTP_IF_MODIFIED_SINCE="Mon, 01 Jan 2001 00:00:00 GMT"
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+class ProductFacetsTests(CatalogTestCase):
+    url = reverse("products:products-facets")
+
+    def setUp(self):
+        super().setUp()
+        self.face = ProductTypeCategory.objects.create(
+            type_name_en="Face", type_name_uk="Обличчя"
+        )
+        self.care = ProductPurposeCategory.objects.create(
+            category_name_en="Care", category_name_uk="Догляд"
+        )
+        self.serum = create_product(
+            self.face, "SR-003", "Сироватка", "Serum",
+            price=1500, discount=10, is_new=True,
+        )
+        self.serum.purpose_category.add(self.care)
+        self.mask.purpose_category.add(self.care)
+
+    def test_counts_for_the_full_catalog(self):
+        with self.assertNumQueries(3):
+            facets = APIClient().get(self.url).json()
+        self.assertEqual(facets["total"], 3)
+        self.assertEqual(facets["price"], {"min": 100, "max": 1350})
+        self.assertEqual(
+            [bucket["count"] for bucket in facets["price_buckets"]], [2, 0, 1, 0]
+        )
+        self.assertEqual(
+            facets["type_category"],
+            [{"id": self.type_category.id, "count": 2}, {"id": self.face.id, "count": 1}],
+        )
+        self.assertEqual(facets["purpose_category"], [{"id": self.care.id, "count": 2}])
+        self.assertEqual(
+            (facets["is_new"], facets["is_best_seller"], facets["is_discount"]), (1, 0, 1)
+        )
+
+    def test_counts_follow_filters_and_are_cached(self):
+        client = APIClient()
+        params = {"purpose_category": self.care.id, "min_price": 200}
+        facets = client.get(self.url, params).json()
+        self.assertEqual(facets["total"], 1)
+        self.assertEqual(facets["type_category"], [{"id": self.face.id, "count": 1}])
+        with self.assertNumQueries(0):
+            self.assertEqual(client.get(self.url, params).json(), facets)
+
+    def test_cache_hit_skips_search(self):
+        client = APIClient()
+        params = {"search": "serum", "is_new": True}
+        facets = client.get(self.url, params).json()
+        self.assertEqual(facets["total"], 1)
+        with mock.patch("products.api.get_search_backend") as get_backend:
+            self.assertEqual(client.get(self.url, params).json(), facets)
+        get_backend.assert_not_called()
+
+
+class BulkPriceTests(CatalogTestCase):
+    url = reverse("products:products-bulk-price")
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        admin = User.objects.create_user(email="admin@example.com", role=Role.ADMIN)
+        self.client.force_authenticate(admin)
+        self.receiver = mock.Mock()
+        products_bulk_updated.connect(self.receiver, sender=Product)
+        self.addCleanup(products_bulk_updated.disconnect, self.receiver, sender=Product)
+
+    def test_category_sale_in_one_batch(self):
+        self.client.get(reverse("products:products-list"))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                self.url,
+                {"type_category": self.type_category.id, "price_percent": 15,
+                 "discount": 33},
+                format="json",
+            )
+        self.assertEqual(response.json(), {"updated": 2})
+        self.assertEqual(self.receiver.call_count, 1)
+        product_ids = self.receiver.call_args.kwargs["product_ids"]
+        self.assertEqual(
+            set(Product.objects.filter(pk__in=product_ids).values_list("pk", flat=True)),
+            {self.shampoo.id, self.mask.id},
+        )
+
+        self.mask.refresh_from_db()
+        self.assertEqual((self.mask.price, self.mask.price_with_discount), (115, 78))
+        listed = self.client.get(reverse("products:products-list"))
+        self.assertEqual(listed["X-Cache"], "MISS")
+        self.assertEqual({p["price_with_discount"] for p in listed.json()}, {78})
+
+    def test_save_keeps_generated_price(self):
+        self.mask.discount = 50
+        self.mask.save()
+        self.assertEqual(self.mask.price_with_discount, 50)
+
+    def test_save_refreshes_only_after_a_price_change(self):
+        mask = Product.objects.get(pk=self.mask.pk)
+        with mock.patch.object(Product, "refresh_from_db") as refresh:
+            mask.product_name_en = "Clay mask"
+            mask.save()
+            refresh.assert_not_called()
+            mask.price = 200
+            mask.save()
+            refresh.assert_called_once_with(fields=["price_with_discount"])
+
+    def test_requires_a_selection(self):
+        response = self.client.post(self.url, {"discount": 10}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.client.force_authenticate(None)
+        response = self.client.post(self.url, {"all": True, "discount": 10}, format="json")
+        self.assertIn(response.status_code, [401, 403])
+
+    def test_command(self):
+        call_command("bulk_update_prices", articles="SH-001", price=250, stdout=mock.Mock())
+        self.shampoo.refresh_from_db()
+        self.mask.refresh_from_db()
+        self.assertEqual((self.shampoo.price_with_discount, self.mask.price), (250, 100))
+
+
+class CatalogImportExportTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.care = ProductPurposeCategory.objects.create(
+            category_name_en="Care", category_name_uk="Догляд"
+        )
+        self.client = APIClient()
+        admin = User.objects.create_user(email="admin@example.com", role=Role.ADMIN)
+        self.client.force_authenticate(admin)
+
+    def csv_file(self):
+        header = (
+            "article,product_name_uk,product_name_en,price,discount,volume_ml,"
+            "type_category,purpose_category,available\n"
+        )
+        rows = [
+            f"SH-001,Шампунь,Shampoo v2,300,10,250,{self.type_category.id},"
+            f"{self.care.id},true",
+            f"NEW-1,Крем,Cream,150,0,50,{self.type_category.id},,false",
+            "BAD-1,Крем,Cream,-5,0,50,999,,false",
+        ]
+        return SimpleUploadedFile(
+            "catalog.csv", (header + "\n".join(rows)).encode("utf-8")
+        )
+
+    def test_import_upserts_by_article_and_reports_errors(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("products:products-import"), {"file": self.csv_file()}
+            )
+        report = response.json()
+        self.assertEqual((report["processed"], report["imported"]), (3, 2))
+        self.assertEqual(report["errors"][0]["line"], 4)
+        self.assertEqual(
+            set(report["errors"][0]["errors"]), {"price", "type_category"}
+        )
+
+        self.shampoo.refresh_from_db()
+        self.assertEqual(self.shampoo.product_name_en, "Shampoo v2")
+        self.assertEqual(self.shampoo.price_with_discount, 270)
+        self.assertEqual(list(self.shampoo.purpose_category.all()), [self.care])
+        self.assertEqual(Product.objects.count(), 3)
+        self.assertEqual(
+            get_search_backend().search("cream"),
+            [Product.objects.get(article="NEW-1").id],
+        )
+
+    def test_export_round_trips_through_import(self):
+        self.mask.purpose_category.add(self.care)
+        out = io.StringIO()
+        call_command("export_products", "-", format="jsonl", stdout=out)
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([row["article"] for row in rows], ["SH-001", "MS-002"])
+        self.assertEqual(rows[1]["purpose_category"], [self.care.id])
+
+        Product.objects.filter(article="MS-002").update(price=1)
+        report = import_products(enumerate(rows, start=1))
+        self.assertEqual(report["imported"], 2)
+        self.mask.refresh_from_db()
+        self.assertEqual(self.mask.price, 100)
+
+    def test_streaming_csv_export(self):
+        response = self.client.get(reverse("products:products-export"))
+        content = b"".join(response.streaming_content).decode("utf-8")
+        self.assertTrue(content.startswith("article,available,"))
+        self.assertIn("MS-002", content)
+
+
+class SitemapPingTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch("products.sitemap_ping.ping_google_custom")
+        self.ping = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @mock.patch("products.background.threading.Timer")
+    def test_requests_in_one_window_schedule_one_timer(self, timer):
+        for _ in range(1000):
+            request_sitemap_ping()
+        self.assertEqual(timer.call_count, 1)
+        self.assertTrue(timer.return_value.daemon)
+
+    def test_ping_skipped_when_sitemap_unchanged(self):
+        self.assertTrue(flush_sitemap_ping())
+        self.assertFalse(flush_sitemap_ping())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.mask.delete()
+        self.assertTrue(flush_sitemap_ping())
+        self.assertEqual(self.ping.call_count, 2)
+
+
+class SitemapTests(CatalogTestCase):
+    def test_entries_are_cached_until_the_catalog_changes(self):
+        ProductImage.objects.create(product=self.shampoo, image="shampoo")
+        response = self.client.get(reverse("sitemap"))
+        content = response.content.decode()
+        self.assertEqual(content.count("<url>"), 4)
+        self.assertIn(
+            f'hreflang="en" href="https://example.com/en/catalog/{self.shampoo.pk}/"',
+            content,
+        )
+        self.assertIn('hreflang="x-default"', content)
+        self.assertIn("/image/upload/shampoo</image:loc>", content)
+        self.assertIn(f"<lastmod>{self.mask.updated_at.date().isoformat()}", content)
+
+        with self.assertNumQueries(0):
+            self.client.get(reverse("sitemap"))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.mask.delete()
+        content = self.client.get(reverse("sitemap")).content.decode()
+        self.assertEqual(content.count("<url>"), 2)
+
+    @override_settings(SITEMAP={"MAX_URLS": 3})
+    def test_split_into_an_index(self):
+        index = self.client.get(reverse("sitemap")).content.decode()
+        self.assertIn("<sitemapindex", index)
+        self.assertIn("https://example.com/sitemap-2.xml", index)
+        second = self.client.get(reverse("sitemap-section", args=[2]))
+        self.assertEqual(second.content.decode().count("<url>"), 1)
+        missing = self.client.get(reverse("sitemap-section", args=[3]))
+        self.assertEqual(missing.status_code, 404)
+
+    @override_settings(SITEMAP={"MAX_URLS": 3})
+    def test_evicted_section_is_rendered_again(self):
+        self.client.get(reverse("sitemap"))
+        cache.delete(f"sitemap:v{get_catalog_version()}:2")
+        second = self.client.get(reverse("sitemap-section", args=[2]))
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.content.decode().count("<url>"), 1)
+
+
+class AssetDeletionTests(CatalogTestCase):
+    def test_deleting_a_product_queues_its_images(self):
+        for index in range(3):
+            ProductImage.objects.create(product=self.shampoo, image=f"shampoo-{index}")
+        self.shampoo.delete()
+        self.assertEqual(AssetDeletion.objects.count(), 3)
+
+        client = FakeAssetClient(["shampoo-0", "shampoo-1", "shampoo-2"])
+        report = drain_asset_deletions(client)
+        self.assertEqual(report, {"deleted": 3, "retried": 0, "dead": 0})
+        self.assertEqual(len(client.delete_calls), 1)
+        self.assertFalse(AssetDeletion.objects.exists())
+
+    def test_batches_of_one_hundred(self):
+        enqueue_asset_deletion(*[f"asset-{index}" for index in range(150)])
+        client = FakeAssetClient()
+        drain_asset_deletions(client)
+        self.assertEqual([len(call) for call in client.delete_calls], [100, 50])
+
+    def test_rolled_back_deletes_queue_nothing(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                enqueue_asset_deletion("kept")
+                raise RuntimeError
+        self.assertFalse(AssetDeletion.objects.exists())
+
+    @override_settings(CLOUDINARY_ASSETS={"MAX_ATTEMPTS": 2, "RETRY_DELAY": 0})
+    def test_failures_are_retried_then_dead_lettered(self):
+        enqueue_asset_deletion("broken")
+        report = drain_asset_deletions(FakeAssetClient(fail=True))
+        self.assertEqual(report, {"deleted": 0, "retried": 1, "dead": 1})
+        row = AssetDeletion.objects.get()
+        self.assertEqual((row.status, row.attempts), (AssetDeletion.STATUS_DEAD, 2))
+        self.assertIn("Cloudinary is down", row.last_error)
+
+        out = io.StringIO()
+        call_command("drain_asset_deletions", list_dead=True, stdout=out)
+        self.assertIn("broken attempts=2", out.getvalue())
+
+
+    def test_claimed_rows_go_to_one_drain_until_the_lease_ends(self):
+        enqueue_asset_deletion("first", "second")
+        lease = timedelta(seconds=30)
+        self.assertEqual(len(_claim_batch(10, lease)), 2)
+        self.assertEqual(_claim_batch(10, lease), [])
+
+        AssetDeletion.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(len(_claim_batch(10, lease)), 2)
+
+    def test_worker_command_drains_on_a_schedule(self):
+        enqueue_asset_deletion("stranded")
+        with mock.patch("products.assets.get_asset_client", return_value=FakeAssetClient()), \
+                mock.patch(
+                    "products.management.commands.drain_asset_deletions.time.sleep",
+                    side_effect=KeyboardInterrupt,
+                ), self.assertRaises(KeyboardInterrupt):
+            call_command("drain_asset_deletions", every=60, stdout=io.StringIO())
+        self.assertFalse(AssetDeletion.objects.exists())
+
+
+class ParallelUploadTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.assets = FakeAssetClient()
+        patcher = mock.patch("products.assets.get_asset_client", return_value=self.assets)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        admin = User.objects.create_user(email="admin@example.com", role=Role.ADMIN)
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+        self.url = reverse("products:products-detail", args=[self.shampoo.id])
+
+    def upload(self, *names):
+        return self.client.patch(
+            self.url,
+            {"upload_images": [image_file(name) for name in names]},
+            format="multipart",
+        )
+
+    def test_gallery_is_uploaded_and_inserted_in_order(self):
+        ProductImage.objects.create(product=self.shampoo, image="existing", order=0)
+        response = self.upload("front.png", "back.png", "side.png")
+        self.assertEqual(response.status_code, 200, response.content)
+        images = self.shampoo.images.order_by("order")
+        self.assertEqual(
+            [(image.image.public_id, image.order) for image in images],
+            [("existing", 0), ("front", 1), ("back", 2), ("side", 3)],
+        )
+
+    def test_uploads_run_outside_the_write_transaction(self):
+        # Uploads run on pool threads; look at the request thread's connection.
+        request_connection = transaction.get_connection()
+        outer_blocks = len(request_connection.atomic_blocks)
+        depths = []
+        upload = self.assets.upload
+        self.assets.upload = lambda file, **kwargs: (
+            depths.append(len(request_connection.atomic_blocks)) or upload(file, **kwargs)
+        )
+        response = self.upload("front.png", "back.png")
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(depths, [outer_blocks, outer_blocks])
+
+    def test_failed_upload_destroys_the_others(self):
+        response = self.upload("front.png", "broken.png", "side.png")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("upload_images", response.json())
+        self.assertFalse(self.shampoo.images.exists())
+        self.assertEqual(sorted(self.assets.delete_calls[0]), ["front", "side"])
+        self.assertEqual(self.assets.assets, {})
+
+
+class DirectUploadTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        config = cloudinary.config()
+        previous = {
+            name: getattr(config, name, None)
+            for name in ("cloud_name", "api_key", "api_secret")
+        }
+        cloudinary.config(cloud_name="demo", api_key="key", api_secret="secret")
+        self.addCleanup(lambda: cloudinary.config(**previous))
+        self.assets = FakeAssetClient()
+        for target in [
+            "products.assets.get_asset_client",
+            "products.direct_uploads.get_asset_client",
+        ]:
+            patcher = mock.patch(target, return_value=self.assets)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        admin = User.objects.create_user(email="admin@example.com", role=Role.ADMIN)
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+
+    def sign(self, slot, object_id=None):
+        data = {"slot": slot}
+        if object_id is not None:
+            data["object_id"] = object_id
+        return self.client.post(reverse("products:uploads-sign"), data, format="json")
+
+    def confirm(self, token, public_id, version=1, signature=None):
+        if signature is None:
+            signature = cloudinary.utils.api_sign_request(
+                {"public_id": public_id, "version": version}, "secret"
+            )
+        return self.client.post(
+            reverse("products:uploads-confirm"),
+            {"token": token, "public_id": public_id, "version": version,
+             "signature": signature},
+            format="json",
+        )
+
+    def test_signed_upload_is_attached_to_the_product(self):
+        ProductImage.objects.create(product=self.shampoo, image="existing")
+        response = self.sign("product_image", self.shampoo.id)
+        self.assertEqual(response.status_code, 200)
+        params = response.json()["params"]
+        self.assertEqual(params["folder"], f"products/{self.shampoo.id}")
+        unsigned = {k: v for k, v in params.items() if k not in ("api_key", "signature")}
+        self.assertEqual(
+            params["signature"], cloudinary.utils.api_sign_request(unsigned, "secret")
+        )
+
+        public_id = f"products/{self.shampoo.id}/front"
+        response = self.confirm(response.json()["token"], public_id)
+        self.assertEqual(response.status_code, 201, response.content)
+        image = ProductImage.objects.get(pk=response.json()["id"])
+        self.assertEqual((image.product, image.order), (self.shampoo, 1))
+        self.assertEqual(image.image.public_id, public_id)
+
+    def test_replayed_confirmation_is_refused_without_destroying_the_asset(self):
+        for order in range(9):
+            ProductImage.objects.create(product=self.shampoo, image=f"old-{order}")
+        token = self.sign("product_image", self.shampoo.id).json()["token"]
+        public_id = f"products/{self.shampoo.id}/front"
+        self.assertEqual(self.confirm(token, public_id).status_code, 201)
+
+        response = self.confirm(token, public_id)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.shampoo.images.count(), 10)
+        self.assertEqual(self.assets.delete_calls, [])
+        self.assertEqual(ImageAsset.objects.get(public_id=public_id).ref_count, 1)
+
+    def test_forged_or_foreign_uploads_are_rejected(self):
+        token = self.sign("product_image", self.shampoo.id).json()["token"]
+        response = self.confirm(
+            token, f"products/{self.shampoo.id}/front", signature="forged"
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.confirm(token, f"products/{self.mask.id}/front")
+        self.assertEqual(response.status_code, 400)
+        response = self.confirm("forged-token", f"products/{self.shampoo.id}/front")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ProductImage.objects.exists())
+
+    def test_oversized_upload_is_destroyed(self):
+        public_id = f"products/{self.shampoo.id}/huge"
+        self.assets.metadata[public_id] = {
+            "format": "png", "bytes": 5 * 1024 * 1024, "width": 100, "height": 100
+        }
+        token = self.sign("product_image", self.shampoo.id).json()["token"]
+        response = self.confirm(token, public_id)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.assets.delete_calls, [[public_id]])
+        self.assertFalse(ProductImage.objects.exists())
+
+    def test_banner_image_replaces_and_queues_the_old_one(self):
+        banner = BannerProduct.objects.create(
+            product=self.shampoo, background_image="old-background"
+        )
+        token = self.sign("banner_background_image", banner.id).json()["token"]
+        response = self.confirm(token, f"banners/{banner.id}/new")
+        self.assertEqual(response.status_code, 201, response.content)
+        banner.refresh_from_db()
+        self.assertEqual(banner.background_image.public_id, f"banners/{banner.id}/new")
+        self.assertEqual(
+            list(AssetDeletion.objects.values_list("public_id", flat=True)),
+            ["old-background"],
+        )
+
+    def test_slots_with_an_object_need_its_id(self):
+        self.assertEqual(self.sign("banner_image").status_code, 400)
+        self.assertEqual(self.sign("blog_image").status_code, 200)
+
+
+class ImageValidatorTests(TestCase):
+    def test_oversized_images_are_downscaled_to_webp(self):
+        image = ImageValidator()(image_file("wide.png", size=(2400, 1200)))
+        self.assertEqual(image.name, "wide.webp")
+        with Image.open(image) as img:
+            self.assertEqual((img.format, img.size), ("WEBP", (1920, 960)))
+
+    def test_images_within_limits_are_kept(self):
+        upload = image_file("small.png")
+        self.assertIs(ImageValidator()(upload), upload)
+
+    @override_settings(IMAGE_UPLOADS={"TRANSCODE": "off"})
+    def test_oversized_images_are_rejected_without_transcoding(self):
+        with self.assertRaisesMessage(ValidationError, "1920x1080"):
+            ImageValidator()(image_file("wide.png", size=(2400, 1200)))
+
+    @override_settings(IMAGE_UPLOADS={"MAX_PIXELS": 1000})
+    def test_decompression_bombs_are_rejected_from_the_header(self):
+        with mock.patch("products.images.transcode_image") as transcode:
+            with self.assertRaisesMessage(ValidationError, "too many pixels"):
+                ImageValidator()(image_file("bomb.png", size=(100, 100)))
+        transcode.assert_not_called()
+
+    def test_errors_are_collected_per_file(self):
+        fake = SimpleUploadedFile("fake.png", b"not an image")
+        with self.assertRaises(ValidationError) as raised:
+            ImageValidator().prepare([image_file("ok.png"), fake, image_file("x.gif")])
+        self.assertEqual([name for name, _ in raised.exception.detail], ["fake.png", "x.gif"])
+
+
+class ImageDeduplicationTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.assets = FakeAssetClient()
+        patcher = mock.patch("products.assets.get_asset_client", return_value=self.assets)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.upload_calls = []
+        upload = self.assets.upload
+        self.assets.upload = lambda file, **kwargs: (
+            self.upload_calls.append(file.name) or upload(file, **kwargs)
+        )
+
+    def add_images(self, product, *names, color=(200, 10, 10)):
+        serializer = ProductSerializer()
+        serializer._write_with_uploads(
+            [image_file(name, color=color) for name in names],
+            lambda resources: serializer._add_images(product, resources),
+        )
+
+    def test_same_content_is_uploaded_once_and_shared(self):
+        self.add_images(self.shampoo, "packshot.png", "copy.png")
+        self.add_images(self.mask, "again.png")
+        self.assertEqual(self.upload_calls, ["packshot.png"])
+        self.assertEqual(
+            {image.image.public_id for image in ProductImage.objects.all()}, {"packshot"}
+        )
+        self.assertEqual(ImageAsset.objects.get().ref_count, 3)
+
+    def test_asset_is_destroyed_with_its_last_reference(self):
+        self.add_images(self.shampoo, "packshot.png")
+        self.add_images(self.mask, "packshot-copy.png")
+
+        self.shampoo.delete()
+        self.assertFalse(AssetDeletion.objects.exists())
+        self.assertEqual(ImageAsset.objects.get().ref_count, 1)
+
+        self.mask.delete()
+        self.assertEqual(
+            list(AssetDeletion.objects.values_list("public_id", flat=True)), ["packshot"]
+        )
+        self.assertFalse(ImageAsset.objects.exists())
+
+    def test_assets_outside_the_index_keep_a_single_reference(self):
+        ProductImage.objects.create(product=self.shampoo, image="legacy")
+        self.shampoo.delete()
+        self.assertEqual(
+            list(AssetDeletion.objects.values_list("public_id", flat=True)), ["legacy"]
+        )
+
+    @override_settings(IMAGE_UPLOADS={"PERCEPTUAL_DEDUP": True})
+    def test_perceptual_hash_matches_a_resized_copy(self):
+        buffer = io.BytesIO()
+        image = Image.new("RGB", (64, 64), (255, 255, 255))
+        image.paste((0, 0, 0), (0, 0, 32, 64))
+        image.save(buffer, format="PNG")
+        original = SimpleUploadedFile("original.png", buffer.getvalue())
+        buffer = io.BytesIO()
+        image.resize((32, 32)).save(buffer, format="PNG")
+        resized = SimpleUploadedFile("resized.png", buffer.getvalue())
+
+        acquire_assets([original])
+        resources, fresh = acquire_assets([resized])
+        self.assertEqual((resources[0].public_id, fresh), ("original", []))
+        self.assertEqual(self.upload_calls, ["original.png"])
+
+
+@override_settings(CLOUDINARY_CLOUD_NAME="demo")
+class ResponsiveImageUrlTests(CatalogTestCase):
+    def test_gallery_images_get_srcset_variants(self):
+        ProductImage.objects.create(product=self.shampoo, image="packshot")
+        response = self.client.get(
+            reverse("products:products-detail", args=[self.shampoo.id])
+        )
+        base = "https://res.cloudinary.com/demo/image/upload"
+        image = response.json()["images"][0]
+        self.assertEqual(image["image"], f"{base}/f_auto,q_auto,c_limit,w_1080/packshot")
+        self.assertTrue(
+            image["image_srcset"].startswith(
+                f"{base}/f_auto,q_auto,c_limit,w_480/packshot 480w, "
+            )
+        )
+
+    def test_category_image_stays_full_size(self):
+        previous = cloudinary.config().cloud_name
+        cloudinary.config(cloud_name="demo")
+        self.addCleanup(lambda: cloudinary.config(cloud_name=previous))
+        ProductPurposeCategory.objects.create(
+            category_name_uk="Догляд", category_name_en="Care", image="category"
+        )
+        response = self.client.get(reverse("products:productpurposecategory-list"))
+        category = response.json()[0]
+        self.assertTrue(category["image"].endswith("/demo/image/upload/category"))
+        self.assertIn("c_fill,w_160,h_160", category["image_thumbnail"])
+        self.assertIn("dpr_2.0/category 2x", category["image_srcset"])
+
+    @override_settings(IMAGE_PRESETS={"card": {"widths": [200, 400], "width": 400}})
+    def test_presets_come_from_settings(self):
+        variants = get_image_variants("packshot", "card")
+        base = "https://res.cloudinary.com/demo/image/upload/f_auto,q_auto,c_limit"
+        self.assertEqual(
+            variants,
+            {
+                "src": f"{base},w_400/packshot",
+                "srcset": f"{base},w_200/packshot 200w, {base},w_400/packshot 400w",
+            },
+        )
+
+    def test_fixed_size_presets_use_dpr(self):
+        srcset = get_image_variants("category", "thumbnail")["srcset"]
+        self.assertIn("c_fill,w_160,h_160,dpr_2.0/category 2x", srcset)
+        self.assertIsNone(get_image_variants(None, "thumbnail"))
+
+
+class OrphanedAssetTests(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        ProductImage.objects.create(product=self.shampoo, image="image/upload/v1/kept.jpg")
+        BannerProduct.objects.create(product=self.mask, background_image="banner")
+        enqueue_asset_deletion("queued")
+        self.assets = FakeAssetClient(
+            ["kept", "banner", "queued", "orphan-1", "orphan-2", "fresh-orphan"]
+        )
+        self.assets.created["fresh-orphan"] = timezone.now()
+
+    def test_dry_run_reports_old_orphans_only(self):
+        report = collect_orphaned_assets(self.assets, dry_run=True)
+        self.assertEqual(report["orphans"], ["orphan-1", "orphan-2"])
+        self.assertEqual(report["scanned"], 6)
+        self.assertEqual(self.assets.delete_calls, [])
+
+    def test_orphans_are_deleted_in_batches(self):
+        with override_settings(CLOUDINARY_ASSETS={"DELETE_BATCH_SIZE": 2}):
+            report = collect_orphaned_assets(self.assets)
+        self.assertEqual((report["deleted"], report["failed"]), (2, 0))
+        self.assertEqual(self.assets.delete_calls, [["orphan-1"], ["orphan-2"]])
+        self.assertEqual(
+            set(self.assets.assets), {"kept", "banner", "queued", "fresh-orphan"}
+        )
+
+    def test_command_dry_run(self):
+        out = io.StringIO()
+        with mock.patch("products.asset_gc.get_asset_client", return_value=self.assets):
+            call_command("collect_orphaned_assets", dry_run=True, stdout=out)
+        self.assertIn("orphan-1\norphan-2\nScanned 6, 2 orphaned.", out.getvalue())
@@ -1,9 +1,13 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
 
 from products.api import (AllProductReviewViewSet, BannerProductViewSet,
-                          ProductPurposeCategoryViewSet, ProductReviewViewSet,
+                          DirectUploadConfirmView, DirectUploadSignView,
+                          ProductExportView, ProductFacetsView,
+                          ProductImportView, ProductPurposeCategoryViewSet,
+                          ProductReviewViewSet, ProductSuggestView,
                           ProductTypeCategoryViewSet, ProductViewSet,
-                          PromoCodeViewSet)
+                          PromoCodeViewSet, ResponseCacheStatsView)
 
 
 router = DefaultRouter()
@@ -18,5 +22,11 @@ router.register("banner_products", BannerProductViewSet, basename="banner-produc
 router.register("reviews", AllProductReviewViewSet, basename="all-reviews")
 
 urlpatterns = [
-    
+    path("suggest/", ProductSuggestView.as_view(), name="products-suggest"),
+    path("facets/", ProductFacetsView.as_view(), name="products-facets"),
+    path("import/", ProductImportView.as_view(), name="products-import"),
+    path("export/", ProductExportView.as_view(), name="products-export"),
+    path("uploads/sign/", DirectUploadSignView.as_view(), name="uploads-sign"),
+    path("uploads/confirm/", DirectUploadConfirmView.as_view(), name="uploads-confirm"),
+    path("cache-stats/", ResponseCacheStatsView.as_view(), name="cache-stats"),
 ] + router.urls